@@ -0,0 +1,57 @@
+import numpy as np
+
+from model.model_settings import GonoSettings
+from model.model_structure import build_model
+from model.tau_leaping_model import if_equivalent
+from model.template_epidemics import TemplateMultiEpidemics
+
+"""
+Compares the projected outcomes of the 'tau-leaping' engine (adaptive time-step) with those of the 'apacepy'
+engine (fixed time-step) for the same seeds. An outcome agrees if an equivalence test (two one-sided tests)
+finds the mean of the differences between the two engines within the margin MARGIN * |mean of the fixed-step
+engine| (tests/test_tau_leaping_model.py tests the rate and proportions of cases with fewer trajectories).
+"""
+
+N = 100  # number of trajectories
+TAU_LEAPING_TOLERANCE = 0.1  # tolerance of the adaptive time-step
+MARGIN = 0.05  # margin of equivalence relative to the mean of the fixed-step engine
+ALPHA = 0.05  # significance level of each one-sided test
+
+
+def simulate(engine):
+    """
+    :param engine: (string) 'apacepy' or 'tau-leaping'
+    :return: (tuple) of the projected outcomes of trajectories (dictionary) and their run times (list)
+    """
+
+    sets = GonoSettings()
+    sets.engine = engine
+    sets.tauLeapingTolerance = TAU_LEAPING_TOLERANCE
+    multi_model = TemplateMultiEpidemics(model_settings=sets)
+    multi_model.simulate(function_to_populate_model=build_model, n=N, if_export_trajs=False,
+                         if_run_in_parallel=True)
+    outputs = multi_model.multiModelOutputs
+    return outputs.dictOfProjectedOutcomes, outputs.runTimes
+
+
+if __name__ == "__main__":
+
+    fixed_outcomes, fixed_run_times = simulate(engine='apacepy')
+    leap_outcomes, leap_run_times = simulate(engine='tau-leaping')
+
+    print('Mean run time (seconds): fixed time-step {:.3f}, adaptive time-step {:.3f}'.format(
+        np.mean(fixed_run_times), np.mean(leap_run_times)))
+
+    n_agreed = 0
+    for key, fixed_values in fixed_outcomes.items():
+        fixed = np.array(fixed_values, dtype=float)
+        diffs = np.array(leap_outcomes[key], dtype=float) - fixed
+        # (trajectories where an outcome is not defined are excluded)
+        diffs = diffs[~np.isnan(diffs)]
+        margin = MARGIN * abs(np.nanmean(fixed))
+        if_agree = if_equivalent(diffs=diffs, margin=margin, alpha=ALPHA) if len(diffs) > 1 else False
+        n_agreed += if_agree
+        print('{}: mean {:.4g} (fixed), mean difference {:.4g}, margin {:.4g} {}'.format(
+            key, np.nanmean(fixed), diffs.mean(), margin, '' if if_agree else '(does not agree)'))
+
+    print('{} of {} outcomes agree.'.format(n_agreed, len(fixed_outcomes)))
@@ -1,7 +1,8 @@
-import apacepy.calibration as calib
 from deampy.in_out_functions import TextFile
 
-from definitions import get_scenario_name, ROOT_DIR, SIM_DURATION
+from definitions import get_scenario_name, SIM_DURATION, get_run_path
+from model.atomic_io import atomic_output
+from model.calibration import CalibrationWithModelTemplates, CalibrationWithScreenedPriors, CalibrationWithSMC
 from model.model_settings import GonoSettings
 from model.model_structure import build_model
 from model.support import estimate_parameters, simulate_calibrated_model
@@ -15,11 +16,44 @@ To calibrate the model under scenarios:
 """
 
 RUN_IN_PARALLEL = True
-N_OF_CALIBRATION_ITERATIONS = 16*100    # total number of trajectories to simulate as part of calibration
+# 'random sampling': to simulate prior draws until feasible trajectories are found
+# 'screened priors': to simulate prior draws that are screened by the mean-field model
+# 'smc': to calibrate by sequential Monte Carlo approximate Bayesian computation (ABC-SMC)
+CALIBRATION_METHOD = 'smc'
+N_OF_SMC_POPULATIONS = 4    # number of populations of particles (if calibrating by ABC-SMC)
+N_OF_CALIBRATION_ITERATIONS = 16*100    # total number of trajectories to keep (particles per population for ABC-SMC)
 N_OF_TRAJS_TO_USE_FOR_SIMULATION = 200   # number of trajectories with the highest likelihood to keep
 N_OF_RESAMPLES_FOR_PARAM_ESTIMATION = 200  # number of parameter values to resample for parameter estimation
 
 
+def write_stats(calibration, file_name):
+    """ writes the summary of a calibration into a text file
+    :param calibration: (CalibrationWithModelTemplates) a completed calibration
+    :param file_name: (string) name of the text file
+    """
+
+    file = TextFile(filename=file_name)
+    file.write('Number of calibration iterations: {}\n'.format(N_OF_CALIBRATION_ITERATIONS))
+    file.write('Number of trajectories discarded: {}\n'.format(calibration.nTrajsDiscarded))
+    if CALIBRATION_METHOD in ('screened priors', 'smc'):
+        file.write('Number of prior draws screened: {}\n'.format(calibration.nDrawsScreened))
+        file.write('Number of prior draws with feasible mean-field trajectories: {}\n'.format(
+            calibration.nFeasibleDraws))
+        file.write('Number of prior draws screened out (not simulated): {}\n'.format(calibration.nDrawsScreenedOut))
+        file.write('Time to sample prior draws (seconds): {}\n'.format(round(calibration.samplingTime, 1)))
+    if CALIBRATION_METHOD == 'smc':
+        file.write('Number of simulated trajectories: {}\n'.format(calibration.nSimulations))
+        file.write('Tolerances of populations (-lnL): {}\n'.format(
+            ', '.join('{:.2f}'.format(t) for t in calibration.tolerances)))
+        file.write('Effective sample size: {:.1f}\n'.format(calibration.effectiveSampleSize))
+    for name, (n, mean_abort_time) in calibration.get_summary_of_violations().items():
+        file.write("Number of infeasible trajectories aborted due to '{}': {} (mean abort time: {:.1f} years)\n"
+                   .format(name, n, mean_abort_time))
+    file.write('Calibration duration (seconds): {}\n'.format(round(calibration.runTime, 1)))
+    file.write('Number of trajectories with non-zero probability: {}\n'.format(calibration.nTrajsWithNonZeroProb))
+    file.close()
+
+
 def calibrate(if_m_available, calibration_seed, if_wider_priors=False):
     """ calibrate and simulate the calibrated model
     :param if_m_available: (bool) if M is available for first-line therapy
@@ -42,7 +76,18 @@ def calibrate(if_m_available, calibration_seed, if_wider_priors=False):
 
     # --------- calibration ----------
     # calibrate the model
-    calibration = calib.CalibrationWithRandomSampling(model_settings=sets, max_tries=200)
+    # outputs of simulated trajectories are stored in a checkpoint file as they are simulated
+    # (re-running the calibration of this scenario resumes it and running it with more iterations extends it)
+    checkpoint_file = sets.folderToSaveCalibrationResults + '/checkpoint-{}.csv'.format(CALIBRATION_METHOD)
+    if CALIBRATION_METHOD == 'smc':
+        calibration = CalibrationWithSMC(model_settings=sets, n_populations=N_OF_SMC_POPULATIONS, max_tries=200,
+                                         checkpoint_file=checkpoint_file)
+    elif CALIBRATION_METHOD == 'screened priors':
+        calibration = CalibrationWithScreenedPriors(model_settings=sets, max_tries=200,
+                                                    checkpoint_file=checkpoint_file)
+    else:
+        calibration = CalibrationWithModelTemplates(model_settings=sets, max_tries=200,
+                                                    checkpoint_file=checkpoint_file)
 
     calibration.run(
         function_to_populate_model=build_model,
@@ -54,12 +99,9 @@ def calibrate(if_m_available, calibration_seed, if_wider_priors=False):
     print('Run time: {:.2f} seconds for {} trajectories.'.format(calibration.runTime, N_OF_CALIBRATION_ITERATIONS))
 
     # store summary of calibration
-    file = TextFile(filename=ROOT_DIR+'/analysis/outputs/calib-{}/calibration/stats.txt'.format(scenario_name))
-    file.write('Number of calibration iterations: {}\n'.format(N_OF_CALIBRATION_ITERATIONS))
-    file.write('Number of trajectories discarded: {}\n'.format(calibration.nTrajsDiscarded))
-    file.write('Calibration duration (seconds): {}\n'.format(round(calibration.runTime, 1)))
-    file.write('Number of trajectories with non-zero probability: {}\n'.format(calibration.nTrajsWithNonZeroProb))
-    file.close()
+    stats_file = sets.folderToSaveCalibrationResults + '/stats.txt'
+    with atomic_output(stats_file) as temp_file_name:
+        write_stats(calibration=calibration, file_name=temp_file_name)
 
     # save calibration results
     calibration.save_results()
@@ -68,7 +110,7 @@ def calibrate(if_m_available, calibration_seed, if_wider_priors=False):
     estimate_parameters(n_of_resamples=N_OF_RESAMPLES_FOR_PARAM_ESTIMATION,
                         calibration_summary_file=sets.folderToSaveCalibrationResults+'/calibration_summary.csv',
                         calibration_folder=sets.folderToSaveCalibrationResults,
-                        figure_folder='figures/calib-'+scenario_name)
+                        figure_folder=get_run_path('figures/calib-'+scenario_name))
 
     # simulate the calibrated model
     sets = GonoSettings(if_calibrating=False, collect_traj_of_comparts=True,
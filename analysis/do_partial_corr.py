@@ -1,8 +1,8 @@
-from apacepy.analysis.scenarios import ScenarioDataFrame
 from deampy.in_out_functions import read_csv_cols_to_dictionary
 
 from definitions import ROOT_DIR, EFFECT_OUTCOME, COST_OUTCOME
 from model.scenario_and_sensitivity_analyses import print_corr
+from model.scenario_store import get_scenarios_df
 
 param_csvfile = ROOT_DIR + '/analysis/outputs/with M-25yrs/summary/parameter_values.csv'
 
@@ -53,7 +53,7 @@ dict_params = read_csv_cols_to_dictionary(file_name=param_csvfile, if_convert_fl
 dict_select_params = {k: dict_params[k] for k in selected_params}
 
 # read the simulation scenarios
-scenarios = ScenarioDataFrame(
+scenarios = get_scenarios_df(
     csv_file_name=ROOT_DIR+'/analysis/outputs/with M-25yrs/scenarios/simulated_scenarios.csv')
 
 # correlation for lifespan
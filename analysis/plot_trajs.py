@@ -1,6 +1,6 @@
 import matplotlib
 
-from definitions import get_scenario_name, get_traj_fig_name, SIM_DURATION
+from definitions import get_scenario_name, get_traj_fig_name, SIM_DURATION, get_run_path
 from model.plots import plot_trajectories
 
 matplotlib.rcParams['axes.spines.right'] = False
@@ -21,8 +21,8 @@ def plot_simulated_trajs(
                                       calibration_seed=None,
                                       if_wider_priors=if_wider_priors)
 
-    dir_of_traj_files = 'outputs/sim-{}/trajectories'.format(scenario_name)
-    dir_of_traj_figs = 'figures/sim-{}/trajs'.format(scenario_name)
+    dir_of_traj_files = get_run_path('outputs/sim-{}/trajectories'.format(scenario_name))
+    dir_of_traj_figs = get_run_path('figures/sim-{}/trajs'.format(scenario_name))
 
     figure_filename = get_traj_fig_name(
         if_m_available=if_m_available, dict_test_characts=dict_test_characts, transmission_factor=transmission_factor)
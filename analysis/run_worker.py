@@ -0,0 +1,28 @@
+import multiprocessing as mp
+import os
+
+from model.work_queue import work
+from model.worker_pool import WORK_QUEUE_ENV
+
+"""
+To run the jobs (trajectories, scenarios of seeds) that sessions publish to a work queue.
+Sessions (e.g. calibrate.py, sim_scenarios.py, sim_calibrated_model.py) send their jobs to the queue
+when the environment variable GONO_WORK_QUEUE is set to the folder of the queue. To run the jobs on other hosts,
+run this script on each host (from the analysis folder on a shared file system) with the same GONO_WORK_QUEUE
+(and GONO_RUN_ROOT, if set), e.g.
+    GONO_WORK_QUEUE=outputs/queue python run_worker.py
+"""
+
+N_PROCESSES = mp.cpu_count()  # number of worker processes to run on this host
+POLL_INTERVAL = 1  # seconds to wait before looking for new jobs when the queue is empty
+MAX_IDLE_TIME = None  # seconds to wait for new jobs before stopping (if None, workers never stop)
+
+
+if __name__ == "__main__":
+
+    folder = os.environ[WORK_QUEUE_ENV]
+    processes = [mp.Process(target=work, args=(folder, POLL_INTERVAL, MAX_IDLE_TIME)) for i in range(N_PROCESSES)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
@@ -1,7 +1,7 @@
-import sys
+from contextlib import redirect_stdout
 
-from deampy.in_out_functions import make_directory
-from definitions import SIM_DURATION, ROOT_DIR, TRANSMISSION_FACTOR_VALUES, get_traj_fig_name
+from definitions import SIM_DURATION, TRANSMISSION_FACTOR_VALUES, get_traj_fig_name, get_run_path
+from model.atomic_io import atomic_output
 from model.model_settings import GonoSettings
 from model.support import simulate_calibrated_model
 
@@ -53,23 +53,22 @@ def simulate_calibrated(dict_test_characts=None,
 
 if __name__ == "__main__":
 
-    make_directory(ROOT_DIR + '/analysis/outputs/')
-    sys.stdout = open(ROOT_DIR + '/analysis/outputs/summary_simulating_calibrated_models.txt', 'w')
+    # the summary is printed to a temporary file that replaces the summary file once all models are simulated
+    with atomic_output(get_run_path('outputs/summary_simulating_calibrated_models.txt')) as temp_file_name:
+        with open(temp_file_name, 'w') as file, redirect_stdout(file):
 
-    # base (M is available)
-    simulate_calibrated(if_m_available=True)
+            # base (M is available)
+            simulate_calibrated(if_m_available=True)
 
-    # M and rapid DST is available
-    simulate_calibrated(if_m_available=True, dict_test_characts={'coverage': 0.75})
+            # M and rapid DST is available
+            simulate_calibrated(if_m_available=True, dict_test_characts={'coverage': 0.75})
 
-    # worst-case scenario (neither M nor rapid DST is available)
-    simulate_calibrated(if_m_available=False)
+            # worst-case scenario (neither M nor rapid DST is available)
+            simulate_calibrated(if_m_available=False)
 
-    # M not available but rapid DST is available
-    simulate_calibrated(if_m_available=False, dict_test_characts={'coverage': 0.75})
+            # M not available but rapid DST is available
+            simulate_calibrated(if_m_available=False, dict_test_characts={'coverage': 0.75})
 
-    # change in transmission factor
-    simulate_calibrated(if_m_available=True, transmission_factor=TRANSMISSION_FACTOR_VALUES[0])
-    simulate_calibrated(if_m_available=True, transmission_factor=TRANSMISSION_FACTOR_VALUES[-1])
-
-    sys.stdout.close()
+            # change in transmission factor
+            simulate_calibrated(if_m_available=True, transmission_factor=TRANSMISSION_FACTOR_VALUES[0])
+            simulate_calibrated(if_m_available=True, transmission_factor=TRANSMISSION_FACTOR_VALUES[-1])
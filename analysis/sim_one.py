@@ -1,8 +1,8 @@
-from apacepy.epidemic import EpiModel
-
 from model.model_settings import GonoSettings
 from model.model_structure import build_model
 from model.plots import plot_trajectories
+from model.template_epidemics import get_model_class
+from model.trajectory_store import get_trajectory_columns, write_trajectories
 
 # if drug M can be used for 1st line therapy
 IF_M_AVAILABLE_FOR_FIRST_TX = True
@@ -20,14 +20,18 @@ sets.update_settings(cip_sens=CIP_SENS, cip_spec=CIP_SPEC,
                      transmission_factor=1.0)
 
 # make an (empty) epidemic model
-model = EpiModel(id=1, settings=sets)
+model = get_model_class(sets)(id=1, settings=sets)
 # populate the model with the gonorrhea model
 build_model(model)
 
 # simulate
 model.simulate(seed=720098724)
 # export trajectories
-model.export_trajectories()
+if sets.trajectoryFormat == 'csv':
+    model.export_trajectories()
+else:
+    write_trajectories(folder=sets.folderToSaveTrajs, ids=[model.id], seeds=[model.seed],
+                       list_of_columns=[get_trajectory_columns(model=model)])
 
 # file name
 if IF_M_AVAILABLE_FOR_FIRST_TX:
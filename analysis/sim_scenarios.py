@@ -2,35 +2,43 @@ import warnings
 
 import apacepy.calibration as calib
 from analyze_and_plot_scenarios import export_summary_and_plots_for_varying_coverage, plot_by_sens_spec
-from apacepy.scenario_simulation import ScenarioSimulator
 from definitions import get_sens_analysis_names_and_definitions, SIM_DURATION
+from model.calibration import read_param_values_by_seed
+from model.forked_scenarios import ForkedScenarioSimulator
+from model.model_parameters import Parameters
 from model.model_settings import GonoSettings
 from model.model_structure import build_model
+from model.result_cache import ScenarioResultCache
+from model.scenario_scheduler import ScenarioScheduler
+from model.scenario_and_sensitivity_analyses import get_scenarios_csv_filename_and_fig_filename
 
 warnings.filterwarnings("ignore")
 
 """
 To simulate and plot the impact of rapid tests with different characteristics
 The results will be saved under outputs/(with or no)-M/scenarios
+(of the root folder set by the environment variable GONO_RUN_ROOT, if any, see definitions.get_run_path)
 """
 
 N_OF_SIMS = 250
 RUN_IN_PARALLEL = True
-
-
-def simulate_scenarios(if_m_available_for_1st_tx, simulation_duration,
-                       vary_sens_spec=False, vary_transm_factor=False,
-                       calibration_seed=None, if_wider_prior=False):
-    """
-    :param if_m_available_for_1st_tx:
-    :param simulation_duration:
-    :param vary_sens_spec: (bool) set true if the analysis should include varying
-        the sensitivity and specificity of the test
-    :param vary_transm_factor: (bool) set true if the analysis should include varying
-        the transmission factor
-    :param calibration_seed:
-    :param if_wider_prior:
-    :return:
+# outputs of simulated (scenario, seed) cells are cached so that re-running only simulates new cells;
+# the cache is shared by all runs (also those with different root folders): its files are named by what
+# their cells depend on, and a file deleted by another run is simulated again (see result_cache)
+CACHE_FOLDER = 'outputs/scenario-cache'
+CACHE_MAX_SIZE = 2 * 1024**3  # disk budget of the cache (bytes)
+# run times of scenarios recorded to simulate the longest trajectories first; the file is shared by all runs,
+# which add their run times to it (see scenario_scheduler.RunTimeRecords)
+RUN_TIMES_FILE = 'outputs/scenario-run-times.csv'
+
+
+def add_scenarios(scheduler, if_m_available_for_1st_tx, simulation_duration,
+                  vary_sens_spec=False, vary_transm_factor=False,
+                  calibration_seed=None, if_wider_prior=False, extended_sim_durations=None):
+    """ adds the scenarios of a configuration to the scheduler (the other arguments are the same as
+    those of simulate_scenarios)
+    :param scheduler: (ScenarioScheduler) scheduler to simulate the scenarios with
+    :return: (ForkedScenarioSimulator) simulator of the scenarios of this configuration
     """
 
     # get model settings
@@ -49,29 +57,70 @@ def simulate_scenarios(if_m_available_for_1st_tx, simulation_duration,
         vary_sens_spec=vary_sens_spec, vary_transm_factor=vary_transm_factor)
 
     # get the seeds and probability weights
-    seeds, lns, weights = calib.get_seeds_lnl_probs(sets.folderToSaveCalibrationResults+'/calibration_summary.csv')
-
-    scenario_sim = ScenarioSimulator(model_settings=sets,
-                                     scenario_names=scenario_names,
-                                     variable_names=var_names,
-                                     scenario_definitions=scenario_definitions)
+    calibration_summary_file = sets.folderToSaveCalibrationResults+'/calibration_summary.csv'
+    seeds, lns, weights = calib.get_seeds_lnl_probs(calibration_summary_file)
+    # calibrated values of parameters with prior distributions (these differ from values sampled for the seeds
+    # if the model was calibrated by CalibrationWithSMC or with prior draws sampled together by ParameterDraws)
+    sets.paramValuesBySeed = read_param_values_by_seed(
+        calibration_summary_file=calibration_summary_file,
+        param_names=list(Parameters(model_sets=sets).get_names_of_priors()))
+
+    # scenarios differ only after the warm-up period (or in the transmission factor),
+    # so each seed is simulated once until the end of the warm-up period and then forked into all scenarios
+    scenario_sim = ForkedScenarioSimulator(model_settings=sets,
+                                           scenario_names=scenario_names,
+                                           variable_names=var_names,
+                                           scenario_definitions=scenario_definitions,
+                                           cache=ScenarioResultCache(
+                                               folder=CACHE_FOLDER,
+                                               calibration_summary_file=calibration_summary_file,
+                                               max_size=CACHE_MAX_SIZE))
+
+    scheduler.add(simulator=scenario_sim,
+                  function_to_populate_model=build_model,
+                  num_of_sims=N_OF_SIMS,
+                  seeds=seeds, weights=weights, sample_seeds_by_weights=False,
+                  extended_sim_durations=extended_sim_durations,
+                  extended_scenario_names=get_sens_analysis_names_and_definitions(
+                      vary_sens_spec=False, vary_transm_factor=vary_transm_factor)[0])
+
+    return scenario_sim
+
+
+def export_scenarios(scenario_sim, if_m_available_for_1st_tx, simulation_duration,
+                     vary_sens_spec=False, vary_transm_factor=False,
+                     calibration_seed=None, if_wider_prior=False, extended_sim_durations=None):
+    """ exports the results, the summary of performance and the plots of simulated scenarios of a configuration
+    (the other arguments are the same as those of simulate_scenarios)
+    :param scenario_sim: (ForkedScenarioSimulator) simulator of the scenarios of this configuration
+    """
 
-    scenario_sim.simulate(function_to_populate_model=build_model,
-                          num_of_sims=N_OF_SIMS,
-                          seeds=seeds, weights=weights, sample_seeds_by_weights=False,
-                          if_run_in_parallel=RUN_IN_PARALLEL,
-                          print_summary_stats=False)
+    # the summary and plots are made from the outcomes of each trajectory
+    if scenario_sim.ifStreaming:
+        raise ValueError('The summary and plots of scenarios cannot be made from the results of '
+                         'the streaming mode (the summary statistics of outcomes).')
 
     # export results of the scenario analysis
-    scenario_sim.export_results()
+    for sim_duration in [simulation_duration] + (extended_sim_durations or []):
+        csv_file_name, fig_file_name = get_scenarios_csv_filename_and_fig_filename(
+            if_m_available_for_1st_tx=if_m_available_for_1st_tx,
+            sim_duration=sim_duration,
+            calibration_seed=calibration_seed,
+            varying_trans_factor=vary_transm_factor,
+            if_wider_priors=if_wider_prior)
+        if sim_duration == simulation_duration:
+            scenario_sim.export_results(filename=csv_file_name)
+        else:
+            scenario_sim.export_extended_results(sim_duration=sim_duration, filename=csv_file_name)
 
     # export the summary of performance and cost-effectiveness plots
-    export_summary_and_plots_for_varying_coverage(
-        if_m_available=if_m_available_for_1st_tx,
-        simulation_duration=simulation_duration,
-        calibration_seed=calibration_seed,
-        varying_trans_factor=vary_transm_factor,
-        if_wider_priors=if_wider_prior)
+    for sim_duration in [simulation_duration] + (extended_sim_durations or []):
+        export_summary_and_plots_for_varying_coverage(
+            if_m_available=if_m_available_for_1st_tx,
+            simulation_duration=sim_duration,
+            calibration_seed=calibration_seed,
+            varying_trans_factor=vary_transm_factor,
+            if_wider_priors=if_wider_prior)
 
     if vary_sens_spec:
         plot_by_sens_spec(
@@ -80,30 +129,65 @@ def simulate_scenarios(if_m_available_for_1st_tx, simulation_duration,
             calibration_seed=calibration_seed)
 
 
-if __name__ == "__main__":
-
-    print('\n*** M is available for 1st Tx ***')
-    simulate_scenarios(if_m_available_for_1st_tx=True, simulation_duration=SIM_DURATION,
-                       vary_sens_spec=True)
-
-    print('\n*** M is available for 1st Tx with simulation duration of 35 years ***')
-    simulate_scenarios(if_m_available_for_1st_tx=True, simulation_duration=35)
+def simulate_scenarios(if_m_available_for_1st_tx, simulation_duration,
+                       vary_sens_spec=False, vary_transm_factor=False,
+                       calibration_seed=None, if_wider_prior=False, extended_sim_durations=None):
+    """
+    :param if_m_available_for_1st_tx:
+    :param simulation_duration:
+    :param vary_sens_spec: (bool) set true if the analysis should include varying
+        the sensitivity and specificity of the test
+    :param vary_transm_factor: (bool) set true if the analysis should include varying
+        the transmission factor
+    :param calibration_seed:
+    :param if_wider_prior:
+    :param extended_sim_durations: (list) of longer simulation durations to also simulate the scenarios
+        (except those varying the sensitivity and specificity of the test) for by continuing
+        the trajectories simulated for simulation_duration
+    :return:
+    """
 
-    for m in (True, False):
-        print('\n*** M is available/unavailable for 1st Tx with varying transmission factor ***')
-        simulate_scenarios(if_m_available_for_1st_tx=m, simulation_duration=SIM_DURATION,
-                           vary_transm_factor=True)
+    configuration = dict(if_m_available_for_1st_tx=if_m_available_for_1st_tx,
+                         simulation_duration=simulation_duration,
+                         vary_sens_spec=vary_sens_spec, vary_transm_factor=vary_transm_factor,
+                         calibration_seed=calibration_seed, if_wider_prior=if_wider_prior,
+                         extended_sim_durations=extended_sim_durations)
 
-        print('\n*** M is available/unavailable for 1st Tx with wider priors ***')
-        simulate_scenarios(if_m_available_for_1st_tx=m, simulation_duration=SIM_DURATION,
-                           if_wider_prior=True)
+    scheduler = ScenarioScheduler(run_times_file=RUN_TIMES_FILE)
+    scenario_sim = add_scenarios(scheduler=scheduler, **configuration)
+    scheduler.simulate(if_run_in_parallel=RUN_IN_PARALLEL, print_summary_stats=False)
+    export_scenarios(scenario_sim=scenario_sim, **configuration)
 
-    print('\n*** M is available for 1st Tx with a new initial calibration seed ***')
-    simulate_scenarios(if_m_available_for_1st_tx=True, simulation_duration=SIM_DURATION,
-                       calibration_seed=1)
 
-    print('\n*** M is not available for 1st Tx***')
-    simulate_scenarios(if_m_available_for_1st_tx=False, simulation_duration=SIM_DURATION)
+if __name__ == "__main__":
 
-    print('\n*** M is not available for 1st Tx with simulation duration of 35 years ***')
-    simulate_scenarios(if_m_available_for_1st_tx=False, simulation_duration=35)
+    # configurations to simulate
+    # (scenarios with simulation duration of 35 years continue the trajectories of those with 25 years)
+    configurations = {
+        'M is available for 1st Tx (with simulation duration of 25 and 35 years)':
+            dict(if_m_available_for_1st_tx=True, vary_sens_spec=True, extended_sim_durations=[35]),
+        'M is available for 1st Tx with varying transmission factor':
+            dict(if_m_available_for_1st_tx=True, vary_transm_factor=True),
+        'M is available for 1st Tx with wider priors':
+            dict(if_m_available_for_1st_tx=True, if_wider_prior=True),
+        'M is unavailable for 1st Tx with varying transmission factor':
+            dict(if_m_available_for_1st_tx=False, vary_transm_factor=True),
+        'M is unavailable for 1st Tx with wider priors':
+            dict(if_m_available_for_1st_tx=False, if_wider_prior=True),
+        'M is available for 1st Tx with a new initial calibration seed':
+            dict(if_m_available_for_1st_tx=True, calibration_seed=1),
+        'M is not available for 1st Tx (with simulation duration of 25 and 35 years)':
+            dict(if_m_available_for_1st_tx=False, extended_sim_durations=[35]),
+    }
+
+    # the trajectories of all configurations are simulated together (the longest first)
+    # so that processes are not left idle at the end of each configuration
+    scheduler = ScenarioScheduler(run_times_file=RUN_TIMES_FILE)
+    simulators = dict()
+    for title, configuration in configurations.items():
+        simulators[title] = add_scenarios(scheduler=scheduler, simulation_duration=SIM_DURATION, **configuration)
+    scheduler.simulate(if_run_in_parallel=RUN_IN_PARALLEL, print_summary_stats=False)
+
+    for title, configuration in configurations.items():
+        print('\n*** {} ***'.format(title))
+        export_scenarios(scenario_sim=simulators[title], simulation_duration=SIM_DURATION, **configuration)
@@ -5,6 +5,10 @@ from scipy.stats import norm
 
 FIG_EXT = 'png'  # 'png'
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+# environment variable with the root folder of the outputs and figures of a run (see get_run_path)
+RUN_ROOT_ENV = 'GONO_RUN_ROOT'
+# (value of RUN_ROOT_ENV, root folder resolved from it) of this process (see get_run_root)
+_runRoot = None
 
 SIM_DURATION = 25
 END_OF_WARM_UP = 1
@@ -56,6 +60,55 @@ REST_PROFILES = ['CIP-S, TET-S, CRO-S',        # SUSP
 ANTIBIOTICS = ['CIP', 'TET', 'CRO']
 
 
+def get_run_root():
+    """
+    :return: (string) root folder of the outputs and figures of this run ('' if outputs and figures are saved
+        under the current folder, which is the default); runs with different roots can write their
+        outputs concurrently without overwriting each other's files
+    """
+
+    global _runRoot
+    run_root = os.environ.get(RUN_ROOT_ENV, '')
+    # resolved only the first time the environment variable is read with this value
+    # (e.g. a root set in the shell or inherited from the process that started this one)
+    if _runRoot is None or _runRoot[0] != run_root:
+        _runRoot = run_root, _resolve_run_root(run_root=run_root)
+    return _runRoot[1]
+
+
+def set_run_root(run_root):
+    """ sets the root folder of the outputs and figures of this run
+    (processes started afterwards, e.g. the processes of worker_pool, inherit it)
+    :param run_root: (string) root folder ('' to save outputs and figures under the current folder)
+    """
+
+    global _runRoot
+    if run_root != '':
+        run_root = os.path.abspath(run_root)
+    os.environ[RUN_ROOT_ENV] = run_root
+    _runRoot = run_root, _resolve_run_root(run_root=run_root)
+
+
+def _resolve_run_root(run_root):
+    """
+    :param run_root: (string) root folder
+    :return: (string) the root folder relative to the current folder if it is absolute
+        (see model/atomic_io for why file names are relative); the root folder is resolved once,
+        so it does not change if the current folder changes afterwards
+    """
+
+    return os.path.relpath(run_root) if os.path.isabs(run_root) else run_root
+
+
+def get_run_path(path):
+    """
+    :param path: (string) path of an output or figure (e.g. 'outputs/sim-with M/summary')
+    :return: (string) the path under the root folder of this run
+    """
+
+    return os.path.join(get_run_root(), path)
+
+
 class SympStat(Enum):
     SYMP = 0
     ASYM = 1
@@ -0,0 +1,132 @@
+from apacepy.epidemic import EpiModel
+
+"""
+Epidemic model that only evaluates the compartments and chance nodes that can move members.
+EpiModel goes over all compartments and chance nodes at each pass of a simulation time-step (a time-step
+has a pass over compartments and then passes over chance nodes until all chance nodes are empty), even though
+most of them are empty: the compartments of resistance profiles that have not emerged yet (and that are
+emptied when a profile dies out) and the chance nodes that no member reached in the previous pass.
+ActiveSetEpiModel keeps
+    - an active set of compartments (non-empty compartments and compartments with Poisson events),
+      a compartment joins the set when members first arrive and leaves it when it is found empty,
+    - the set of chance nodes that members reached in the previous pass,
+and at each pass only samples the members leaving these nodes and only updates the nodes these members
+can reach (the destinations of their events or outcomes).
+Nodes are sampled in the order of EpiModel and empty nodes do not use random numbers, so trajectories are
+the same as those of EpiModel for the same seed.
+Models with queue compartments are simulated as in EpiModel.
+This relies on the following internals of apacepy's EpiModel (checked by tests/test_active_set_model.py,
+which compares the trajectories of both models for the same seeds):
+    - a time-step calls _push_members_forward(nodes) with the compartments and then with the chance nodes,
+    - sample_outgoing of an empty node (without Poisson events) draws no random numbers,
+    - receive_delta_t_incoming of a node with no incoming members only adds 0 to its incidence.
+"""
+
+
+class ActiveSetEpiModel(EpiModel):
+    """ an epidemic model that only evaluates the compartments and chance nodes that can move members """
+
+    def __init__(self, id, settings):
+        """
+        :param id: (int) id of the model
+        :param settings: model settings
+        """
+
+        EpiModel.__init__(self, id=id, settings=settings)
+
+        self._nodes = None  # compartments and then chance nodes (indices of nodes refer to this list)
+        self._destinations = None  # (list) of indices of nodes that members of each node can move to
+        self._ifAlwaysActive = None  # (list) if each node should be sampled even when it is empty
+        self._activeComparts = None  # (list) of indices of compartments in the active set (in order)
+        self._reachedChanceNodes = None  # (set) of indices of chance nodes reached in the previous pass
+
+    def reset(self):
+
+        EpiModel.reset(self)
+        # the first time-step after a reset updates all nodes (as EpiModel does)
+        self._activeComparts = None
+        self._reachedChanceNodes = None
+
+    def _build_graph(self):
+        """ finds the nodes that members of each compartment and chance node can move to """
+
+        self._nodes = self.compartments + self.chanceNodes
+        index_of_nodes = {id(node): i for i, node in enumerate(self._nodes)}
+
+        self._destinations = []
+        self._ifAlwaysActive = []
+        for c in self.compartments:
+            dests = [e.destComp for e in c.epiDepEvents + c.epiIndEvents + c.poissonEvents]
+            self._destinations.append(sorted({index_of_nodes[id(d)] for d in dests if id(d) in index_of_nodes}))
+            # members arriving through Poisson events are sampled even when the compartment is empty
+            self._ifAlwaysActive.append(len(c.poissonEvents) > 0)
+        for c in self.chanceNodes:
+            self._destinations.append(
+                sorted({index_of_nodes[id(d)] for d in c.destComps if d is not None and id(d) in index_of_nodes}))
+            self._ifAlwaysActive.append(False)
+
+    def _push_members_forward(self, nodes):
+
+        if len(self.queueCompartments) > 0:
+            EpiModel._push_members_forward(self, nodes=nodes)
+            return
+
+        if self._activeComparts is None:
+            # the first pass updates all nodes (which also starts their incidence time-series)
+            if self._nodes is None:
+                self._build_graph()
+            EpiModel._push_members_forward(self, nodes=nodes)
+            n_comparts = len(self.compartments)
+            self._activeComparts = [i for i, c in enumerate(self.compartments)
+                                    if c.size > 0 or self._ifAlwaysActive[i]]
+            self._reachedChanceNodes = {n_comparts + j for j, c in enumerate(self.chanceNodes) if c.size > 0}
+            return
+
+        # nodes to sample (in the order of EpiModel)
+        if nodes is self.compartments:
+            indices = self._activeComparts
+            self._activeComparts = []
+        else:
+            indices = sorted(self._reachedChanceNodes)
+        self._reachedChanceNodes = set()
+
+        # find number of outgoing members from each node
+        reached = set()
+        for i in indices:
+            node = self._nodes[i]
+            if node.size > 0 or self._ifAlwaysActive[i]:
+                self._sample_outgoing(i=i)
+                reached.update(self._destinations[i])
+                if nodes is self.compartments:
+                    self._activeComparts.append(i)
+            # (empty compartments leave the active set)
+
+        self._receive_incoming(reached=reached)
+
+    def _sample_outgoing(self, i):
+        """ finds the number of members leaving a node over this time-step (as EpiModel does)
+        :param i: (int) index of the node
+        """
+
+        self._nodes[i].sample_outgoing(rng=self.rng)
+
+    def _receive_incoming(self, reached):
+        """ updates the size of nodes that members can have reached (and the active set of compartments
+        and the set of reached chance nodes)
+        :param reached: (set) of indices of nodes that members can have reached
+        """
+
+        n_comparts = len(self.compartments)
+        joined = False
+        for i in reached:
+            node = self._nodes[i]
+            node.receive_delta_t_incoming()
+            if node.size > 0:
+                if i >= n_comparts:
+                    self._reachedChanceNodes.add(i)
+                elif i not in self._activeComparts:
+                    # a compartment joins the active set when members first arrive
+                    self._activeComparts.append(i)
+                    joined = True
+        if joined:
+            self._activeComparts.sort()
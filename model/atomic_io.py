@@ -0,0 +1,85 @@
+import os
+import socket
+import time
+from contextlib import contextmanager
+
+"""
+Writes output files (csv files, trajectory files, figures, cached results) atomically:
+a file is first written to a temporary file in the same folder, which is then renamed to the file.
+Renaming a file within a folder replaces the existing file at once, so readers (e.g. plotting scripts
+or other runs sharing the folder) never see a partially written file and a run that is interrupted
+leaves the previous version of the file (and not a truncated one).
+Temporary files are named by the host and process that write them so that runs on different
+processes or machines (with a shared file system) do not write to the same temporary file.
+A file that runs update (read, change, and write back) is locked while it is updated (see file_lock),
+so the changes of a run are not lost when another run writes the file at the same time.
+File names passed to deampy or apacepy functions (e.g. write_csv, output_figure) should be relative
+to the current folder (see definitions.get_run_path), as these functions drop the leading '/' of file names.
+"""
+
+
+def get_temp_file_name(file_name):
+    """
+    :param file_name: (string) name of a file
+    :return: (string) name of the temporary file to write this file to by this process
+        (with the same extension, which some writers use to choose the format)
+    """
+
+    root, ext = os.path.splitext(file_name)
+    return '{}.tmp-{}-{}{}'.format(root, socket.gethostname(), os.getpid(), ext)
+
+
+@contextmanager
+def atomic_output(file_name):
+    """ yields the name of a temporary file to write a file to; the temporary file replaces the file
+    when the block exits without an error (and is deleted otherwise)
+    :param file_name: (string) name of the file to write
+    """
+
+    directory = os.path.dirname(file_name)
+    if directory != '':
+        os.makedirs(directory, exist_ok=True)
+
+    temp_file_name = get_temp_file_name(file_name=file_name)
+    try:
+        yield temp_file_name
+        os.replace(temp_file_name, file_name)
+    except BaseException:
+        if os.path.exists(temp_file_name):
+            os.remove(temp_file_name)
+        raise
+
+
+@contextmanager
+def file_lock(file_name, poll_interval=0.05, stale_time=60):
+    """ locks a file (for the processes that lock it with this function) while the block runs
+    by creating a lock file next to it, which only one process can create
+    :param file_name: (string) name of the file to lock
+    :param poll_interval: (float) seconds to wait before trying again to lock a file locked by another process
+    :param stale_time: (float) seconds after which a lock file is removed
+        (e.g. a lock file left by a process that was killed while it held the lock)
+    """
+
+    directory = os.path.dirname(file_name)
+    if directory != '':
+        os.makedirs(directory, exist_ok=True)
+
+    lock_file_name = file_name + '.lock'
+    while True:
+        try:
+            os.close(os.open(lock_file_name, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.stat(lock_file_name).st_mtime > stale_time:
+                    os.remove(lock_file_name)
+                    continue
+            except FileNotFoundError:
+                # released by the process that held the lock
+                continue
+            time.sleep(poll_interval)
+
+    try:
+        yield
+    finally:
+        os.remove(lock_file_name)
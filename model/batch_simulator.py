@@ -0,0 +1,738 @@
+import os
+import time
+
+import numpy as np
+from apacepy.epidemic import EpiModel
+from deampy.in_out_functions import write_dictionary_to_csv, write_columns_to_csv
+from deampy.statistics import SummaryStat
+from deampy.support.simulation import SeedGenerator
+from numpy.random import RandomState
+
+from definitions import RestProfile, AB, SympStat, REST_PROFILES, ANTIBIOTICS, ConvertSympAndResitAndAntiBio
+from model.atomic_io import atomic_output
+from model.compiled_chance_nodes import CompiledChanceNodes
+from model.model_parameters import BatchParameters
+from model.model_structure import build_model
+from model.trajectory_store import write_trajectories, delete_trajectories
+
+"""
+Simulates many trajectories of the gonorrhea model (as defined in model_structure.build_model) at once.
+The sizes of S, Is, and Fs of all trajectories are stored in an array of shape (n_trajs, 33)
+(columns: S, Is by symptom state and resistance profile, Fs by symptom state and resistance profile)
+and all trajectories are advanced together over the simulation time steps.
+The chance nodes of build_model are compiled (see compiled_chance_nodes.py) so that members leaving
+a compartment through an event reach their destination compartments by one multinomial draw.
+The trajectories follow the same transition rules as the EpiModel built by build_model,
+but they are generated by a different random number stream.
+"""
+
+N_SYMP_STATES = len(SympStat)
+N_REST_PROFILES = len(RestProfile)
+N_ABS = len(AB)
+N_STRATA = N_SYMP_STATES * N_REST_PROFILES  # number of (symptom state, resistance profile) strata
+N_COMPARTS = 1 + 2 * N_STRATA  # S, Is, and Fs
+
+IDX_S = 0
+IDX_IS = slice(1, 1 + N_STRATA)
+IDX_FS = slice(1 + N_STRATA, 1 + 2 * N_STRATA)
+IDX_SYMP = slice(0, N_REST_PROFILES)  # strata with symptomatic infections
+IDX_ASYM = slice(N_REST_PROFILES, N_STRATA)  # strata with asymptomatic infections
+
+INTERV_CRO = '1st line therapy with CRO'
+INTERV_M = '1st line therapy with Drug M'
+
+# entry nodes of the compiled chance nodes (nodes that events out of S, Is, and Fs lead to)
+ENTRIES_INFECTION = slice(0, N_REST_PROFILES)  # infection by resistance profile
+ENTRIES_CRO = slice(N_REST_PROFILES, N_REST_PROFILES + N_STRATA)  # rapid test and 1st-line therapy by stratum
+ENTRIES_M = slice(N_REST_PROFILES + N_STRATA, N_REST_PROFILES + 2 * N_STRATA)  # 1st-line therapy with M
+ENTRIES_RETX = slice(N_REST_PROFILES + 2 * N_STRATA, N_REST_PROFILES + 3 * N_STRATA)  # re-treatment by stratum
+N_ENTRIES = N_REST_PROFILES + 3 * N_STRATA
+
+# counted nodes of the compiled chance nodes
+COUNTED_CASES_CRO = slice(0, N_STRATA)  # cases who entered the rapid test/CRO pathway
+COUNTED_CASES_M = slice(N_STRATA, 2 * N_STRATA)  # cases who received M as the 1st-line therapy
+COUNTED_SUCCESS_BY_AB = slice(2 * N_STRATA, 2 * N_STRATA + N_ABS)  # successful treatments by antibiotic
+IDX_COUNTED_SUCCESS = 2 * N_STRATA + N_ABS  # successful treatments with CIP, TET, or CRO
+IDX_COUNTED_TX_M = IDX_COUNTED_SUCCESS + 1  # treatments with M
+IDX_COUNTED_1ST_TX_M = IDX_COUNTED_SUCCESS + 2  # 1st-line treatments with M
+N_COUNTED_NODES = IDX_COUNTED_SUCCESS + 3
+
+
+def _get_strata_by_profile():
+    """ :returns (list) of strata by resistance profile (index of strata for each profile) """
+
+    indexer = ConvertSympAndResitAndAntiBio(n_symp_stats=N_SYMP_STATES, n_rest_profiles=N_REST_PROFILES)
+    strata_by_profile = []
+    for p in range(N_REST_PROFILES):
+        strata_by_profile.append([indexer.get_row_index(symp_state=s, rest_profile=p)
+                                  for s in range(N_SYMP_STATES)])
+    return strata_by_profile
+
+
+STRATA_BY_PROFILE = _get_strata_by_profile()
+
+
+def _get_strata(profiles):
+    """ :returns (list) of strata with the specified resistance profiles """
+    result = []
+    for p in profiles:
+        result.extend(STRATA_BY_PROFILE[p.value])
+    return sorted(result)
+
+
+def _get_dest_of_event(compartment, interv_name):
+    """ :returns (ChanceNode) destination of the event of this compartment that is activated by
+        the intervention with the specified name """
+    for e in compartment.epiIndEvents:
+        if e.intervToActivate is not None and e.intervToActivate.name == interv_name:
+            return e.destComp
+    raise ValueError("Compartment '{}' has no event activated by '{}'.".format(compartment.name, interv_name))
+
+
+def get_entry_and_counted_nodes(model):
+    """
+    :param model: (EpiModel) a model populated by build_model
+    :return: (tuple) of (list) of entry nodes ordered as ENTRIES_* and (list) of counted nodes ordered as COUNTED_*
+    """
+
+    s = model.compartments[IDX_S]
+    i_comparts = model.compartments[IDX_IS]
+    f_comparts = model.compartments[IDX_FS]
+
+    entries_cro = [_get_dest_of_event(compartment=c, interv_name=INTERV_CRO) for c in i_comparts]
+    entries_m = [_get_dest_of_event(compartment=c, interv_name=INTERV_M) for c in i_comparts]
+    entry_nodes = [e.destComp for e in s.epiDepEvents] \
+        + entries_cro + entries_m \
+        + [c.epiIndEvents[0].destComp for c in f_comparts]
+
+    nodes_by_name = {c.name: c for c in model.chanceNodes}
+    counted_nodes = entries_cro + entries_m \
+        + [nodes_by_name['Counting success tx with ' + ANTIBIOTICS[a]] for a in range(N_ABS)] \
+        + [nodes_by_name[name] for name in ('Successful Tx with CIP, TET, or CRO', 'Tx with M', '1st-Tx with M')]
+
+    return entry_nodes, counted_nodes
+
+
+def compile_chance_nodes(model):
+    """
+    :param model: (EpiModel) a model populated by build_model
+    :return: (CompiledChanceNodes) chance nodes of the model compiled with
+        entry nodes ordered as ENTRIES_* and counted nodes ordered as COUNTED_*
+    """
+
+    entry_nodes, counted_nodes = get_entry_and_counted_nodes(model=model)
+    return CompiledChanceNodes(model=model, entry_nodes=entry_nodes, counted_nodes=counted_nodes)
+
+
+# strata of cases counted by the summation time-series (same definitions as in build_model)
+STRATA_OF_CASES = dict()
+STRATA_OF_CASES['New cases'] = list(range(N_STRATA))
+STRATA_OF_CASES['Cases CRO-NS'] = _get_strata(
+    [RestProfile.CRO, RestProfile.CIP_CRO, RestProfile.TET_CRO, RestProfile.CIP_TET_CRO])
+STRATA_OF_CASES['New cases symptomatic'] = list(range(N_REST_PROFILES))
+STRATA_OF_CASES['Cases CIP-S'] = _get_strata(
+    [RestProfile.SUS, RestProfile.TET, RestProfile.CRO, RestProfile.TET_CRO])
+STRATA_OF_CASES['Cases TET-S'] = _get_strata(
+    [RestProfile.SUS, RestProfile.CIP, RestProfile.CRO, RestProfile.CIP_CRO])
+STRATA_OF_CASES['Cases CRO-S'] = _get_strata(
+    [RestProfile.SUS, RestProfile.CIP, RestProfile.TET, RestProfile.CIP_TET])
+STRATA_OF_CASES['Cases CIP/TET-NS'] = _get_strata(
+    [RestProfile.CIP, RestProfile.TET, RestProfile.CIP_TET, RestProfile.CIP_TET_CRO])
+for _p in RestProfile:
+    STRATA_OF_CASES['Cases resistant to ' + REST_PROFILES[_p.value]] = _get_strata([_p])
+
+# ratio time-series (same definitions as in build_model)
+# (name, numerator, denominator, type, if surveyed with noise, if collecting stats after warm-up)
+RATIO_TIME_SERIES = [
+    ('Prevalence', 'Infected', 'Population size', 'prev/prev', False, False),
+    ('Rate of gonorrhea cases', 'New cases', 'Population size', 'incd/prev', False, True),
+    ('Proportion of cases CRO-NS', 'Cases CRO-NS', 'New cases', 'incd/incd', True, False),
+    ('Proportion of cases symptomatic', 'New cases symptomatic', 'New cases', 'incd/incd', False, False),
+    ('Time-averaged proportion of cases CIP-S', 'Cases CIP-S', 'New cases', 'incd/incd', False, True),
+    ('Time-averaged proportion of cases TET-S', 'Cases TET-S', 'New cases', 'incd/incd', False, True),
+    ('Time-averaged proportion of cases CRO-S', 'Cases CRO-S', 'New cases', 'incd/incd', False, True),
+    ('Time-averaged proportion of cases CIP/TET-NS', 'Cases CIP/TET-NS', 'New cases', 'incd/incd', False, True),
+    ('Time-averaged proportion of cases treated successfully with CIP, TET, or CRO',
+     'Treated successfully with CIP, TET, or CRO', 'Cases treated', 'incd/incd', False, True)]
+for _a in range(N_ABS):
+    RATIO_TIME_SERIES.append(
+        ('Time-averaged proportion of cases treated successfully with ' + ANTIBIOTICS[_a],
+         'Cases successfully treated with ' + ANTIBIOTICS[_a], 'Cases treated', 'incd/incd', False, True))
+for _p in range(N_REST_PROFILES):
+    RATIO_TIME_SERIES.append(
+        ('Proportion of cases resistant to ' + REST_PROFILES[_p],
+         'Cases resistant to ' + REST_PROFILES[_p], 'New cases', 'incd/incd', True, False))
+
+
+class BatchEpidemics:
+    """ simulates multiple trajectories of the gonorrhea model together
+    (this is a substitute for apacepy's MultiEpidemics with build_model) """
+
+    def __init__(self, model_settings):
+        """
+        :param model_settings: (GonoSettings) model settings
+        """
+
+        self.modelSets = model_settings
+        self.modelSets.initialize()
+
+        self.params = None  # (BatchParameters)
+        self.rng = None  # random number generator to simulate all trajectories
+
+        # a model populated by build_model (only used for its structure)
+        model = EpiModel(id=0, settings=self.modelSets)
+        build_model(model)
+        # chance nodes of build_model compiled into probabilities of outcomes for each entry node
+        self.chanceNodes = compile_chance_nodes(model=model)
+        # feasibility conditions of ratio time-series (only defined when calibrating)
+        self.feasibleConditions = dict()
+        for r in model.epiHistory.ratioTimeSeries:
+            if r.feasibleConditions is not None:
+                self.feasibleConditions[r.name] = r.feasibleConditions
+        self.outcomeProbs = None  # (np.array of shape (n, n_entries, n_outcomes))
+        self.ifRapidTestAvailable = None  # if the rapid test was available when outcomeProbs was calculated
+        # build_model only registers the features and conditions of its decision rules if M is available for
+        # 1st-line therapy (otherwise they are never evaluated and CRO stays in use)
+        self.ifDecisionConditionsUpdated = len(model.epiHistory.conditions) > 0
+
+        # state of trajectories
+        self.sizes = None  # (np.array of shape (n, N_COMPARTS)) sizes of compartments
+        self.switchCRO = None  # (np.array of bool) if 1st line therapy with CRO is in effect
+        self.switchM = None  # (np.array of bool) if 1st line therapy with M is in effect
+        self.ifMEverSwitchedOn = None  # (np.array of bool) if 1st line therapy with M was ever switched on
+        self.nDeltaTsCROInUse = None  # number of time-steps CRO was used for 1st-line therapy after warm-up
+        self.nDeltaTsMInUse = None  # number of time-steps M was used for 1st-line therapy after warm-up
+
+        # incidence of counted nodes accumulated since the last observation
+        self.nodeIncidence = None  # (n, N_COUNTED_NODES)
+
+        # outputs (recorded at observation times)
+        self.ids = []
+        self.seeds = []
+        self.runTimes = []
+        self.obsTimes = []
+        self.comparts = []  # list of (n, N_COMPARTS) arrays
+        self.prevalences = dict()  # (dictionary) of lists of (n, ) arrays
+        self.incidences = dict()  # (dictionary) of lists of (n, ) arrays
+        self.surveyedRatios = dict()  # (dictionary) of lists of (n, ) arrays of ratios surveyed with noise
+        self.sumTimeSeries = dict()  # (dictionary) of arrays of shape (n, n_obs) with nan for missing values
+        self.ratioTimeSeries = dict()  # (dictionary) of arrays of shape (n, n_obs) with nan for missing values
+        self.surveyedRatioTimeSeries = dict()  # same as above but with survey noise
+        self.dictOfProjectedOutcomes = dict()
+        self.dictOfStatsForProjectedOutcomes = dict()
+        self.statRunTimes = None
+        self.samplingTime = None  # time to sample the parameters of the last batch of trajectories (seconds)
+
+    def simulate(self, n, seeds=None, weights=None, sample_seeds_by_weights=True, initial_seed=None,
+                 if_export_trajs=None, trajs_folder=None, draws=None):
+        """
+        :param n: (int) number of trajectories to simulate
+        :param seeds: (list) of seeds
+        :param weights: (list) probability weights over seeds
+        :param sample_seeds_by_weights: (bool) set to False to only use seeds with positive weights
+        :param initial_seed: (int) to initialize the seed of the RandomState that is used to generate the seeds of
+            simulated trajectories when seeds are not provided and to simulate the batch of trajectories.
+        :param if_export_trajs: (bool) set to True to export simulated trajectories
+        :param trajs_folder: (string) folder to store the simulated trajectories to
+        :param draws: (ParameterDraws) draws of parameters (one per trajectory) to simulate instead of
+            the parameters sampled for each seed
+        """
+
+        run_time = time.time()
+
+        # seeds (generated the same way as MultiEpidemics does)
+        seed_generator = SeedGenerator(seeds=seeds, weights=weights)
+        initial_seed = 0 if initial_seed is None else initial_seed
+        seeds = seed_generator.next_seeds(
+            n=n, rng=RandomState(initial_seed), sample_by_weight=sample_seeds_by_weights)
+
+        self.ids = list(range(n))
+        self.seeds = seeds
+        self.rng = np.random.default_rng(initial_seed)
+
+        # sample parameters
+        self.samplingTime = time.time()
+        self.params = BatchParameters(model_sets=self.modelSets, seeds=seeds, draws=draws)
+        self.samplingTime = time.time() - self.samplingTime
+
+        # simulate
+        self._initialize()
+        n_delta_ts = self.modelSets.nDeltaTsInSimulation
+        n_delta_ts_in_obs_period = self.modelSets.nDeltaTsInObsPeriod
+        for k in range(n_delta_ts + 1):
+            if k % n_delta_ts_in_obs_period == 0:
+                self._record_surveillance(k=k)
+                self._make_decisions(k=k)
+            if k < n_delta_ts:
+                self._update_compartments(k=k)
+
+        self._calculate_outputs()
+
+        # the run time of the batch is divided equally between trajectories
+        run_time = time.time() - run_time
+        self.runTimes = [run_time / n] * n
+        self.statRunTimes = SummaryStat(name='Run time', data=self.runTimes)
+
+        # export trajectories
+        if if_export_trajs is None:
+            if_export_trajs = self.modelSets.exportTrajectories
+        if if_export_trajs:
+            self.export_trajectories(folder=trajs_folder)
+
+    def _initialize(self):
+        """ sets the initial state of all trajectories """
+
+        n = self.params.nTrajs
+
+        self.sizes = np.zeros((n, N_COMPARTS), dtype=np.int64)
+        self.sizes[:, IDX_S] = self.params.sizeS
+        self.sizes[:, IDX_IS] = self.params.sizeIBySympAndRest
+
+        self._initialize_decisions(n=n)
+
+        self.outcomeProbs = None
+        self.ifRapidTestAvailable = None
+        self._reset_incidence()
+
+        self.obsTimes = []
+        self.comparts = []
+        self.prevalences = {'Population size': [], 'Infected': []}
+        self.incidences = dict()
+        self.surveyedRatios = dict()
+
+    def _initialize_decisions(self, n):
+        """ sets the initial status of 1st-line therapies of all trajectories
+        :param n: (int) number of trajectories
+        """
+
+        # CRO is used for 1st-line therapy at the start of the simulation
+        self.switchCRO = np.ones(n, dtype=bool)
+        self.switchM = np.zeros(n, dtype=bool)
+        self.ifMEverSwitchedOn = np.zeros(n, dtype=bool)
+        self.nDeltaTsCROInUse = np.zeros(n, dtype=np.int64)
+        self.nDeltaTsMInUse = np.zeros(n, dtype=np.int64)
+
+    def _reset_incidence(self):
+        """ resets the incidences accumulated since the last observation """
+
+        self.nodeIncidence = np.zeros((self.params.nTrajs, N_COUNTED_NODES), dtype=self.sizes.dtype)
+
+    def _update_compartments(self, k):
+        """ advances all trajectories by one simulation time-step
+        :param k: (int) simulation time index
+        """
+
+        delta_t = self.modelSets.deltaT
+        epi_time = k * delta_t
+        params = self.params
+        sizes = self.sizes
+        n = params.nTrajs
+
+        # change in the size of compartments
+        delta = np.zeros_like(sizes)
+        # number of members entering each entry node of the compiled chance nodes
+        n_in = np.zeros((n, N_ENTRIES), dtype=sizes.dtype)
+
+        # ---- infection ----
+        # force of infection by resistance profile
+        infectivity = params.get_infectivity(time=epi_time)
+        i_plus_f = sizes[:, IDX_IS] + sizes[:, IDX_FS]
+        n_infectious = i_plus_f[:, IDX_SYMP] + i_plus_f[:, IDX_ASYM]
+        rates = infectivity * n_infectious / sizes.sum(axis=1)[:, np.newaxis]
+        new_infections = self._sample_infections(n_susceptible=sizes[:, IDX_S], rates=rates)
+        delta[:, IDX_S] -= new_infections.sum(axis=1)
+        n_in[:, ENTRIES_INFECTION] = new_infections
+
+        # ---- natural recovery, screening, and seeking treatment ----
+        # rates of [natural recovery, screening, seeking treatment] for each stratum
+        rates = np.zeros((n, N_STRATA, 3))
+        rates[:, :, 0] = params.rateNaturalRecovery[:, np.newaxis]
+        rates[:, :, 1] = params.rateScreened[:, np.newaxis]
+        rates[:, IDX_SYMP, 2] = params.rateTreatment[:, np.newaxis]
+        outs = self._sample_exits_of_infected(n_infected=sizes[:, IDX_IS], rates=rates)
+        to_tx = outs[:, :, 1] + outs[:, :, 2]
+        delta[:, IDX_IS] -= outs.sum(axis=2)
+        delta[:, IDX_S] += outs[:, :, 0].sum(axis=1)
+
+        # rapid test and 1st-line therapy with CIP, TET or CRO, or 1st-line therapy with M
+        n_in[:, ENTRIES_CRO] = np.where(self.switchCRO[:, np.newaxis], to_tx, 0)
+        n_in[:, ENTRIES_M] = np.where(self.switchM[:, np.newaxis], to_tx, 0)
+
+        # ---- re-treatment ----
+        prob_retx = 1 - np.exp(-params.rateRetreatment * delta_t)
+        retx = self._sample_retreatments(n_failed=sizes[:, IDX_FS], prob=prob_retx[:, np.newaxis])
+        delta[:, IDX_FS] -= retx
+        n_in[:, ENTRIES_RETX] = retx
+
+        # ---- move members through chance nodes ----
+        to_comparts, to_nodes = self._sample_outcomes_of_chance_nodes(n_in=n_in, epi_time=epi_time)
+        delta += to_comparts
+        self.nodeIncidence += to_nodes
+
+        # update sizes
+        self.sizes += delta
+
+        # utilization of interventions after warm-up
+        if k >= self.modelSets.nDeltaTsInWarmUpPeriod:
+            self.nDeltaTsCROInUse += self.switchCRO
+            self.nDeltaTsMInUse += self.switchM
+
+    def _sample_infections(self, n_susceptible, rates):
+        """
+        :param n_susceptible: (np.array of shape (n, )) size of S
+        :param rates: (np.array of shape (n, N_REST_PROFILES)) force of infection by resistance profile
+        :return: (np.array of shape (n, N_REST_PROFILES)) number of new infections by resistance profile
+        """
+
+        return self._sample_competing_events(sizes=n_susceptible, rates=rates)
+
+    def _sample_exits_of_infected(self, n_infected, rates):
+        """
+        :param n_infected: (np.array of shape (n, N_STRATA)) sizes of Is
+        :param rates: (np.array of shape (n, N_STRATA, 3)) rates of natural recovery, screening,
+            and seeking treatment for each stratum
+        :return: (np.array of shape (n, N_STRATA, 3)) number of members of Is leaving by each event
+        """
+
+        return self._sample_competing_events(sizes=n_infected, rates=rates)
+
+    def _sample_retreatments(self, n_failed, prob):
+        """
+        :param n_failed: (np.array of shape (n, N_STRATA)) sizes of Fs
+        :param prob: (np.array of shape (n, 1)) probability of seeking re-treatment over a time-step
+        :return: (np.array of shape (n, N_STRATA)) number of members of Fs seeking re-treatment
+        """
+
+        return self._sample_binomial(n=n_failed, p=prob)
+
+    def _get_probs_of_competing_events(self, rates):
+        """
+        :param rates: (np.array) rates of competing events out of each compartment (last axis)
+        :return: (np.array) probabilities of leaving by each event over a time-step
+            (the last category is to stay in the compartment)
+        """
+
+        sum_rates = rates.sum(axis=-1)
+        prob_leave = 1 - np.exp(-sum_rates * self.modelSets.deltaT)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            probs = np.where(sum_rates[..., np.newaxis] > 0,
+                             prob_leave[..., np.newaxis] * rates / sum_rates[..., np.newaxis], 0)
+        return np.concatenate((probs, np.maximum(1 - probs.sum(axis=-1), 0)[..., np.newaxis]), axis=-1)
+
+    def _sample_competing_events(self, sizes, rates):
+        """
+        :param sizes: (np.array) number of members in each compartment
+        :param rates: (np.array) rates of competing events out of each compartment (last axis)
+        :return: (np.array) number of members leaving by each event
+        """
+
+        return self.rng.multinomial(sizes, self._get_probs_of_competing_events(rates=rates))[..., :-1]
+
+    def _sample_binomial(self, n, p):
+        """
+        :param n: (np.array) number of trials
+        :param p: (np.array) probability of success
+        :return: (np.array) number of successes
+        """
+
+        return self.rng.binomial(n, p)
+
+    def _sample_outcomes_of_chance_nodes(self, n_in, epi_time):
+        """
+        :param n_in: (np.array of shape (n, n_entries)) number of members entering each entry node
+        :param epi_time: (float) epidemic time
+        :return: (tuple) number of members arriving at each compartment and passing through each counted node
+        """
+
+        return self.chanceNodes.sample_outcomes(
+            rng=self.rng, n_in=n_in, probs=self._get_outcome_probs(epi_time=epi_time))
+
+    def _get_outcome_probs(self, epi_time):
+        """
+        :param epi_time: (float) epidemic time
+        :return: (np.array of shape (n, n_entries, n_outcomes)) probabilities of outcomes of compiled chance nodes
+        """
+
+        # the probability of receiving a rapid test is the only time-dependent probability of chance nodes
+        # (so the probabilities of outcomes only need to be updated when the rapid test becomes available)
+        if_rapid_test_available = epi_time >= self.params.probRapidTestSwitchTime
+        if self.outcomeProbs is None or if_rapid_test_available != self.ifRapidTestAvailable:
+            self.outcomeProbs = self.chanceNodes.get_probs(
+                n=self.params.nTrajs,
+                get_param_values=lambda attr: self.params.get_param_values(attr=attr, time=epi_time))
+            self.ifRapidTestAvailable = if_rapid_test_available
+
+        return self.outcomeProbs
+
+    def _record_surveillance(self, k):
+        """ records prevalence and the incidence over the past observation period
+        :param k: (int) simulation time index
+        """
+
+        self.obsTimes.append(k * self.modelSets.deltaT)
+        if self.modelSets.ifCollectTrajsOfCompartments:
+            self.comparts.append(self.sizes.copy())
+
+        # prevalence
+        self.prevalences['Population size'].append(self.sizes.sum(axis=1))
+        self.prevalences['Infected'].append(self.sizes[:, 1:].sum(axis=1))
+
+        # incidence (not available at time 0)
+        if k == 0:
+            return
+
+        cases = self.nodeIncidence[:, COUNTED_CASES_CRO] + self.nodeIncidence[:, COUNTED_CASES_M]
+        success_by_ab = self.nodeIncidence[:, COUNTED_SUCCESS_BY_AB]
+        success = self.nodeIncidence[:, IDX_COUNTED_SUCCESS]
+        tx_with_m = self.nodeIncidence[:, IDX_COUNTED_TX_M]
+
+        new_incd = dict()
+        for name, strata in STRATA_OF_CASES.items():
+            new_incd[name] = cases[:, strata].sum(axis=1)
+        new_incd['Treated successfully with CIP, TET, or CRO'] = success
+        new_incd['Cases treated'] = success + tx_with_m
+        for a in range(N_ABS):
+            new_incd['Cases successfully treated with ' + ANTIBIOTICS[a]] = success_by_ab[:, a]
+
+        # incidence of counting nodes
+        for a in range(N_ABS):
+            new_incd['To: Counting success tx with ' + ANTIBIOTICS[a]] = success_by_ab[:, a]
+        new_incd['To: Successful Tx with CIP, TET, or CRO'] = success
+        new_incd['To: Tx with M'] = tx_with_m
+        new_incd['To: 1st-Tx with M'] = self.nodeIncidence[:, IDX_COUNTED_1ST_TX_M]
+
+        for name, value in new_incd.items():
+            if name not in self.incidences:
+                # the value at time 0 is missing
+                self.incidences[name] = [np.full(self.params.nTrajs, np.nan)]
+            self.incidences[name].append(value)
+
+        # surveyed ratios with noise
+        for name, numerator, denominator, ratio_type, if_noise, if_stat in RATIO_TIME_SERIES:
+            if if_noise:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    ratio = np.where(new_incd[denominator] > 0, new_incd[numerator] / new_incd[denominator], np.nan)
+                if name not in self.surveyedRatios:
+                    self.surveyedRatios[name] = [np.full(self.params.nTrajs, np.nan)]
+                self.surveyedRatios[name].append(self._add_survey_noise(ratio=ratio))
+
+        self._reset_incidence()
+
+    def _make_decisions(self, k):
+        """ switches 1st-line therapy with CRO and M on or off based on the surveyed % of cases CRO-NS
+        (the decision rules of build_model):
+        CRO is switched off when the surveyed % passes the threshold and is switched back on when it falls below
+        the threshold if M has never been used; if M is available for 1st-line therapy, M is switched on
+        (and stays on) when the surveyed % passes the threshold
+        :param k: (int) simulation time index
+        """
+
+        if k == 0 or not self.ifDecisionConditionsUpdated:
+            return
+
+        # surveyed % of cases non-susceptible to CRO (nan if not surveyed, in which case no switch changes)
+        surveyed = self.surveyedRatios['Proportion of cases CRO-NS'][-1]
+        if_passed = surveyed >= self.modelSets.switchThreshold
+        if_below = surveyed < self.modelSets.switchThreshold
+
+        # CRO is decided before M (as interventions are ordered in build_model)
+        turn_off_cro = self.switchCRO & if_passed
+        turn_on_cro = ~self.switchCRO & if_below & ~self.ifMEverSwitchedOn
+        self.switchCRO[turn_off_cro] = False
+        self.switchCRO[turn_on_cro] = True
+
+        if self.modelSets.ifMAvailableFor1stTx:
+            turn_on_m = ~self.switchM & if_passed
+            self.switchM[turn_on_m] = True
+            self.ifMEverSwitchedOn[turn_on_m] = True
+
+    def _add_survey_noise(self, ratio):
+        """
+        :param ratio: (np.array) ratios (nan if not available)
+        :return: (np.array) surveyed ratios (with the normal noise that RatioTimeSeries adds)
+        """
+
+        st_dev = np.sqrt(np.clip(ratio * (1 - ratio), 0, None) / self.params.surveySize)
+        noise = self.rng.normal(loc=0, scale=np.nan_to_num(st_dev))
+        return np.maximum(ratio + noise, 0)
+
+    def _calculate_outputs(self):
+        """ calculates time-series and the outcomes projected after the warm-up period """
+
+        n_warm_up_obs = int(self.modelSets.nDeltaTsInWarmUpPeriod / self.modelSets.nDeltaTsInObsPeriod)
+
+        self.sumTimeSeries = dict()
+        for name, values in self.prevalences.items():
+            self.sumTimeSeries[name] = np.array(values, dtype=float).T
+        for name, values in self.incidences.items():
+            self.sumTimeSeries[name] = np.array(values, dtype=float).T
+
+        self.ratioTimeSeries = dict()
+        self.surveyedRatioTimeSeries = dict()
+        self.dictOfProjectedOutcomes = dict()
+        for name, numerator, denominator, ratio_type, if_noise, if_stat in RATIO_TIME_SERIES:
+            numer_values = self.sumTimeSeries[numerator]
+            denom_values = self.sumTimeSeries[denominator]
+            if ratio_type == 'incd/prev':
+                # denominator is the prevalence at the beginning of the observation period
+                denom_values = np.concatenate(
+                    (np.full((denom_values.shape[0], 1), np.nan), denom_values[:, :-1]), axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ratios = np.where(denom_values > 0, numer_values / denom_values, np.nan)
+            self.ratioTimeSeries[name] = ratios
+
+            if if_noise:
+                self.surveyedRatioTimeSeries[name] = np.array(self.surveyedRatios[name]).T
+            else:
+                self.surveyedRatioTimeSeries[name] = ratios
+
+            # average ratios after the epidemic warm-up
+            if if_stat:
+                self.dictOfProjectedOutcomes[name + ' (average incidence after epidemic warm-up)'] = \
+                    np.nanmean(ratios[:, n_warm_up_obs:], axis=1).tolist()
+
+        # intervention utilization
+        delta_t = self.modelSets.deltaT
+        self.dictOfProjectedOutcomes['Duration of ' + INTERV_CRO + ' (after epidemic warm-up)'] = \
+            (self.nDeltaTsCROInUse * delta_t).tolist()
+        self.dictOfProjectedOutcomes['Duration of ' + INTERV_M + ' (after epidemic warm-up)'] = \
+            (self.nDeltaTsMInUse * delta_t).tolist()
+
+        self.dictOfStatsForProjectedOutcomes = dict()
+        for key, value in self.dictOfProjectedOutcomes.items():
+            self.dictOfStatsForProjectedOutcomes[key] = SummaryStat(name=key, data=value)
+
+    def get_if_feasible(self):
+        """ :returns (np.array of bool) if each trajectory satisfies the feasibility conditions of
+            ratio time-series (as checked by apacepy's FeasibleConditions) """
+
+        obs_times = np.array(self.obsTimes)
+        if_feasible = np.ones(self.params.nTrajs, dtype=bool)
+        for name, conditions in self.feasibleConditions.items():
+            if conditions.period is None:
+                values = self.ratioTimeSeries[name]
+            else:
+                in_period = (obs_times >= conditions.period[0]) & (obs_times <= conditions.period[1])
+                values = self.ratioTimeSeries[name][:, in_period]
+
+            # missing values (nan) are not checked
+            if conditions.feasibleMin is not None:
+                if_feasible &= ~np.any(values < conditions.feasibleMin, axis=1)
+            if conditions.feasibleMax is not None:
+                if_feasible &= ~np.any(values > conditions.feasibleMax, axis=1)
+            if conditions.minThresholdToHit is not None:
+                if_feasible &= np.any(values >= conditions.minThresholdToHit, axis=1)
+
+        return if_feasible
+
+    def get_dict_summary_and_projections(self):
+
+        # ID, seed, and run-time
+        dict_of_summary = {'ID': self.ids,
+                           'Seed': self.seeds,
+                           'Run time': self.runTimes}
+
+        # other projected outcomes
+        if self.modelSets.storeProjectedOutcomes:
+            for key, value in self.dictOfProjectedOutcomes.items():
+                dict_of_summary[key] = value
+
+        return dict_of_summary
+
+    def save_summary(self, folder_to_save_summary=None):
+        """ exports the summary of simulation into csv files (in the same format as MultiEpidemics):
+            - a file with trajectory id, seeds, run times, and projected outcomes,
+            - a file with parameter values
+        :param folder_to_save_summary: (string) folder to save the summary files to
+        """
+
+        if folder_to_save_summary is None:
+            folder_to_save_summary = self.modelSets.folderToSaveSummary
+
+        with atomic_output(os.path.join(folder_to_save_summary, 'simulation_summary.csv')) as temp_file_name:
+            write_dictionary_to_csv(dictionary=self.get_dict_summary_and_projections(), file_name=temp_file_name)
+
+        if self.modelSets.storeParameterValues:
+            dict_of_param_values = {'ID': self.ids, 'Seed': self.seeds}
+            for param_name, param_values in self.params.dictOfParamValues.items():
+                dict_of_param_values[param_name] = param_values
+
+            with atomic_output(os.path.join(folder_to_save_summary, 'parameter_values.csv')) as temp_file_name:
+                write_dictionary_to_csv(dictionary=dict_of_param_values, file_name=temp_file_name)
+
+    def print_summary_stats(self, interval='p', sig_digits=5):
+        """ prints summary statistics (simulation run-time and projected outcomes)
+        :param interval: 'p' for percentile interval and 'c' for confidence interval
+        :param sig_digits: (int) number of significant digits to use
+        """
+
+        print('\nSimulation run time (seconds):',
+              self.statRunTimes.get_formatted_mean_and_interval(interval_type=interval, deci=sig_digits))
+
+        for key, value in self.dictOfStatsForProjectedOutcomes.items():
+            print(key+': ', value.get_formatted_mean_and_interval(interval_type=interval, sig_digits=sig_digits))
+
+    def export_trajectories(self, folder=None):
+        """ exports simulated trajectories (in the format of model settings: one csv file per trajectory
+        or one 'npz' file for all trajectories) with the column names that apacepy uses
+        (so that they can be read by plots.plot_trajectories)
+        :param folder: (string) folder to store the trajectories to
+        """
+
+        if folder is None:
+            folder = self.modelSets.folderToSaveTrajs
+
+        delete_trajectories(folder=folder)
+
+        indexer = ConvertSympAndResitAndAntiBio(n_symp_stats=N_SYMP_STATES, n_rest_profiles=N_REST_PROFILES)
+        compart_names = ['S']
+        for prefix in ('I ', 'F '):
+            for s in range(N_SYMP_STATES):
+                for p in range(N_REST_PROFILES):
+                    compart_names.append(prefix + indexer.get_str_symp_susp(symp_state=s, rest_profile=p))
+
+        comparts = np.array(self.comparts) if len(self.comparts) > 0 else None
+        obs_periods = list(range(len(self.obsTimes)))
+
+        list_of_columns = []
+        for i in range(len(self.ids)):
+            cols = []
+
+            # time-based outputs
+            cols.append(['Simulation Time'] + self.obsTimes)
+            if comparts is not None:
+                for j, name in enumerate(compart_names):
+                    cols.append(['In: ' + name] + comparts[:, i, j].tolist())
+            for name in self.prevalences:
+                cols.append([name] + self.sumTimeSeries[name][i].tolist())
+            for name, numerator, denominator, ratio_type, if_noise, if_stat in RATIO_TIME_SERIES:
+                if ratio_type == 'prev/prev':
+                    cols.append([name] + self.ratioTimeSeries[name][i].tolist())
+
+            # period-based outputs
+            cols.append(['Simulation Period'] + obs_periods)
+            for name in self.incidences:
+                cols.append([name] + self.sumTimeSeries[name][i].tolist())
+            for name, numerator, denominator, ratio_type, if_noise, if_stat in RATIO_TIME_SERIES:
+                if ratio_type != 'prev/prev':
+                    cols.append([name] + self.ratioTimeSeries[name][i].tolist())
+
+            # surveyed outputs
+            cols.append(['Observation Time'] + self.obsTimes)
+            for name, numerator, denominator, ratio_type, if_noise, if_stat in RATIO_TIME_SERIES:
+                if ratio_type == 'prev/prev':
+                    cols.append(['Obs: ' + name] + self.surveyedRatioTimeSeries[name][i].tolist())
+            cols.append(['Observation Period'] + obs_periods)
+            for name, numerator, denominator, ratio_type, if_noise, if_stat in RATIO_TIME_SERIES:
+                if ratio_type != 'prev/prev':
+                    cols.append(['Obs: ' + name] + self.surveyedRatioTimeSeries[name][i].tolist())
+
+            if self.modelSets.trajectoryFormat == 'csv':
+                file_name = os.path.join(folder, 'trajectory {} - {}.csv'.format(self.ids[i], self.seeds[i]))
+                with atomic_output(file_name) as temp_file_name:
+                    write_columns_to_csv(cols=cols, file_name=temp_file_name, delete_existing_files=False)
+            else:
+                list_of_columns.append(cols)
+
+        if len(list_of_columns) > 0:
+            write_trajectories(folder=folder, ids=self.ids, seeds=self.seeds, list_of_columns=list_of_columns)
@@ -0,0 +1,575 @@
+import time
+import warnings
+
+import apacepy.calibration as calib
+import numpy as np
+from deampy.in_out_functions import read_csv_rows
+from numpy import iinfo, int32
+from numpy.random import RandomState
+from scipy.linalg import solve_triangular
+from scipy.special import expit, logsumexp
+
+from model.atomic_io import atomic_output
+from model.checkpoint import CalibrationCheckpoint
+from model.mean_field_simulator import MeanFieldEpidemics
+from model.model_parameters import Parameters, ParameterDraws
+from model.template_epidemics import TemplateMultiEpidemics
+
+
+class CalibrationWithModelTemplates(calib.CalibrationWithRandomSampling):
+    """ calibration by random sampling where each process populates the model only once
+    and re-simulates it for every trajectory (see TemplateMultiEpidemics) """
+
+    def __init__(self, model_settings, parallelization_approach='few-many', max_tries=100, checkpoint_file=None):
+        """
+        :param model_settings: (GonoSettings) model settings
+        :param parallelization_approach: (string) 'few-many' or 'many-once' (see CalibrationWithRandomSampling)
+        :param max_tries: (int) maximum number of simulation runs to try to find a feasible trajectory
+            when 'few-many' option is selected
+        :param checkpoint_file: (string) file to store the outputs of simulated trajectories in
+            (to resume or extend the calibration; see CalibrationCheckpoint)
+        """
+
+        calib.CalibrationWithRandomSampling.__init__(
+            self, model_settings=model_settings,
+            parallelization_approach=parallelization_approach, max_tries=max_tries)
+
+        self.checkpoint = None if checkpoint_file is None else CalibrationCheckpoint(file_name=checkpoint_file)
+        self.multiModel = TemplateMultiEpidemics(model_settings=self.sets, checkpoint=self.checkpoint)
+        # (name of the violated time-series, abort time) of each infeasible trajectory simulated
+        self.violations = []
+
+    def run(self, function_to_populate_model, num_of_iterations, initial_seed=None, if_run_in_parallel=True):
+        """ (the arguments are the same as those of CalibrationWithRandomSampling.run) """
+
+        calib.CalibrationWithRandomSampling.run(
+            self, function_to_populate_model=function_to_populate_model, num_of_iterations=num_of_iterations,
+            initial_seed=initial_seed, if_run_in_parallel=if_run_in_parallel)
+        self.violations = list(self.multiModel.violations)
+
+    def save_results(self, filename=None):
+        """ saves the calibration results (as CalibrationWithRandomSampling.save_results does) by writing
+        to a temporary file first (see atomic_io)
+        :param filename: (string) csv file to save the results in
+            (if None, calibration_summary.csv in the folder to save calibration results)
+        """
+
+        if filename is None:
+            filename = self.sets.folderToSaveCalibrationResults + '/calibration_summary.csv'
+        with atomic_output(filename) as temp_file_name:
+            calib.CalibrationWithRandomSampling.save_results(self, filename=temp_file_name)
+
+    def get_summary_of_violations(self):
+        """
+        :return: (dictionary) of (number of infeasible trajectories, mean abort time) keyed by
+            the name of the time-series whose feasible conditions were violated first
+        """
+
+        abort_times = dict()
+        for name, t in self.violations:
+            abort_times.setdefault(name, []).append(t)
+        return {name: (len(times), np.mean(times)) for name, times in abort_times.items()}
+
+
+class CalibrationWithScreenedPriors(CalibrationWithModelTemplates):
+    """ calibration by random sampling where prior draws (sampled together, see ParameterDraws) are first
+    screened by the mean-field model: draws with feasible mean-field trajectories are always simulated by
+    the stochastic model, while the other draws are only simulated with probability probSimulatingScreenedOut.
+    The mean-field model is only a cheap pre-filter: a draw whose mean-field trajectory is infeasible may still
+    have feasible stochastic trajectories (e.g. when CRO-NS emerges by chance), so simulated draws are weighted
+    by the inverse of the probability of simulating them. Probabilities in calibration_summary.csv are then
+    proportional to this weight times the likelihood, which approximates the same posterior as random sampling
+    (the screening only reduces the number of simulations spent on draws that are likely infeasible). """
+
+    def __init__(self, model_settings, max_tries=100, prob_simulating_screened_out=0.1,
+                 screening_batch_size=1000, checkpoint_file=None):
+        """
+        :param model_settings: (GonoSettings) model settings
+        :param max_tries: (int) maximum number of prior draws to screen for each calibration iteration
+        :param prob_simulating_screened_out: (float) probability of simulating a prior draw whose mean-field
+            trajectory is infeasible (must be in (0, 1]; smaller values save more simulations but
+            increase the variability of the weights of simulated draws)
+        :param screening_batch_size: (int) number of prior draws to screen together
+        :param checkpoint_file: (string) file to store the outputs of simulated trajectories in
+        """
+
+        if not 0 < prob_simulating_screened_out <= 1:
+            raise ValueError('The probability of simulating screened-out draws should be in (0, 1].')
+
+        CalibrationWithModelTemplates.__init__(
+            self, model_settings=model_settings, parallelization_approach='many-once', max_tries=max_tries,
+            checkpoint_file=checkpoint_file)
+
+        # values of parameters are needed to simulate the prior draws again (see ParameterDraws)
+        self.sets.storeParameterValues = True
+        self.ifSaveParamValues = True
+
+        self.probSimulatingScreenedOut = prob_simulating_screened_out
+        self.screeningBatchSize = screening_batch_size
+        self.meanField = None  # (MeanFieldEpidemics) to screen prior draws
+        self.nDrawsScreened = 0
+        self.nFeasibleDraws = 0  # number of screened draws with feasible mean-field trajectories
+        self.nDrawsScreenedOut = 0  # number of screened draws that were not simulated
+        self.samplingTime = 0  # time to sample prior draws (seconds)
+        # values of parameters with prior distributions of simulated draws (keyed by seed)
+        self.priorValuesBySeed = dict()
+        # probability that each simulated draw (keyed by seed) was selected for simulation after screening
+        self.probsOfSimulatingBySeed = dict()
+
+    def _sample_and_screen(self, size, rng):
+        """ samples prior draws together and simulates their mean-field trajectories
+        :param size: (int) number of prior draws
+        :param rng: (RandomState) random number generator
+        :return: (tuple) of
+            - (list) of seeds of draws
+            - (np.array of bool) if the mean-field trajectory of each draw is feasible
+            - (list) of the values of parameters with prior distributions of each draw (dictionaries)
+        """
+
+        if self.meanField is None:
+            self.meanField = MeanFieldEpidemics(model_settings=self.sets)
+
+        seeds = rng.randint(0, iinfo(int32).max, size=size).tolist()
+        draws = ParameterDraws(model_sets=self.sets, n=size, rng=rng)
+        self.samplingTime += draws.runTime
+        self.meanField.simulate(n=size, seeds=seeds, sample_seeds_by_weights=False, if_export_trajs=False,
+                                draws=draws)
+
+        return seeds, self.meanField.get_if_feasible(), [draws.get_prior_values(i=i) for i in range(size)]
+
+    def screen_prior_draws(self, n, initial_seed=None):
+        """
+        :param n: (int) number of seeds needed
+        :param initial_seed: (int) to initialize the seed of the RandomState that is used to generate seeds
+        :return: (list) of seeds of prior draws selected for simulation: draws are screened in order and
+            a draw is selected if its mean-field trajectory is feasible, or otherwise with probability
+            probSimulatingScreenedOut, until n draws are selected (or n * max_tries draws are screened,
+            in which case fewer seeds are returned)
+            prior draws are sampled together for each batch (see ParameterDraws) and the values of parameters
+            with prior distributions of the returned seeds are put in paramValuesBySeed of model settings
+        """
+
+        rng = RandomState(0 if initial_seed is None else initial_seed)
+
+        seeds = []
+        self.priorValuesBySeed = dict()
+        self.probsOfSimulatingBySeed = dict()
+        self.nDrawsScreened = 0
+        self.nFeasibleDraws = 0
+        self.samplingTime = 0
+        while len(seeds) < n and self.nDrawsScreened < n * self.maxTries:
+
+            size = min(self.screeningBatchSize, n * self.maxTries - self.nDrawsScreened)
+            batch_seeds, if_feasible, prior_values = self._sample_and_screen(size=size, rng=rng)
+            if_selected = rng.random_sample(size=size) < self.probSimulatingScreenedOut
+
+            for i in range(size):
+                self.nDrawsScreened += 1
+                if if_feasible[i]:
+                    self.nFeasibleDraws += 1
+                if if_feasible[i] or if_selected[i]:
+                    seeds.append(batch_seeds[i])
+                    self.priorValuesBySeed[batch_seeds[i]] = prior_values[i]
+                    self.probsOfSimulatingBySeed[batch_seeds[i]] = \
+                        1 if if_feasible[i] else self.probSimulatingScreenedOut
+                    if len(seeds) == n:
+                        break
+
+        self.nDrawsScreenedOut = self.nDrawsScreened - len(seeds)
+        if len(seeds) < n:
+            warnings.warn('Only {} of {} prior draws screened were selected for simulation.'
+                          .format(len(seeds), self.nDrawsScreened))
+
+        # trajectories of these seeds are simulated with their prior draws
+        self.sets.paramValuesBySeed = dict(self.priorValuesBySeed)
+
+        return seeds
+
+    def run(self, function_to_populate_model, num_of_iterations, initial_seed=None, if_run_in_parallel=True):
+        """
+        :param function_to_populate_model: function to build the epidemic model (should take 'model' as an argument)
+        :param num_of_iterations: number of calibration iterations
+        :param initial_seed: (int) to initialize the seed of the RandomState that is used to generate the seeds of
+            prior draws to screen
+        :param if_run_in_parallel: set to True to run calibration iterations in parallel
+        """
+
+        self.runTime = time.time()
+
+        seeds = self.screen_prior_draws(n=num_of_iterations, initial_seed=initial_seed)
+
+        self.multiModel.simulate(function_to_populate_model=function_to_populate_model,
+                                 n=len(seeds),
+                                 seeds=seeds,
+                                 sample_seeds_by_weights=False,
+                                 if_export_trajs=self.multiModel.modelSets.exportCalibrationTrajs,
+                                 trajs_folder=self.multiModel.modelSets.folderToSaveCalibrationTrajs,
+                                 if_run_in_parallel=if_run_in_parallel)
+        self.violations = list(self.multiModel.violations)
+
+        # (draws screened out are reported by nDrawsScreenedOut)
+        self.nTrajsDiscarded = self.multiModel.nTrajsDiscarded
+
+        outputs = self.multiModel.multiModelOutputs
+
+        # find names of parameters
+        self.listOfParameterNames = outputs.dictParameterValues.keys()
+
+        # calculate likelihood of each trajectory
+        for i in range(len(seeds)):
+            self.calibResultsOfTrajs.append(calib.CalibResultOfATraj(
+                epi_id=outputs.ids[i],
+                seed=outputs.seeds[i],
+                lnl=outputs.lnL[i][0],
+                message=outputs.lnL[i][1],
+                param_values=outputs.listOfParamValues[i] if self.ifSaveParamValues else None))
+
+        # this is to make sure the likelihood are not calculated if the model is used for simulation
+        self.multiModel.modelSets.calcLikelihood = False
+        self.multiModel.modelSets.storeProjectedOutcomes = True
+
+        # calculate probabilities
+        self._calculate_probs()
+
+        self.runTime = time.time() - self.runTime
+
+    def _calculate_probs(self):
+        """ calculates probabilities of trajectories proportional to the likelihood divided by
+        the probability of simulating the draw of the trajectory (see screen_prior_draws) """
+
+        calib.CalibrationWithRandomSampling._calculate_probs(self)
+
+        probs = np.array([r.prob / self.probsOfSimulatingBySeed.get(r.seed, 1) for r in self.calibResultsOfTrajs])
+        if probs.sum() > 0:
+            probs /= probs.sum()
+        for r, prob in zip(self.calibResultsOfTrajs, probs):
+            r.prob = prob
+        self.nTrajsWithNonZeroProb = int((probs > 0).sum())
+
+
+class CalibrationWithSMC(CalibrationWithScreenedPriors):
+    """ calibration by sequential Monte Carlo approximate Bayesian computation (ABC-SMC) used as
+    an importance sampler of the posterior distribution.
+    The distance of a trajectory from calibration targets is -lnL (inf for infeasible trajectories).
+    The first population of particles is made of prior draws screened by the mean-field model
+    (see CalibrationWithScreenedPriors).
+    Particles of each next population are proposed by perturbing particles of the previous population
+    (with a Gaussian kernel on the logit scale of uniform priors) and are accepted into the population if their
+    distance is below a tolerance (a quantile of the distances of the previous population);
+    populations (weighted by prior / proposal density) only serve to move the proposal towards the targets.
+    Every simulated particle (accepted or not) is then weighted by (prior / proposal density) * likelihood,
+    where the proposal density is that of the population the particle was proposed for, and the approximations
+    of the posterior by each population are combined (see _get_probs), so probabilities in
+    calibration_summary.csv (which lists all simulated particles) approximate the same posterior as
+    those of random sampling (prior * likelihood). """
+
+    def __init__(self, model_settings, n_populations=4, quantile=0.5, kernel_scale=1,
+                 max_tries=100, prob_simulating_screened_out=0.1, screening_batch_size=1000, checkpoint_file=None):
+        """
+        :param model_settings: (GonoSettings) model settings
+        :param n_populations: (int) number of populations of particles (including the first population)
+        :param quantile: (float) quantile of distances of a population to use as the tolerance of the next one
+        :param kernel_scale: (float) covariance of the perturbation kernel is kernel_scale times the weighted
+            covariance of particles (smaller values increase the acceptance rate and
+            the variability of importance weights)
+        :param max_tries: (int) maximum number of prior draws to screen (for the first population) or
+            particles to propose (for next populations) for each particle
+        :param prob_simulating_screened_out: (float) probability of simulating a prior draw of the first population
+            whose mean-field trajectory is infeasible (see CalibrationWithScreenedPriors)
+        :param screening_batch_size: (int) number of prior draws to screen together
+        :param checkpoint_file: (string) file to store the outputs of simulated trajectories in
+            (particles are proposed the same way when the calibration is restarted, so
+            particles already in the checkpoint are not simulated again)
+        """
+
+        CalibrationWithScreenedPriors.__init__(
+            self, model_settings=model_settings, max_tries=max_tries,
+            prob_simulating_screened_out=prob_simulating_screened_out, screening_batch_size=screening_batch_size,
+            checkpoint_file=checkpoint_file)
+
+        # values of parameters are needed to perturb particles
+        self.sets.storeParameterValues = True
+        self.ifSaveParamValues = True
+
+        self.nPopulations = n_populations
+        self.quantile = quantile
+        self.kernelScale = kernel_scale
+        self.nSimulations = 0  # number of simulated trajectories
+        self.tolerances = []  # tolerance of each population
+        self.effectiveSampleSize = None
+
+        # names and bounds of parameters with uniform priors (particles are perturbed along these parameters)
+        bounds = Parameters(model_sets=self.sets).get_bounds_of_uniform_priors()
+        self.paramNames = list(bounds.keys())
+        self.lowerBounds = np.array([b[0] for b in bounds.values()])
+        self.upperBounds = np.array([b[1] for b in bounds.values()])
+
+    def _simulate_particles(self, function_to_populate_model, seeds, if_run_in_parallel):
+        """
+        :param function_to_populate_model: function to build the epidemic model
+        :param seeds: (list) of seeds of particles (parameter values of particles that are not prior draws
+            should be in paramValuesBySeed of model settings)
+        :param if_run_in_parallel: set to True to run simulations in parallel
+        :return: (tuple) of
+            - (list) of CalibResultOfATraj
+            - (np.array of shape (n, n_params)) values of parameters with uniform priors
+            - (np.array) distances from calibration targets
+        """
+
+        self.multiModel = TemplateMultiEpidemics(model_settings=self.sets, checkpoint=self.checkpoint)
+        self.multiModel.simulate(function_to_populate_model=function_to_populate_model,
+                                 n=len(seeds),
+                                 seeds=seeds,
+                                 sample_seeds_by_weights=False,
+                                 if_export_trajs=False,
+                                 if_run_in_parallel=if_run_in_parallel)
+
+        outputs = self.multiModel.multiModelOutputs
+        self.listOfParameterNames = outputs.dictParameterValues.keys()
+        self.violations.extend(self.multiModel.violations)
+        self.nTrajsDiscarded += self.multiModel.nTrajsDiscarded
+
+        results = []
+        for i in range(len(seeds)):
+            results.append(calib.CalibResultOfATraj(
+                epi_id=self.nSimulations + outputs.ids[i],
+                seed=outputs.seeds[i],
+                lnl=outputs.lnL[i][0],
+                message=outputs.lnL[i][1],
+                param_values=outputs.listOfParamValues[i]))
+        self.nSimulations += len(seeds)
+
+        thetas = np.array([outputs.dictParameterValues[name] for name in self.paramNames], dtype=float).T
+        distances = np.array([-r.lnL for r in results])
+
+        return results, thetas, distances
+
+    def _to_unbounded(self, thetas):
+        """
+        :param thetas: (np.array of shape (n, n_params)) values of parameters with uniform priors
+        :return: (np.array of shape (n, n_params)) logit of the position of values within the bounds of priors
+        """
+
+        s = (thetas - self.lowerBounds) / (self.upperBounds - self.lowerBounds)
+        s = np.clip(s, 1e-12, 1 - 1e-12)
+        return np.log(s / (1 - s))
+
+    def _to_bounded(self, phis):
+        """
+        :param phis: (np.array of shape (n, n_params)) logit of the position of values within the bounds of priors
+        :return: (np.array of shape (n, n_params)) values of parameters
+        """
+
+        return self.lowerBounds + (self.upperBounds - self.lowerBounds) * expit(phis)
+
+    def _get_kernel(self, phis, weights):
+        """
+        :param phis: (np.array of shape (n_particles, n_params)) particles (on the logit scale)
+        :param weights: (np.array) normalized weights of particles
+        :return: (np.array of shape (n_params, n_params)) Cholesky factor of the covariance of the perturbation
+            kernel (proportional to the weighted covariance of particles, or to their variances if particles
+            are too few to estimate the covariance)
+        """
+
+        deviations = phis - weights @ phis
+        cov = self.kernelScale * (weights[:, np.newaxis] * deviations).T @ deviations
+        if len(phis) <= phis.shape[1]:
+            cov = np.diag(np.diag(cov))
+        cov += 1e-8 * np.eye(len(cov))
+        return np.linalg.cholesky(cov)
+
+    def _get_ln_prior_to_proposal(self, new_phis, phis, weights, chol):
+        """
+        :param new_phis: (np.array of shape (n_new, n_params)) particles proposed by perturbing particles of
+            the previous population (on the logit scale)
+        :param phis: (np.array of shape (n_particles, n_params)) particles of the previous population
+        :param weights: (np.array) normalized weights of particles of the previous population
+        :param chol: (np.array) Cholesky factor of the covariance of the perturbation kernel
+        :return: (np.array) log of (prior density / proposal density) of the proposed particles
+        """
+
+        # distances between particles are calculated after whitening by the covariance of the kernel
+        new_y = solve_triangular(chol, new_phis.T, lower=True).T
+        y = solve_triangular(chol, phis.T, lower=True).T
+        sq_distances = (new_y ** 2).sum(axis=1)[:, np.newaxis] + (y ** 2).sum(axis=1) - 2 * new_y @ y.T
+
+        # uniform priors on the logit scale (the density of the logistic distribution)
+        s = expit(new_phis)
+        ln_prior = np.log(s * (1 - s)).sum(axis=1)
+
+        # mixture of Gaussian kernels centered at particles of the previous population
+        ln_proposal = logsumexp(np.log(weights) - 0.5 * sq_distances, axis=1) \
+            - 0.5 * len(chol) * np.log(2 * np.pi) - np.log(np.diag(chol)).sum()
+
+        return ln_prior - ln_proposal
+
+    @staticmethod
+    def _normalize(ln_weights):
+        """
+        :param ln_weights: (np.array) log of weights (-inf for zero weights)
+        :return: (np.array) normalized weights (all zero if all weights are zero)
+        """
+
+        if not np.isfinite(ln_weights).any():
+            return np.zeros(len(ln_weights))
+        w = np.exp(ln_weights - ln_weights.max())
+        return w / w.sum()
+
+    def _get_probs(self, ln_ratios, lnl, populations):
+        """
+        :param ln_ratios: (np.array) log of (prior / proposal density) of simulated particles
+        :param lnl: (np.array) log likelihoods of simulated particles
+        :param populations: (np.array) population each particle was proposed for
+        :return: (np.array) probabilities of simulated particles: within each population, probabilities are
+            proportional to (prior / proposal density) * likelihood (which approximates the posterior) and
+            the approximations of populations are combined in proportion to their effective sample sizes
+            (so populations whose proposals are far from the posterior do not inflate the variability of weights)
+        """
+
+        probs = np.zeros(len(lnl))
+        for t in np.unique(populations):
+            in_population = populations == t
+            p = self._normalize(ln_ratios[in_population] + lnl[in_population])
+            if p.sum() > 0:
+                probs[in_population] = p / (p ** 2).sum()
+        if probs.sum() > 0:
+            probs /= probs.sum()
+        return probs
+
+    def run(self, function_to_populate_model, num_of_iterations, initial_seed=None, if_run_in_parallel=True):
+        """
+        :param function_to_populate_model: function to build the epidemic model (should take 'model' as an argument)
+        :param num_of_iterations: number of particles in each population
+        :param initial_seed: (int) to initialize the seed of the RandomState that is used to generate
+            seeds and perturbations of particles
+        :param if_run_in_parallel: set to True to run simulations in parallel
+        """
+
+        self.runTime = time.time()
+        rng = RandomState(0 if initial_seed is None else initial_seed)
+        self.nSimulations = 0
+        self.nTrajsDiscarded = 0
+        self.tolerances = []
+        self.violations = []
+
+        # first population (prior draws screened by the mean-field model)
+        seeds = self.screen_prior_draws(n=num_of_iterations, initial_seed=initial_seed)
+        results, thetas, distances = self._simulate_particles(
+            function_to_populate_model=function_to_populate_model,
+            seeds=seeds, if_run_in_parallel=if_run_in_parallel)
+        # the proposal density of the screened prior is the prior density times the probability of simulating
+        # a draw divided by the proportion of screened draws that were simulated
+        ln_ratios = np.log(len(seeds) / self.nDrawsScreened) \
+            - np.log([self.probsOfSimulatingBySeed[r.seed] for r in results])
+
+        # all simulated particles with their values of parameters, log of (prior / proposal density),
+        # and the population they were proposed for
+        all_results, all_thetas, all_ln_ratios = list(results), list(thetas), list(ln_ratios)
+        populations = [0] * len(results)
+
+        keep = np.isfinite(distances)
+        if not keep.any():
+            keep[:] = True
+            warnings.warn('No feasible trajectory found in the first population of particles.')
+        thetas, distances = thetas[keep], distances[keep]
+        weights = self._normalize(ln_ratios[keep])
+
+        for t in range(1, self.nPopulations):
+            if len(thetas) < 2 or not np.isfinite(distances).any():
+                break
+
+            tolerance = np.quantile(distances[np.isfinite(distances)], self.quantile)
+            self.tolerances.append(tolerance)
+
+            # perturbation kernel (particles are perturbed on the logit scale, so they stay within priors)
+            phis = self._to_unbounded(thetas)
+            chol = self._get_kernel(phis=phis, weights=weights)
+
+            new_phis, new_ln_ratios, new_distances = [], [], []
+            n_proposed = 0
+            acceptance_rate = self.quantile
+            while len(new_phis) < num_of_iterations and n_proposed < num_of_iterations * self.maxTries:
+
+                n = min(int(np.ceil((num_of_iterations - len(new_phis)) / max(acceptance_rate, 0.01))),
+                        num_of_iterations * self.maxTries - n_proposed)
+                proposals = phis[rng.choice(len(phis), size=n, p=weights)]
+                proposals = proposals + rng.normal(size=proposals.shape) @ chol.T
+                seeds = rng.randint(0, iinfo(int32).max, size=n).tolist()
+                self.sets.paramValuesBySeed = {
+                    seed: dict(zip(self.paramNames, theta))
+                    for seed, theta in zip(seeds, self._to_bounded(proposals).tolist())}
+
+                batch_results, batch_thetas, batch_distances = self._simulate_particles(
+                    function_to_populate_model=function_to_populate_model,
+                    seeds=seeds, if_run_in_parallel=if_run_in_parallel)
+                batch_ln_ratios = self._get_ln_prior_to_proposal(
+                    new_phis=proposals, phis=phis, weights=weights, chol=chol)
+                n_proposed += n
+
+                all_results.extend(batch_results)
+                all_thetas.extend(batch_thetas)
+                all_ln_ratios.extend(batch_ln_ratios)
+                populations.extend([t] * n)
+
+                for i in np.flatnonzero(batch_distances <= tolerance):
+                    if len(new_phis) < num_of_iterations:
+                        new_phis.append(proposals[i])
+                        new_ln_ratios.append(batch_ln_ratios[i])
+                        new_distances.append(batch_distances[i])
+                acceptance_rate = len(new_phis) / n_proposed
+
+            print('Population {}: {} particles accepted out of {} proposed (tolerance = {:.2f}).'.format(
+                t, len(new_phis), n_proposed, tolerance))
+
+            if len(new_phis) < 2:
+                warnings.warn('Population {} of particles could not be completed; '
+                              'the next populations are not proposed.'.format(t))
+                break
+            if len(new_phis) < num_of_iterations:
+                warnings.warn('Only {} particles were accepted for population {}.'.format(len(new_phis), t))
+
+            thetas = self._to_bounded(np.array(new_phis))
+            distances = np.array(new_distances)
+            weights = self._normalize(np.array(new_ln_ratios))
+
+        probs = self._get_probs(ln_ratios=np.array(all_ln_ratios), lnl=np.array([r.lnL for r in all_results]),
+                                populations=np.array(populations))
+        if probs.sum() == 0:
+            warnings.warn('No feasible trajectory found.')
+        for r, prob in zip(all_results, probs):
+            r.prob = prob
+
+        # seeds and parameter values of particles with non-zero probabilities (to simulate the calibrated model)
+        # (particles of the first population also keep the values of their prior draws of other parameters)
+        self.sets.paramValuesBySeed = {
+            r.seed: {**self.priorValuesBySeed.get(r.seed, dict()), **dict(zip(self.paramNames, theta))}
+            for r, theta, prob in zip(all_results, np.array(all_thetas).tolist(), probs) if prob > 0}
+
+        self.calibResultsOfTrajs = all_results
+        self.nTrajsWithNonZeroProb = int((probs > 0).sum())
+        self.effectiveSampleSize = 1 / (probs ** 2).sum() if probs.sum() > 0 else 0
+
+        # this is to make sure the likelihood are not calculated if the model is used for simulation
+        self.multiModel.modelSets.calcLikelihood = False
+        self.multiModel.modelSets.storeProjectedOutcomes = True
+
+        self.runTime = time.time() - self.runTime
+
+
+def read_param_values_by_seed(calibration_summary_file, param_names):
+    """
+    :param calibration_summary_file: (string) file name where the calibration summary is located
+    :param param_names: (list) of names of parameters to read
+    :return: (dictionary) of parameter values (dictionary keyed by parameter names) keyed by seed
+        (empty if the calibration summary does not include values of these parameters)
+    """
+
+    rows = read_csv_rows(file_name=calibration_summary_file, if_ignore_first_row=False)
+    header = rows[0]
+    if not all(name in header for name in param_names):
+        return dict()
+
+    cols = [header.index(name) for name in param_names]
+    seed_col = header.index('Seed')
+    return {int(row[seed_col]): {name: float(row[j]) for name, j in zip(param_names, cols)}
+            for row in rows[1:]}
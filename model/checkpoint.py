@@ -0,0 +1,135 @@
+import csv
+import os
+
+from apacepy.multi_epidemics import MultiEpidemicsOutputs
+from deampy.in_out_functions import make_directory
+
+"""
+Checkpoints of calibration runs.
+The outputs needed for calibration (seed, LnL, message, and parameter values) of each simulated trajectory
+are appended to a csv file in batches as trajectories are simulated. When a calibration is restarted
+with the same checkpoint file, trajectories whose seeds are already in the file are not simulated again.
+Since seeds of calibration iterations are generated from the calibration seed, restarting a calibration
+resumes it where it stopped, and running it with more iterations only simulates the new iterations.
+A checkpoint file should only be shared by calibrations with the same model settings and calibration method.
+"""
+
+HEADER = ['Iteration seed', 'ID', 'Seed', 'If feasible', 'Run time', 'LnL', 'Message',
+          'Number of trajectories discarded', 'Violations']
+N_COLS_BEFORE_PARAMS = len(HEADER)
+
+
+def _to_value(text):
+    """
+    :param text: (string) a value read from the checkpoint file
+    :return: (float) the value if it is a number, otherwise the text
+    """
+
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+class CalibrationCheckpoint:
+    """ outputs of simulated calibration trajectories stored in an append-only csv file """
+
+    def __init__(self, file_name, batch_size=100):
+        """
+        :param file_name: (string) name of the checkpoint file (created if it does not exist)
+        :param batch_size: (int) number of trajectories to simulate before appending their outputs to the file
+        """
+
+        self.fileName = file_name
+        self.batchSize = batch_size
+        self.paramNames = None  # names of parameters (columns after HEADER)
+        self.records = dict()  # list of values of each row keyed by iteration seed
+
+        if os.path.isfile(file_name):
+            # the last row is incomplete if the run stopped while a batch was being appended,
+            # so it is removed from the file
+            with open(file_name, 'rb+') as file:
+                content = file.read()
+                if len(content) > 0 and not content.endswith(b'\n'):
+                    file.truncate(content.rfind(b'\n') + 1)
+
+            with open(file_name, newline='') as file:
+                rows = list(csv.reader(file))
+            if len(rows) > 0:
+                self.paramNames = rows[0][N_COLS_BEFORE_PARAMS:]
+                for row in rows[1:]:
+                    self.records[int(row[0])] = row
+
+    def if_simulated(self, seed):
+        """
+        :param seed: (int) seed of a calibration iteration
+        :return: True if the trajectory of this seed is in the checkpoint
+        """
+
+        return seed in self.records
+
+    def get_outputs(self, seed):
+        """
+        :param seed: (int) seed of a calibration iteration
+        :return: (tuple) of
+            - (int) number of trajectories discarded to find a feasible trajectory
+            - (list) of (name of the violated time-series, abort time) of each infeasible trajectory simulated
+            - (MultiEpidemicsOutputs) outputs of this trajectory
+        """
+
+        row = self.records[seed]
+        outputs = MultiEpidemicsOutputs()
+        outputs.ids.append(int(row[1]))
+        outputs.seeds.append(int(row[2]))
+        outputs.ifFeasible.append(row[3] == 'True')
+        outputs.runTimes.append(float(row[4]))
+        outputs.lnL.append((float(row[5]), row[6]))
+
+        violations = []
+        if row[8] != '':
+            for violation in row[8].split('|'):
+                name, time = violation.rsplit(':', 1)
+                violations.append((name, float(time)))
+
+        if len(self.paramNames) > 0:
+            values = [_to_value(v) for v in row[N_COLS_BEFORE_PARAMS:]]
+            outputs.listOfParamValues.append(values)
+            for name, value in zip(self.paramNames, values):
+                outputs.dictParameterValues[name] = [value]
+
+        return int(row[7]), violations, outputs
+
+    def append(self, seeds, results):
+        """ appends the outputs of a batch of trajectories to the checkpoint file
+        :param seeds: (list) of seeds of calibration iterations
+        :param results: (list) of (number of trajectories discarded, violations, outputs) of each trajectory
+        """
+
+        rows = []
+        for seed, (n_discarded, violations, outputs) in zip(seeds, results):
+            param_names = list(outputs.dictParameterValues.keys())
+            if self.paramNames is None:
+                self.paramNames = param_names
+            elif param_names != self.paramNames:
+                raise ValueError("Parameters of the model do not match those in the checkpoint file '{}'."
+                                 .format(self.fileName))
+
+            row = [seed, outputs.ids[0], outputs.seeds[0], outputs.ifFeasible[0], outputs.runTimes[0],
+                   outputs.lnL[0][0], outputs.lnL[0][1], n_discarded,
+                   '|'.join('{}:{}'.format(name, time) for name, time in violations if name is not None)]
+            row.extend(outputs.dictParameterValues[name][0] for name in param_names)
+            rows.append(row)
+
+        if_new_file = not os.path.isfile(self.fileName)
+        make_directory(filename=self.fileName)
+        with open(self.fileName, 'a', newline='') as file:
+            csv_file = csv.writer(file)
+            if if_new_file:
+                csv_file.writerow(HEADER + self.paramNames)
+            csv_file.writerows(rows)
+            # to make sure the batch is on the disk before simulating the next batch
+            file.flush()
+            os.fsync(file.fileno())
+
+        for row in rows:
+            self.records[row[0]] = [str(v) for v in row]
@@ -0,0 +1,223 @@
+import hashlib
+import pickle
+import uuid
+
+import numpy as np
+from apacepy.multi_epidemics import MultiEpidemicsOutputs
+
+"""
+Compact form of the outputs (MultiEpidemicsOutputs) of a trajectory that processes return to the session.
+The outputs of a trajectory hold the projected outcomes ('average incidence after epidemic warm-up' statistics,
+survey outcomes) and parameter values in dictionaries keyed by their names, so most of the bytes sent back
+for each trajectory are the names. In the compact form, the values are stored in a float array
+whose layout (names and types of values) is sent only once per process and batch of jobs:
+    - a process packs the outputs of a trajectory into a CompactOutputs (pack_outputs) and includes the layout
+      only in the first CompactOutputs it returns for a batch,
+    - the session unpacks all results of a batch (unpack_results) after collecting the layouts of the batch.
+Since the names of the unpacked outputs are those of the layout, they are shared by all trajectories
+(and not copied for each trajectory).
+"""
+
+# layouts keyed by their keys (in the session, layouts received from processes)
+_layouts = dict()
+# id of the batch this process last packed outputs for and the keys of layouts it has sent in this batch
+# (only the last batch is kept, so a process that takes a job of another batch sends its layouts again)
+_sentBatchId = None
+_sentLayouts = set()
+
+# types of values that are stored in the float array (other values are not packed)
+_SCALAR_TYPES = (float, int, bool, type(None), np.float64, np.float32, np.int64, np.int32, np.bool_)
+
+
+def get_batch_id():
+    """
+    :return: (string) a new id for a batch of jobs (layouts are sent once per process and batch)
+    """
+
+    return uuid.uuid4().hex
+
+
+def _get_type(value):
+    """
+    :return: type of a value (a tuple of list and the types of elements for lists) or None if the value
+        cannot be stored in the float array
+    """
+
+    if isinstance(value, list):
+        types = tuple(_get_type(v) for v in value)
+        return None if None in types else (list, types)
+    return type(value) if type(value) in _SCALAR_TYPES else None
+
+
+def _flatten(value, values):
+    """ appends a value (or the elements of a list) to a list of floats """
+
+    if isinstance(value, list):
+        for v in value:
+            _flatten(value=v, values=values)
+    else:
+        values.append(np.nan if value is None else value)
+
+
+def _restore(value_type, values, position):
+    """
+    :return: (tuple) of the value (of type value_type) stored at a position of the float array
+        and the position of the next value
+    """
+
+    if isinstance(value_type, tuple):
+        result = []
+        for element_type in value_type[1]:
+            value, position = _restore(value_type=element_type, values=values, position=position)
+            result.append(value)
+        return result, position
+    if value_type is type(None):
+        return None, position + 1
+    return value_type(values[position]), position + 1
+
+
+class OutputsLayout:
+    """ names and types of the projected outcomes and parameter values of a trajectory """
+
+    def __init__(self, outcome_names, outcome_types, param_names, param_types, if_param_list):
+        """
+        :param outcome_names: (tuple) of names of projected outcomes
+        :param outcome_types: (tuple) of types of projected outcomes
+        :param param_names: (tuple) of names of parameters
+        :param param_types: (tuple) of types of parameter values
+        :param if_param_list: (bool) if the list of parameter values is stored
+        """
+
+        self.outcomeNames = outcome_names
+        self.outcomeTypes = outcome_types
+        self.paramNames = param_names
+        self.paramTypes = param_types
+        self.ifParamList = if_param_list
+        self.key = hashlib.sha1(pickle.dumps(
+            (outcome_names, outcome_types, param_names, param_types, if_param_list))).hexdigest()
+
+
+class CompactOutputs:
+    """ outputs of a trajectory with the values of projected outcomes and parameters in a float array """
+
+    def __init__(self, layout_key, layout, values, extras):
+        """
+        :param layout_key: (string) key of the layout of values
+        :param layout: (OutputsLayout) layout of values (None if it was sent before in this batch)
+        :param values: (np.array) of values of projected outcomes and parameters
+        :param extras: (tuple) of id, seed, if feasible, run time, lnL, discounted costs, discounted healths
+        """
+
+        self.layoutKey = layout_key
+        self.layout = layout
+        self.values = values
+        self.extras = extras
+
+
+def pack_outputs(outputs, batch_id):
+    """
+    :param outputs: (MultiEpidemicsOutputs) outputs of a trajectory
+    :param batch_id: (string) id of the batch of the job (see get_batch_id)
+    :return: (CompactOutputs) compact form of the outputs (or the outputs if they cannot be packed)
+    """
+
+    if len(outputs.ids) != 1:
+        return outputs
+
+    outcomes = [v[0] for v in outputs.dictOfProjectedOutcomes.values()]
+    params = [v[0] for v in outputs.dictParameterValues.values()]
+    if_param_list = len(outputs.listOfParamValues) == 1
+    if if_param_list and outputs.listOfParamValues[0] != params:
+        return outputs
+
+    outcome_types = tuple(_get_type(v) for v in outcomes)
+    param_types = tuple(_get_type(v) for v in params)
+    if None in outcome_types or None in param_types:
+        return outputs
+
+    layout = OutputsLayout(outcome_names=tuple(outputs.dictOfProjectedOutcomes), outcome_types=outcome_types,
+                           param_names=tuple(outputs.dictParameterValues), param_types=param_types,
+                           if_param_list=if_param_list)
+    _layouts.setdefault(layout.key, layout)
+    global _sentBatchId
+    if batch_id != _sentBatchId:
+        _sentBatchId = batch_id
+        _sentLayouts.clear()
+    if layout.key in _sentLayouts:
+        layout_to_send = None
+    else:
+        _sentLayouts.add(layout.key)
+        layout_to_send = layout
+
+    values = []
+    for v in outcomes + params:
+        _flatten(value=v, values=values)
+
+    return CompactOutputs(
+        layout_key=layout.key, layout=layout_to_send, values=np.array(values, dtype=float),
+        extras=(outputs.ids[0], outputs.seeds[0], outputs.ifFeasible[0], outputs.runTimes[0], outputs.lnL[0],
+                outputs.discountedCosts, outputs.discountedHealths))
+
+
+def unpack_outputs(compact):
+    """
+    :param compact: (CompactOutputs) compact form of the outputs of a trajectory
+    :return: (MultiEpidemicsOutputs) outputs of the trajectory
+    """
+
+    layout = _layouts[compact.layoutKey]
+    outputs = MultiEpidemicsOutputs()
+    epi_id, seed, if_feasible, run_time, lnl, outputs.discountedCosts, outputs.discountedHealths = compact.extras
+    outputs.ids.append(epi_id)
+    outputs.seeds.append(seed)
+    outputs.ifFeasible.append(if_feasible)
+    outputs.runTimes.append(run_time)
+    outputs.lnL.append(lnl)
+
+    values = compact.values.tolist()
+    position = 0
+    for name, value_type in zip(layout.outcomeNames, layout.outcomeTypes):
+        value, position = _restore(value_type=value_type, values=values, position=position)
+        outputs.dictOfProjectedOutcomes[name] = [value]
+    params = []
+    for name, value_type in zip(layout.paramNames, layout.paramTypes):
+        value, position = _restore(value_type=value_type, values=values, position=position)
+        outputs.dictParameterValues[name] = [value]
+        params.append(value)
+    if layout.ifParamList:
+        outputs.listOfParamValues.append(params)
+
+    return outputs
+
+
+def _register_layouts(results):
+    """ stores the layouts included in (nested lists of) results """
+
+    if isinstance(results, CompactOutputs):
+        if results.layout is not None:
+            _layouts.setdefault(results.layoutKey, results.layout)
+    elif isinstance(results, list):
+        for r in results:
+            _register_layouts(results=r)
+
+
+def _unpack(results):
+    """
+    :return: results (nested lists) where CompactOutputs are replaced by MultiEpidemicsOutputs
+    """
+
+    if isinstance(results, CompactOutputs):
+        return unpack_outputs(compact=results)
+    elif isinstance(results, list):
+        return [_unpack(results=r) for r in results]
+    return results
+
+
+def unpack_results(results):
+    """
+    :param results: (list) of outputs of the jobs of a batch (nested lists of CompactOutputs)
+    :return: the results where CompactOutputs are replaced by MultiEpidemicsOutputs
+    """
+
+    _register_layouts(results=results)
+    return _unpack(results=results)
@@ -0,0 +1,192 @@
+import numpy as np
+from apacepy.inputs import EpiParameters
+from apacepy.model_objects import ChanceNode
+from deampy.parameters import Constant, _Parameter
+
+"""
+Compiles the directed acyclic graph of chance nodes of a model (as populated by model_structure.build_model)
+into tables of probabilities over terminal compartments.
+Members who enter the graph through a chance node (an entry node) follow one of the paths of the graph
+until they reach a compartment. Paths that end in the same compartment after passing through the same
+counted nodes lead to the same outcome, so the number of members that reach each outcome
+can be sampled by one multinomial draw per entry node (instead of one binomial draw per chance node).
+The graph is walked once; the probabilities of outcomes are then evaluated for a batch of parameter values
+(constant probabilities, such as those set by model settings, are taken from the compiled model).
+"""
+
+
+def _get_param_locations(params):
+    """
+    :param params: (Parameters) model parameters
+    :return: (dictionary) of (name of the attribute, index in the list or None) keyed by the id of
+        parameter objects that are attributes of params
+    """
+
+    # attributes that EpiParameters uses to keep track of parameters are skipped
+    skipped_attrs = vars(EpiParameters()).keys()
+
+    locations = dict()
+    for attr, value in vars(params).items():
+        if attr in skipped_attrs:
+            continue
+        if isinstance(value, _Parameter):
+            locations.setdefault(id(value), (attr, None))
+        elif isinstance(value, list):
+            for j, v in enumerate(value):
+                if isinstance(v, _Parameter):
+                    locations.setdefault(id(v), (attr, j))
+    return locations
+
+
+def _get_paths(node, factors=(), nodes=()):
+    """ yields the paths from a node to compartments
+    :param node: (ChanceNode or Compartment) node to start from
+    :param factors: (tuple) of (probability parameter, branch) of chance nodes passed so far
+    :param nodes: (tuple) of chance nodes passed so far
+    :return: (generator) of (factors, nodes, compartment) for each path
+    """
+
+    if not isinstance(node, ChanceNode):
+        yield factors, nodes, node
+        return
+
+    if len(node.destComps) != 2:
+        raise ValueError("Chance node '{}' has {} destinations, only chance nodes with "
+                         "2 destinations can be compiled.".format(node.name, len(node.destComps)))
+
+    par = node.probParam
+    for branch, dest in enumerate(node.destComps):
+        if isinstance(par, Constant):
+            prob = par.value if branch == 0 else 1 - par.value
+            # branches that are never taken are removed and branches that are always taken add no factor
+            if prob == 0:
+                continue
+            elif prob == 1:
+                yield from _get_paths(node=dest, factors=factors, nodes=nodes + (node,))
+                continue
+        yield from _get_paths(node=dest, factors=factors + ((par, branch),), nodes=nodes + (node,))
+
+
+class CompiledChanceNodes:
+    """ chance nodes of a model compiled into probabilities of outcomes
+    (terminal compartment and the counted nodes passed) for each entry node """
+
+    def __init__(self, model, entry_nodes, counted_nodes=None):
+        """
+        :param model: (EpiModel) a model populated by build_model
+        :param entry_nodes: (list) of chance nodes that epidemic events send members to
+        :param counted_nodes: (list) of chance nodes to count the members passing through
+            (if None, all chance nodes of the model)
+        """
+
+        if counted_nodes is None:
+            counted_nodes = model.chanceNodes
+
+        compart_index = {id(c): j for j, c in enumerate(model.compartments)}
+        node_index = {id(c): j for j, c in enumerate(counted_nodes)}
+        param_locations = _get_param_locations(params=model.params)
+
+        self.nEntries = len(entry_nodes)
+        self.nComparts = len(model.compartments)
+        self.nCountedNodes = len(counted_nodes)
+
+        outcomes_by_entry = []  # list of (compartment index, indices of counted nodes) for each entry
+        path_outcomes = []  # (entry index, outcome index) of each path
+        path_constants = []  # product of the constant probabilities along each path
+        paths_by_factor = dict()  # list of paths keyed by (attribute, index, branch)
+        for e, entry in enumerate(entry_nodes):
+            outcomes = dict()
+            for factors, nodes, compart in _get_paths(node=entry):
+                key = (compart_index[id(compart)],
+                       tuple(sorted(node_index[id(c)] for c in nodes if id(c) in node_index)))
+                k = outcomes.setdefault(key, len(outcomes))
+
+                path = len(path_outcomes)
+                path_outcomes.append((e, k))
+                constant = 1
+                for par, branch in factors:
+                    if isinstance(par, Constant):
+                        constant *= par.value if branch == 0 else 1 - par.value
+                    elif id(par) in param_locations:
+                        attr, j = param_locations[id(par)]
+                        paths_by_factor.setdefault((attr, j, branch), []).append(path)
+                    else:
+                        raise ValueError("A chance node reached from '{}' has a probability parameter "
+                                         "that is not an attribute of model parameters.".format(entry.name))
+                path_constants.append(constant)
+
+            outcomes_by_entry.append(list(outcomes))
+
+        self.nOutcomes = max(len(o) for o in outcomes_by_entry)
+
+        # destination compartment and counted nodes passed for each (entry, outcome)
+        self.destinations = np.zeros((self.nEntries * self.nOutcomes, self.nComparts))
+        self.nodesPassed = np.zeros((self.nEntries * self.nOutcomes, self.nCountedNodes))
+        for e, outcomes in enumerate(outcomes_by_entry):
+            for k, (compart, nodes) in enumerate(outcomes):
+                self.destinations[e * self.nOutcomes + k, compart] = 1
+                self.nodesPassed[e * self.nOutcomes + k, list(nodes)] = 1
+
+        # matrix to add up the probabilities of paths that lead to the same outcome
+        self.pathsToOutcomes = np.zeros((len(path_outcomes), self.nEntries * self.nOutcomes))
+        for path, (e, k) in enumerate(path_outcomes):
+            self.pathsToOutcomes[path, e * self.nOutcomes + k] = 1
+
+        self.pathConstants = np.array(path_constants)
+        # (attribute, index, branch, paths, number of times the factor appears on each path)
+        self.factors = []
+        for (attr, j, branch), paths in paths_by_factor.items():
+            paths, counts = np.unique(paths, return_counts=True)
+            self.factors.append((attr, j, branch, paths, counts))
+        self.paramAttrs = sorted(set(f[0] for f in self.factors))
+
+    def get_probs(self, n, get_param_values):
+        """
+        :param n: (int) number of parameter sets
+        :param get_param_values: (function) that takes the name of an attribute of Parameters and
+            returns the values of this parameter (np.array with one row per parameter set)
+        :return: (np.array of shape (n, n_entries, n_outcomes)) probability of each outcome for each entry node
+        """
+
+        values = {attr: get_param_values(attr) for attr in self.paramAttrs}
+
+        path_probs = np.tile(self.pathConstants, (n, 1))
+        for attr, j, branch, paths, counts in self.factors:
+            prob = values[attr] if j is None else values[attr][:, j]
+            if branch == 1:
+                prob = 1 - prob
+            path_probs[:, paths] *= prob[:, np.newaxis] ** counts
+
+        probs = (path_probs @ self.pathsToOutcomes).reshape(n, self.nEntries, self.nOutcomes)
+        # to protect the multinomial draws against rounding errors
+        return probs / probs.sum(axis=2, keepdims=True)
+
+    def sample_outcomes(self, rng, n_in, probs):
+        """
+        :param rng: (np.random.Generator) random number generator
+        :param n_in: (np.array of shape (n, n_entries)) number of members entering each entry node
+        :param probs: (np.array of shape (n, n_entries, n_outcomes)) probabilities of outcomes (see get_probs)
+        :return: (tuple) of
+            - (np.array of shape (n, n_compartments)) number of members arriving at each compartment
+            - (np.array of shape (n, n_counted_nodes)) number of members passing through each counted node
+        """
+
+        outs = rng.multinomial(n_in, probs).reshape(n_in.shape[0], -1).astype(float)
+        to_comparts = np.rint(outs @ self.destinations).astype(np.int64)
+        to_nodes = np.rint(outs @ self.nodesPassed).astype(np.int64)
+        return to_comparts, to_nodes
+
+    def get_expected_transfers(self, probs):
+        """
+        :param probs: (np.array of shape (n, n_entries, n_outcomes)) probabilities of outcomes (see get_probs)
+        :return: (tuple) of
+            - (np.array of shape (n, n_entries, n_compartments)) expected number of members arriving at
+                each compartment per member entering each entry node
+            - (np.array of shape (n, n_entries, n_counted_nodes)) expected number of members passing through
+                each counted node per member entering each entry node
+        """
+
+        shape = (self.nEntries, self.nOutcomes, -1)
+        to_comparts = np.einsum('nek,ekc->nec', probs, self.destinations.reshape(shape))
+        to_nodes = np.einsum('nek,ekc->nec', probs, self.nodesPassed.reshape(shape))
+        return to_comparts, to_nodes
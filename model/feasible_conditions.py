@@ -0,0 +1,62 @@
+from apacepy.calibration_support import FeasibleConditions
+
+"""
+EpiModel stops simulating a trajectory (during calibration) as soon as a feasible condition of a time-series
+is violated at a simulation output time. The feasible conditions below also record when they were violated,
+so that the reason and the time of aborting infeasible trajectories can be reported.
+"""
+
+
+class RecordedFeasibleConditions(FeasibleConditions):
+    """ feasible conditions that record the epidemic time when they are first violated """
+
+    def __init__(self, feasible_min=None, feasible_max=None, min_threshold_to_hit=None, period=None):
+        """
+        :param feasible_min: (float) minimum feasible value
+        :param feasible_max: (float) maximum feasible value
+        :param min_threshold_to_hit: (float) threshold that the time-series should reach
+        :param period: (tuple (t_min, t_max)) the period where the feasible conditions should be checked
+        """
+
+        FeasibleConditions.__init__(self, feasible_min=feasible_min, feasible_max=feasible_max,
+                                    min_threshold_to_hit=min_threshold_to_hit, period=period)
+        self.violationTime = None  # epidemic time when these conditions were first violated
+
+    def reset(self):
+
+        FeasibleConditions.reset(self)
+        self.violationTime = None
+
+    def check_if_acceptable(self, value, time):
+
+        if_acceptable = FeasibleConditions.check_if_acceptable(self, value=value, time=time)
+        if not if_acceptable and self.violationTime is None:
+            self.violationTime = time
+        return if_acceptable
+
+
+def get_violation(model):
+    """
+    :param model: (EpiModel) a simulated model
+    :return: (tuple) of (name of the time-series whose feasible conditions were violated first,
+        epidemic time when the simulation was aborted) or (None, None) if the trajectory is feasible
+    """
+
+    if model.ifAFeasibleTraj:
+        return None, None
+
+    name, time = None, None
+    series = model.epiHistory.sumTimeSeries + model.epiHistory.ratioTimeSeries
+    for s in series:
+        if isinstance(s.feasibleConditions, RecordedFeasibleConditions) \
+                and s.feasibleConditions.violationTime is not None:
+            if time is None or s.feasibleConditions.violationTime < time:
+                name, time = s.name, s.feasibleConditions.violationTime
+
+    # thresholds that should be hit are checked only at the end of the simulation
+    if name is None:
+        for s in series:
+            if s.feasibleConditions and not s.feasibleConditions.ifMinThresholdHasReached:
+                return s.name, model.settings.simulationDuration
+
+    return name, time
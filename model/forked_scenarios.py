@@ -0,0 +1,510 @@
+import copy
+import time
+from inspect import signature
+
+from apacepy.multi_epidemics import MultiEpidemics, MultiEpidemicsOutputs
+from apacepy.scenario_simulation import ScenarioSimulator
+from apacepy.sim_events import EndOfSim
+from deampy.in_out_functions import write_dictionary_to_csv
+from deampy.support.simulation import SeedGenerator
+from numpy.random import RandomState
+
+from model.active_set_model import ActiveSetEpiModel
+from model.atomic_io import atomic_output
+from model.compact_outputs import get_batch_id, pack_outputs, unpack_results
+from model.sim_calendar import SimCalendar
+from model.streaming_stats import StreamingOutputs
+from model.template_epidemics import _append_outputs, STREAMING_BATCH_SIZE
+from model.worker_pool import get_pool, get_template, get_template_key, get_template_settings
+
+"""
+Simulates scenarios that differ only in the coverage and characteristics of the rapid test
+(and in the transmission factor). The rapid test is not used before the end of the warm-up period
+(the probability of receiving a rapid test is 0 until then), so the trajectories of all scenarios
+with the same seed and transmission factor are identical until the end of the warm-up period.
+Each seed is therefore simulated once until the end of the warm-up period, and each scenario continues
+the simulation from a copy of this snapshot of the model (which includes the state of compartments,
+random number generators, histories, and the simulation calendar).
+In the streaming mode, the outputs of each simulated (scenario, seed) cell only update the summary statistics
+of the scenario (see streaming_stats), so the results are the summary statistics of outcomes of each scenario
+(instead of the outcomes of each trajectory).
+"""
+
+
+class ForkableEpiModel(ActiveSetEpiModel):
+    """ an epidemic model that can be simulated until a time and then continued (possibly from a copy) """
+
+    def __init__(self, id, settings):
+        """
+        :param id: (int) id of the model
+        :param settings: model settings
+        """
+
+        ActiveSetEpiModel.__init__(self, id=id, settings=settings)
+        # (a calendar that can stop the simulation at a time, see sim_calendar)
+        self.simCal = SimCalendar()
+
+    def simulate_until(self, seed, time_index):
+        """ simulates the model until (and excluding) the events scheduled at a simulation time index
+        :param seed: (int) random number seed
+        :param time_index: (int) simulation time index (in number of deltaT's) to stop at
+        """
+
+        self.simCal.stopTime = time_index
+        self.simulate(seed=seed)
+
+    def continue_simulation(self, time_index=None):
+        """ continues simulating the model
+        :param time_index: (int) simulation time index (in number of deltaT's) to stop at
+            (the events scheduled at this time index are not processed).
+            If None, the model is simulated until the end of the simulation.
+        """
+
+        start = time.time()
+        self.simCal.stopTime = time_index
+        while self.simCal.n_events() > 0:
+            self.simCal.get_next_event().process()
+
+        self.runTime += time.time() - start
+
+    def extend_simulation_duration(self, sim_duration):
+        """ changes the simulation duration of a model whose simulation has not ended yet
+        :param sim_duration: (float) the new simulation duration (years)
+        """
+
+        n_delta_ts = self.settings.nDeltaTsInSimulation
+        self.settings.simulationDuration = sim_duration
+        self.settings.initialize()
+        self.params.tabulate_time_dependent_params(n_delta_ts=self.settings.nDeltaTsInSimulation)
+
+        # reschedule the end of the simulation
+        self.simCal.delay_events(event_type=EndOfSim, delay=self.settings.nDeltaTsInSimulation - n_delta_ts)
+
+
+def _get_time_index_to_fork(model):
+    """
+    :param model: (EpiModel) a populated model
+    :return: (int) the first simulation time index where the rapid test could be used
+        (scenarios can be forked from a snapshot of the model taken before this time index)
+    """
+
+    t_rapid_test = model.params.probRapidTest.ts[0]
+    delta_t = model.settings.deltaT
+
+    # the same as how EpiModel.update_compartments calculates the time of time-dependent parameters
+    time_index = int(t_rapid_test / delta_t)
+    while time_index * delta_t < t_rapid_test:
+        time_index += 1
+    while time_index > 0 and (time_index - 1) * delta_t >= t_rapid_test:
+        time_index -= 1
+
+    return min(time_index, model.settings.nDeltaTsInSimulation)
+
+
+def _copy_model(model):
+    """
+    :param model: (EpiModel) a model (possibly in the middle of a simulation)
+    :return: (EpiModel) a copy of the model that can be simulated independently of the model
+    """
+
+    return copy.deepcopy(model)
+
+
+def _simulate_scenarios_of_seed(model, epi_id, seed, param_values, scenario_definitions,
+                                extended_sim_durations=(), if_extend=None):
+    """ simulates a copy of a template model until the end of the warm-up period and
+    continues a copy of this snapshot for each scenario
+    :param model: (ForkableEpiModel) a populated model
+    :param epi_id: (int) id of the trajectory
+    :param seed: (int) random number seed
+    :param param_values: (dictionary) of parameters with fixed values for this seed
+        (see GonoSettings.paramValuesBySeed)
+    :param scenario_definitions: (list) of scenarios (arguments of the update_settings function of model settings)
+    :param extended_sim_durations: (list) of simulation durations (in increasing order and longer than
+        the simulation duration of model settings) to continue the trajectories of scenarios for
+    :param if_extend: (list) of bools indicating if the trajectory of each scenario should be continued
+        for extended simulation durations (if None, all scenarios are continued)
+    :return: (tuple) of
+        - (float) run time of the snapshot (seconds), which the run times of the scenarios include
+        - (list) of lists of outputs (MultiEpidemicsOutputs) of the trajectory of each scenario
+            for the simulation duration of model settings and then for each extended simulation duration
+    """
+
+    # the template itself is not simulated, so it can be copied for the next seed
+    snapshot = _copy_model(model=model)
+    snapshot.id = epi_id
+    snapshot.params.fixedValues = param_values
+    snapshot.simulate_until(seed=seed, time_index=_get_time_index_to_fork(model=snapshot))
+
+    list_of_outputs = []
+    for i, variable_values in enumerate(scenario_definitions):
+        fork = _copy_model(model=snapshot)
+        fork.settings.update_settings(*variable_values)
+        fork.params.update_rapid_test(model_sets=fork.settings)
+
+        outputs = []
+        if if_extend is None or if_extend[i]:
+            for sim_duration in extended_sim_durations:
+                # stop before the end of the simulation and continue a copy of the model (its end state)
+                # for the extended simulation duration
+                fork.continue_simulation(time_index=fork.settings.nDeltaTsInSimulation)
+                extended = _copy_model(model=fork)
+                extended.extend_simulation_duration(sim_duration=sim_duration)
+                outputs.append(_end_simulation(model=fork))
+                fork = extended
+        outputs.append(_end_simulation(model=fork))
+        list_of_outputs.append(outputs)
+
+    return snapshot.runTime, list_of_outputs
+
+
+def _end_simulation(model):
+    """ simulates a model until the end of the simulation
+    :param model: (ForkableEpiModel) a model
+    :return: (MultiEpidemicsOutputs) outputs of the trajectory
+    """
+
+    model.continue_simulation()
+    outputs = MultiEpidemicsOutputs()
+    outputs.extract_outputs(simulated_model=model, store_param_values=model.settings.storeParameterValues)
+    return outputs
+
+
+def _simulate_scenarios_with_template_of_process(template_key, model_settings, function_to_populate_model,
+                                                 batch_id, epi_id, seed, param_values, scenario_definitions,
+                                                 extended_sim_durations, if_extend):
+    """ simulates the template model of this process (see worker_pool.get_template for the first 3 arguments,
+    compact_outputs.pack_outputs for batch_id, and _simulate_scenarios_of_seed for the others)
+    :return: (tuple) of the run time of the snapshot and (list) of lists of outputs (CompactOutputs)
+        of the trajectory of each scenario (see _simulate_scenarios_of_seed) """
+
+    model = get_template(key=template_key, model_class=ForkableEpiModel, model_settings=model_settings,
+                         function_to_populate_model=function_to_populate_model)
+    snapshot_run_time, list_of_outputs = _simulate_scenarios_of_seed(
+        model=model, epi_id=epi_id, seed=seed, param_values=param_values, scenario_definitions=scenario_definitions,
+        extended_sim_durations=extended_sim_durations, if_extend=if_extend)
+    return snapshot_run_time, [[pack_outputs(outputs=o, batch_id=batch_id) for o in outputs]
+                               for outputs in list_of_outputs]
+
+
+class ScenarioJob:
+    """ scenarios of one seed (with the same transmission factor) that are simulated together
+    from the same snapshot of the model """
+
+    def __init__(self, simulator, seed_index, scenario_indices, args):
+        """
+        :param simulator: (ForkedScenarioSimulator) the simulator of these scenarios
+        :param seed_index: (int) index of the seed
+        :param scenario_indices: (list) of indices of scenarios to simulate
+        :param args: (tuple) of arguments of _simulate_scenarios_with_template_of_process to simulate this job
+        """
+
+        self.simulator = simulator
+        self.seedIndex = seed_index
+        self.scenarioIndices = scenario_indices
+        self.args = args
+
+
+class ForkedScenarioSimulator(ScenarioSimulator):
+    """ simulates scenarios by forking the trajectory of each seed at the end of the warm-up period
+    instead of simulating each scenario from time 0 (the results are the same as those of ScenarioSimulator).
+    Scenarios can also be simulated for longer simulation durations by continuing their trajectories
+    from the end of the simulation duration of model settings. """
+
+    def __init__(self, model_settings, scenario_names, variable_names, scenario_definitions, cache=None,
+                 if_streaming=False):
+        """ (the other arguments are the same as those of ScenarioSimulator)
+        :param cache: (ScenarioResultCache) to store the outputs of simulated (scenario, seed) cells and
+            to skip cells that are already simulated (if None, no cache is used)
+        :param if_streaming: (bool) set to True to only keep the summary statistics of outcomes of each scenario
+            (which are updated as cells are simulated) instead of the outputs of all trajectories
+            (so the memory used does not grow with the number of trajectories)
+        """
+
+        ScenarioSimulator.__init__(self, model_settings=model_settings, scenario_names=scenario_names,
+                                   variable_names=variable_names, scenario_definitions=scenario_definitions)
+        self.cache = cache
+        self.ifStreaming = if_streaming
+        self.extendedResults = dict()  # results for extended simulation durations keyed by the duration
+
+        # state of a simulation (see get_jobs)
+        self.extendedSimDurations = []
+        self.ifExtend = []  # if each scenario is simulated for extended simulation durations
+        self.outputsByScenario = []
+        self.statsByScenario = []  # in the streaming mode
+        self.keysByScenario = []
+
+    def simulate(self, function_to_populate_model, num_of_sims=1, if_run_in_parallel=False,
+                 seeds=None, weights=None, sample_seeds_by_weights=True, initial_seed=None,
+                 print_summary_stats=False, sig_digits=5, interval='p',
+                 extended_sim_durations=None, extended_scenario_names=None):
+        """ (the other arguments are the same as those of ScenarioSimulator.simulate)
+        :param initial_seed: (int) to initialize the seed of the RandomState that is used to generate the seeds of
+            simulated trajectories when seeds are not provided (the same seeds are used for all scenarios)
+        :param extended_sim_durations: (list) of simulation durations longer than that of model settings
+            to also simulate the scenarios for (by continuing the trajectories of the simulation duration
+            of model settings instead of simulating them again)
+        :param extended_scenario_names: (list) of names of scenarios to simulate for extended simulation durations
+            (if None, all scenarios)
+        """
+
+        jobs = self.get_jobs(function_to_populate_model=function_to_populate_model, num_of_sims=num_of_sims,
+                             seeds=seeds, weights=weights, sample_seeds_by_weights=sample_seeds_by_weights,
+                             initial_seed=initial_seed, extended_sim_durations=extended_sim_durations,
+                             extended_scenario_names=extended_scenario_names)
+
+        # in the streaming mode, the outputs of each batch of jobs update the statistics and are then dropped
+        batch_size = STREAMING_BATCH_SIZE if self.ifStreaming else max(len(jobs), 1)
+        for j in range(0, len(jobs), batch_size):
+            batch = jobs[j:j + batch_size]
+            if not if_run_in_parallel:
+                results = [_simulate_scenarios_with_template_of_process(*job.args) for job in batch]
+            else:
+                # each process of the session's pool populates its template once
+                # and then simulates the scenarios of many seeds
+                results = get_pool().starmap(_simulate_scenarios_with_template_of_process,
+                                             [job.args for job in batch])
+
+            # outputs are returned in the compact form (see compact_outputs)
+            for job, list_of_outputs in zip(batch, unpack_results(results=[result[1] for result in results])):
+                self.set_outputs_of_job(job=job, list_of_outputs=list_of_outputs)
+
+        self.calculate_results(print_summary_stats=print_summary_stats, sig_digits=sig_digits, interval=interval)
+
+    def get_jobs(self, function_to_populate_model, num_of_sims=1,
+                 seeds=None, weights=None, sample_seeds_by_weights=True, initial_seed=None,
+                 extended_sim_durations=None, extended_scenario_names=None):
+        """ finds the (scenario, seed) cells to simulate (those that are not in the cache) and
+        groups them into jobs (the arguments are the same as those of simulate);
+        the outputs of each job should be passed to set_outputs_of_job and then calculate_results should be called
+        (the model settings of the simulator are not changed)
+        :return: (list) of ScenarioJob (the scenarios of one seed with the same transmission factor)
+        """
+
+        extended_sim_durations = sorted(extended_sim_durations) if extended_sim_durations else []
+        if len(extended_sim_durations) > 0 and extended_sim_durations[0] <= self.modelSets.simulationDuration:
+            raise ValueError('Extended simulation durations should be longer than the simulation duration '
+                             'of model settings ({}).'.format(self.modelSets.simulationDuration))
+        self.extendedSimDurations = extended_sim_durations
+        self.ifExtend = [extended_scenario_names is None or name in extended_scenario_names
+                         for name in self.scenariosNames]
+
+        # seeds (the same for all scenarios)
+        seed_generator = SeedGenerator(seeds=seeds, weights=weights)
+        initial_seed = 0 if initial_seed is None else initial_seed
+        seeds = seed_generator.next_seeds(
+            n=num_of_sims, rng=RandomState(initial_seed), sample_by_weight=sample_seeds_by_weights)
+
+        settings_of_scenarios = [self._get_settings_of_scenario(scenario_index=i)
+                                 for i in range(len(self.scenarioDefinitions))]
+
+        # scenarios with different transmission factors differ from time 0,
+        # so scenarios are forked from the same snapshot only if they have the same transmission factor
+        scenarios_by_transm_factor = dict()
+        for i, model_settings in enumerate(settings_of_scenarios):
+            scenarios_by_transm_factor.setdefault(model_settings.transmissionFactor, []).append(i)
+
+        if self.ifStreaming:
+            # summary statistics of outputs of each scenario for each simulation duration
+            self.statsByScenario = [[StreamingOutputs() for j in range(1 + len(extended_sim_durations) * if_extend)]
+                                    for if_extend in self.ifExtend]
+            self.outputsByScenario = []
+        else:
+            # outputs (list of MultiEpidemicsOutputs for each simulation duration) of each trajectory of each scenario
+            self.outputsByScenario = [[None] * num_of_sims for i in range(len(self.scenarioDefinitions))]
+
+        # cells (scenario, seed) whose outputs are in the cache are not simulated again
+        cached_cells = set()
+        self.keysByScenario = []  # keys of cells of each scenario for each simulation duration
+        if self.cache is not None:
+            for i, variable_values in enumerate(self.scenarioDefinitions):
+                sim_durations = [None] + (extended_sim_durations if self.ifExtend[i] else [])
+                self.keysByScenario.append([self.cache.get_keys(
+                    model_settings=settings_of_scenarios[i], scenario_definition=variable_values,
+                    seeds=seeds, sim_duration=sim_duration) for sim_duration in sim_durations])
+
+                for k in range(num_of_sims):
+                    outputs = [self.cache.get(key=keys[k]) for keys in self.keysByScenario[i]]
+                    if None not in outputs:
+                        for o in outputs:
+                            o.ids[0] = k
+                        self._store_outputs(scenario_index=i, seed_index=k, outputs=outputs)
+                        cached_cells.add((i, k))
+
+        jobs = []
+        # the processes send the layout of outputs (see compact_outputs) once for all jobs
+        batch_id = get_batch_id()
+        for indices in scenarios_by_transm_factor.values():
+
+            # settings of the template of this group of scenarios (without the parameter values of seeds,
+            # copied so jobs do not share objects with the model settings of the simulator)
+            model_settings = copy.deepcopy(get_template_settings(model_settings=settings_of_scenarios[indices[0]]))
+            template_key = get_template_key(model_class=ForkableEpiModel, model_settings=model_settings,
+                                            function_to_populate_model=function_to_populate_model)
+
+            for k in range(num_of_sims):
+                to_simulate = [i for i in indices if (i, k) not in cached_cells]
+                if len(to_simulate) > 0:
+                    jobs.append(ScenarioJob(
+                        simulator=self, seed_index=k, scenario_indices=to_simulate,
+                        args=(template_key, model_settings, function_to_populate_model, batch_id,
+                              k, seeds[k], self.modelSets.paramValuesBySeed.get(seeds[k], dict()),
+                              [self.scenarioDefinitions[i] for i in to_simulate],
+                              extended_sim_durations, [self.ifExtend[i] for i in to_simulate])))
+        return jobs
+
+    def set_outputs_of_job(self, job, list_of_outputs):
+        """ stores (and caches) the outputs of a simulated job
+        :param job: (ScenarioJob) a job returned by get_jobs
+        :param list_of_outputs: (list) of outputs of each scenario of the job
+            (list of MultiEpidemicsOutputs for each simulation duration)
+        """
+
+        for i, outputs in zip(job.scenarioIndices, list_of_outputs):
+            self._store_outputs(scenario_index=i, seed_index=job.seedIndex, outputs=outputs)
+            if self.cache is not None:
+                for keys, o in zip(self.keysByScenario[i], outputs):
+                    self.cache.put(key=keys[job.seedIndex], outputs=o)
+
+    def _store_outputs(self, scenario_index, seed_index, outputs):
+        """ stores the outputs of a (scenario, seed) cell
+        (in the streaming mode, updates the summary statistics of the scenario with them instead)
+        :param scenario_index: (int) index of the scenario
+        :param seed_index: (int) index of the seed
+        :param outputs: (list) of MultiEpidemicsOutputs for each simulation duration
+        """
+
+        if self.ifStreaming:
+            for stats, o in zip(self.statsByScenario[scenario_index], outputs):
+                stats.add(outputs=o)
+        else:
+            self.outputsByScenario[scenario_index][seed_index] = outputs
+
+    def calculate_results(self, print_summary_stats=False, sig_digits=5, interval='p'):
+        """ calculates the results of scenarios after the outputs of all jobs are set
+        (the arguments are the same as those of simulate) """
+
+        if self.cache is not None:
+            self.cache.evict()
+
+        self.results = self._get_results(
+            scenario_indices=range(len(self.scenarioDefinitions)), duration_index=0,
+            print_summary_stats=print_summary_stats, sig_digits=sig_digits, interval=interval)
+
+        self.extendedResults = dict()
+        extended_indices = [i for i in range(len(self.scenarioDefinitions)) if self.ifExtend[i]]
+        for j, sim_duration in enumerate(self.extendedSimDurations):
+            if print_summary_stats:
+                print('\nSimulation duration of {} years:'.format(sim_duration))
+            self.extendedResults[sim_duration] = self._get_results(
+                scenario_indices=extended_indices, duration_index=j + 1,
+                print_summary_stats=print_summary_stats, sig_digits=sig_digits, interval=interval)
+
+    def _get_settings_of_scenario(self, scenario_index):
+        """
+        :param scenario_index: (int) index of a scenario
+        :return: a copy of model settings updated for this scenario (the model settings of the simulator
+            are not changed)
+        """
+
+        variable_values = self.scenarioDefinitions[scenario_index]
+
+        # check (as ScenarioSimulator.simulate)
+        sig = signature(self.modelSets.update_settings)
+        sig_list = [key for key in sig.parameters]
+        if len(sig.parameters) != len(variable_values):
+            raise ValueError("The function 'update_settings' of ModelSettings must have the same number of "
+                             "argument as the number of variables used to define a scenario.\n"
+                             "Number of arguments: {}, number of scenario variables: {}.\n"
+                             "Arguments: {}\nScenario variables:{}"
+                             .format(len(sig.parameters), len(variable_values), sig_list, variable_values))
+
+        # (update_settings only sets attributes of model settings, so a shallow copy is enough)
+        model_settings = copy.copy(self.modelSets)
+        model_settings.update_settings(*variable_values)
+        return model_settings
+
+    def _get_results(self, scenario_indices, duration_index, print_summary_stats, sig_digits, interval):
+        """ assembles the results of scenarios as ScenarioSimulator.simulate does
+        :param scenario_indices: (list) of indices of scenarios
+        :param duration_index: (int) index of the simulation duration (0 for the simulation duration of
+            model settings and j + 1 for the j-th extended simulation duration)
+        :param print_summary_stats: (bool) set to True to print the summary statistics of each scenario
+        :param sig_digits: (int) number of significant digits to use when printing statistics
+        :param interval: (string) 'c' for confidence interval and 'p' for percentile interval.
+        :return: (dictionary) of columns of results (as ScenarioSimulator.results, or in the streaming mode,
+            the summary statistics of each outcome of each scenario)
+        """
+
+        # dictionary (with one key) of scenario names
+        dict_of_scenario_names = dict()
+        dict_of_scenario_names['Scenarios'] = []
+
+        # crete the dictionary of columns representing scenario variables
+        dict_of_variables = dict()
+        for name in self.varNames:
+            dict_of_variables[name] = []
+
+        # summary and projections (or summary statistics in the streaming mode)
+        dict_of_summaries_and_projections = dict()
+        n = len(scenario_indices)
+        for j, i in enumerate(scenario_indices):
+
+            multi_model = MultiEpidemics(model_settings=self._get_settings_of_scenario(scenario_index=i))
+            if self.ifStreaming:
+                multi_model.multiModelOutputs = self.statsByScenario[i][duration_index]
+                dict_of_scenario = multi_model.multiModelOutputs.get_dict_of_summary()
+                n_rows = len(dict_of_scenario['Outcome'])
+            else:
+                for outputs in self.outputsByScenario[i]:
+                    _append_outputs(outputs=multi_model.multiModelOutputs, new_outputs=outputs[duration_index])
+                multi_model.multiModelOutputs.calculate_summary_stats()
+                dict_of_scenario = multi_model.get_dict_summary_and_projections()
+                n_rows = len(self.outputsByScenario[i])
+
+            dict_of_scenario_names['Scenarios'].extend([self.scenariosNames[i]] * n_rows)
+            for k, name in enumerate(self.varNames):
+                dict_of_variables[name].extend([self.scenarioDefinitions[i][k]] * n_rows)
+            for key, value in dict_of_scenario.items():
+                dict_of_summaries_and_projections.setdefault(key, []).extend(value)
+
+            # print
+            text = "Scenario '{}' is done... ({} of {})".format(self.scenariosNames[i], j+1, n)
+            if print_summary_stats:
+                print('\n' + text)
+                multi_model.print_summary_stats(interval=interval, sig_digits=sig_digits)
+            else:
+                print(text)
+
+        # making sure there are the same number of rows for all columns
+        n = len(dict_of_scenario_names['Scenarios'])
+        for key, value in dict_of_summaries_and_projections.items():
+            if len(value) != n:
+                raise ValueError("Some scenarios didn't report on outcome '{}'.".format(key))
+
+        # making sure the names are not repeated
+        for key in dict_of_variables:
+            if key in dict_of_summaries_and_projections:
+                raise ValueError("The variable '{}' is also the name of a model outcome "
+                                 "(or a column of summary statistics). Rename the variable name.".format(key))
+
+        return dict_of_scenario_names | dict_of_variables | dict_of_summaries_and_projections
+
+    def export_results(self, filename='simulated_scenarios.csv'):
+        """ exports the results of scenarios (by writing to a temporary file first, see atomic_io);
+        in the streaming mode, the results are the summary statistics of outcomes of each scenario
+        (which are not in the format ScenarioDataFrame reads)
+        :param filename: (string) filename to save the results as
+        """
+
+        with atomic_output(filename) as temp_file_name:
+            write_dictionary_to_csv(dictionary=self.results, file_name=temp_file_name)
+
+    def export_extended_results(self, sim_duration, filename='simulated_scenarios.csv'):
+        """ exports the results of scenarios simulated for an extended simulation duration
+        :param sim_duration: (float) the extended simulation duration
+        :param filename: (string) filename to save the results as
+        """
+
+        with atomic_output(filename) as temp_file_name:
+            write_dictionary_to_csv(dictionary=self.extendedResults[sim_duration], file_name=temp_file_name)
@@ -0,0 +1,190 @@
+import numpy as np
+
+from model.batch_simulator import BatchEpidemics, N_SYMP_STATES, N_REST_PROFILES, N_STRATA, IDX_S, IDX_IS, \
+    IDX_FS, ENTRIES_INFECTION, ENTRIES_CRO, ENTRIES_M, ENTRIES_RETX, N_ENTRIES
+
+"""
+Hybrid version of the gonorrhea model (as defined in model_structure.build_model).
+Resistance profiles with many infected members (at least MIN_SIZE_OF_COMMON_PROFILE in Is and Fs) are
+simulated as in the mean-field model: the expected number of members moves along each event and each path of
+chance nodes. Profiles with fewer infected members (rare profiles, which include the profiles with no
+infected member) are simulated as in the stochastic (batch) model: their compartments hold whole numbers of
+members, and their infections, recoveries, treatments, and re-treatments are sampled. Members that enter
+a rare profile from a common one (the emergence of resistance after treatment) are sampled by Poisson draws.
+So the time when resistance to a drug first emerges and takes hold (which drives the switch to M)
+is stochastic, while the large flows of common profiles do not need random draws.
+Surveillance has the same noise as in the stochastic model.
+"""
+
+MIN_SIZE_OF_COMMON_PROFILE = 100  # minimum number of infected members of a resistance profile to simulate it
+                                  # deterministically
+
+# resistance profile of each stratum
+PROFILE_OF_STRATA = np.arange(N_STRATA) % N_REST_PROFILES
+# resistance profile of members entering each entry node of the compiled chance nodes
+PROFILE_OF_ENTRIES = np.zeros(N_ENTRIES, dtype=int)
+PROFILE_OF_ENTRIES[ENTRIES_INFECTION] = np.arange(N_REST_PROFILES)
+for _entries in (ENTRIES_CRO, ENTRIES_M, ENTRIES_RETX):
+    PROFILE_OF_ENTRIES[_entries] = PROFILE_OF_STRATA
+
+
+class HybridEpidemics(BatchEpidemics):
+    """ simulates the hybrid version of the gonorrhea model for multiple parameter samples together """
+
+    def __init__(self, model_settings):
+        """
+        :param model_settings: (GonoSettings) model settings
+        """
+
+        BatchEpidemics.__init__(self, model_settings=model_settings)
+
+        # resistance profile of the destination compartment of each outcome of each entry node
+        # (-1 for S and for outcomes that do not exist)
+        profile_of_comparts = np.full(self.chanceNodes.nComparts, -1)
+        profile_of_comparts[IDX_IS] = PROFILE_OF_STRATA
+        profile_of_comparts[IDX_FS] = PROFILE_OF_STRATA
+        dest_comparts = self.chanceNodes.destinations.argmax(axis=1)
+        self.profileOfOutcomes = np.where(self.chanceNodes.destinations.sum(axis=1) > 0,
+                                          profile_of_comparts[dest_comparts], -1).reshape(N_ENTRIES, -1)
+
+        # outcomes of entry nodes that reach a compartment of another resistance profile (emergence of resistance)
+        self.entryOfEmergence, self.outcomeOfEmergence = np.nonzero(
+            (self.profileOfOutcomes >= 0) & (self.profileOfOutcomes != PROFILE_OF_ENTRIES[:, np.newaxis]))
+        self.profileOfEmergence = self.profileOfOutcomes[self.entryOfEmergence, self.outcomeOfEmergence]
+        # (np.array of shape (n_emergence_outcomes, n_entries)) to add up the members of emergence outcomes
+        # by entry node
+        self.emergenceToEntries = np.zeros((len(self.entryOfEmergence), N_ENTRIES))
+        self.emergenceToEntries[np.arange(len(self.entryOfEmergence)), self.entryOfEmergence] = 1
+
+        self.ifRare = None  # (np.array of shape (n, N_REST_PROFILES)) if each resistance profile is rare
+
+    def _initialize(self):
+        """ sets the initial state of all trajectories """
+
+        BatchEpidemics._initialize(self)
+
+        # compartment sizes and incidences are real numbers (whole numbers for rare profiles)
+        self.sizes = self.sizes.astype(float)
+        self._reset_incidence()
+
+    def _update_compartments(self, k):
+        """ advances all trajectories by one simulation time-step
+        :param k: (int) simulation time index
+        """
+
+        # rare resistance profiles over this time-step
+        infected = self.sizes[:, IDX_IS] + self.sizes[:, IDX_FS]
+        n_by_profile = infected.reshape(-1, N_SYMP_STATES, N_REST_PROFILES).sum(axis=1)
+        self.ifRare = n_by_profile < MIN_SIZE_OF_COMMON_PROFILE
+        self._round_rare_strata()
+
+        BatchEpidemics._update_compartments(self, k=k)
+
+    def _round_rare_strata(self):
+        """ rounds the compartments of rare profiles (those of profiles that have just become rare) to whole
+        numbers of members without changing the population size: the fractions of members of these compartments
+        are rounded up or down by systematic sampling (each is rounded up with probability equal to
+        the fraction) and what is left after rounding is added to S """
+
+        sizes = np.concatenate((self.sizes[:, IDX_IS], self.sizes[:, IDX_FS]), axis=1)
+        rare_strata = np.tile(self.ifRare[:, PROFILE_OF_STRATA], 2)
+        # (sizes within rounding errors of whole numbers are not changed)
+        whole = np.floor(sizes + 1e-9)
+        fracs = np.where(rare_strata, np.maximum(sizes - whole, 0), 0)
+        i = np.nonzero(fracs.sum(axis=1) > 0)[0]
+        if len(i) == 0:
+            return
+
+        # systematic sampling with a single random start for each trajectory
+        cum_fracs = fracs[i].cumsum(axis=1)
+        u = self.rng.random((len(i), 1))
+        rounded_up = np.floor(cum_fracs + u) - np.floor(cum_fracs - fracs[i] + u)
+        rounded = np.where(rare_strata[i], whole[i] + rounded_up, sizes[i])
+
+        self.sizes[i, IDX_S] += (sizes[i] - rounded).sum(axis=1)
+        self.sizes[i, IDX_IS] = rounded[:, :N_STRATA]
+        self.sizes[i, IDX_FS] = rounded[:, N_STRATA:]
+
+    def _sample_infections(self, n_susceptible, rates):
+        """ (as BatchEpidemics._sample_infections; sampled only for rare profiles) """
+
+        probs = self._get_probs_of_competing_events(rates=rates)[:, :-1]
+        infections = n_susceptible[:, np.newaxis] * probs
+        i = np.nonzero((self.ifRare & (probs > 0)).any(axis=1))[0]
+        if len(i) == 0:
+            return infections
+
+        # infections by rare profiles compete for the same susceptible members, so they are sampled jointly
+        # (the last category is no infection by a rare profile)
+        rare_probs = np.where(self.ifRare[i], probs[i], 0)
+        prob_not_rare = np.maximum(1 - rare_probs.sum(axis=1), 0)
+        rare_infections = self.rng.multinomial(
+            np.rint(n_susceptible[i]).astype(np.int64),
+            np.concatenate((rare_probs, prob_not_rare[:, np.newaxis]), axis=1))[:, :-1]
+
+        # and the members not infected by a rare profile are infected by common profiles as expected
+        n_not_rare = np.maximum(n_susceptible[i] - rare_infections.sum(axis=1), 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            common_infections = np.where(prob_not_rare[:, np.newaxis] > 0,
+                                         n_not_rare[:, np.newaxis] * probs[i] / prob_not_rare[:, np.newaxis], 0)
+        infections[i] = np.where(self.ifRare[i], rare_infections, common_infections)
+        return infections
+
+    def _sample_exits_of_infected(self, n_infected, rates):
+        """ (as BatchEpidemics._sample_exits_of_infected; sampled only for strata of rare profiles) """
+
+        probs = self._get_probs_of_competing_events(rates=rates)
+        exits = n_infected[..., np.newaxis] * probs[..., :-1]
+        i, s = np.nonzero(self.ifRare[:, PROFILE_OF_STRATA] & (n_infected > 0))
+        exits[i, s] = self.rng.multinomial(n_infected[i, s].astype(np.int64), probs[i, s])[:, :-1]
+        return exits
+
+    def _sample_retreatments(self, n_failed, prob):
+        """ (as BatchEpidemics._sample_retreatments; sampled only for strata of rare profiles) """
+
+        retx = n_failed * prob
+        i, s = np.nonzero(self.ifRare[:, PROFILE_OF_STRATA] & (n_failed > 0))
+        retx[i, s] = self.rng.binomial(n_failed[i, s].astype(np.int64), prob[i, 0])
+        return retx
+
+    def _sample_outcomes_of_chance_nodes(self, n_in, epi_time):
+        """
+        :param n_in: (np.array of shape (n, n_entries)) number of members entering each entry node
+        :param epi_time: (float) epidemic time
+        :return: (tuple) number of members arriving at each compartment and passing through each counted node
+        """
+
+        probs = self._get_outcome_probs(epi_time=epi_time)
+        rare_entries = self.ifRare[:, PROFILE_OF_ENTRIES]
+
+        # members of common profiles move as in the mean-field model
+        n_common = np.where(rare_entries, 0, n_in)
+        outs = n_common[..., np.newaxis] * probs
+
+        # except those who reach compartments of rare profiles (the emergence of resistance),
+        # who are sampled by Poisson draws (the other members of their entry nodes follow the other outcomes)
+        expected = np.where(self.ifRare[:, self.profileOfEmergence],
+                            outs[:, self.entryOfEmergence, self.outcomeOfEmergence], 0)
+        emerged = np.zeros(expected.shape)
+        i, j = np.nonzero(expected)
+        emerged[i, j] = self.rng.poisson(expected[i, j])
+        n_others = n_common - expected @ self.emergenceToEntries
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale = np.where(n_others > 0, np.maximum(n_common - emerged @ self.emergenceToEntries, 0) / n_others, 0)
+        outs *= scale[..., np.newaxis]
+        outs[:, self.entryOfEmergence, self.outcomeOfEmergence] = np.where(
+            expected > 0, emerged, outs[:, self.entryOfEmergence, self.outcomeOfEmergence])
+
+        # members of rare profiles (whole numbers) are sampled as in the stochastic model
+        i, e = np.nonzero(rare_entries & (n_in > 0))
+        outs[i, e] = self.rng.multinomial(n_in[i, e].astype(np.int64), probs[i, e])
+
+        # the whole numbers of members who emerge from entry nodes with fractions of members can be more (or fewer)
+        # than the members of these nodes, so the difference is taken from (or added to) S to keep
+        # the population size
+        n_left = (n_in - outs.sum(axis=2)).sum(axis=1)
+
+        outs = outs.reshape(n_in.shape[0], -1)
+        to_comparts = outs @ self.chanceNodes.destinations
+        to_comparts[:, IDX_S] += n_left
+        return to_comparts, outs @ self.chanceNodes.nodesPassed
@@ -0,0 +1,80 @@
+import numpy as np
+
+from model.batch_simulator import BatchEpidemics
+
+"""
+Deterministic (mean-field) version of the gonorrhea model (as defined in model_structure.build_model).
+Compartment sizes are real numbers and over each simulation time-step, the expected number of members
+moves along each event and each path of chance nodes (given the compartment sizes at the start of the time-step).
+Trajectories differ only in their parameter values (sampled from the same seeds as the stochastic models),
+so this model is suited for screening parameter values and for quickly comparing scenarios.
+"""
+
+
+class MeanFieldEpidemics(BatchEpidemics):
+    """ simulates the mean-field version of the gonorrhea model for multiple parameter samples together
+    (the surveyed ratios have no survey noise) """
+
+    def __init__(self, model_settings):
+        """
+        :param model_settings: (GonoSettings) model settings
+        """
+
+        BatchEpidemics.__init__(self, model_settings=model_settings)
+
+        # (np.array of shape (n, n_entries, n_compartments + n_counted_nodes)) expected transfers of members
+        # through chance nodes (see CompiledChanceNodes.get_expected_transfers)
+        self.transfers = None
+        self.probsOfTransfers = None  # probabilities of outcomes that transfers are calculated for
+
+    def _initialize(self):
+        """ sets the initial state of all trajectories """
+
+        BatchEpidemics._initialize(self)
+
+        # compartment sizes and incidences are real numbers
+        self.sizes = self.sizes.astype(float)
+        self._reset_incidence()
+
+    def _sample_competing_events(self, sizes, rates):
+        """
+        :param sizes: (np.array) size of each compartment
+        :param rates: (np.array) rates of competing events out of each compartment (last axis)
+        :return: (np.array) expected number of members leaving by each event
+        """
+
+        return sizes[..., np.newaxis] * self._get_probs_of_competing_events(rates=rates)[..., :-1]
+
+    def _sample_binomial(self, n, p):
+        """
+        :param n: (np.array) number of trials
+        :param p: (np.array) probability of success
+        :return: (np.array) expected number of successes
+        """
+
+        return n * p
+
+    def _sample_outcomes_of_chance_nodes(self, n_in, epi_time):
+        """
+        :param n_in: (np.array of shape (n, n_entries)) number of members entering each entry node
+        :param epi_time: (float) epidemic time
+        :return: (tuple) expected number of members arriving at each compartment and
+            passing through each counted node
+        """
+
+        probs = self._get_outcome_probs(epi_time=epi_time)
+        if probs is not self.probsOfTransfers:
+            # transfers to compartments and counted nodes are stacked to be calculated together
+            self.transfers = np.concatenate(self.chanceNodes.get_expected_transfers(probs=probs), axis=2)
+            self.probsOfTransfers = probs
+
+        outs = np.einsum('ne,nec->nc', n_in, self.transfers, optimize=True)
+        return outs[:, :self.chanceNodes.nComparts], outs[:, self.chanceNodes.nComparts:]
+
+    def _add_survey_noise(self, ratio):
+        """
+        :param ratio: (np.array) ratios (nan if not available)
+        :return: (np.array) the same ratios (surveillance has no noise in the mean-field model)
+        """
+
+        return ratio
@@ -1,3 +1,6 @@
+import time
+
+import numpy as np
 from apacepy.inputs import EpiParameters
 from deampy.parameters import Constant, Inverse, Product, OneMinus, Uniform, Equal, \
     TenToPower, TimeDependentStepWise, Dirichlet, AnOutcomeOfAMultiVariateDist, \
@@ -5,6 +8,20 @@ from deampy.parameters import Constant, Inverse, Product, OneMinus, Uniform, Equ
 
 from definitions import RestProfile, AB, SympStat, REST_PROFILES, END_OF_WARM_UP, ConvertSympAndResitAndAntiBio, \
     CIP_SENS_DIST, CIP_SPEC_DIST, TET_SENS_DIST, TET_SPEC_DIST
+from numpy import iinfo, int32
+from numpy.random import RandomState
+
+# tolerance (relative to the simulation time-step) of times on the time grid of the simulation
+TIME_TOLERANCE = 1e-6
+
+
+def _get_time_of_last_update(model_sets):
+    """
+    :param model_sets: (GonoSettings) model settings
+    :return: (float) epidemic time of the last update of time-dependent parameters in a simulation
+    """
+
+    return (int(model_sets.simulationDuration / model_sets.deltaT) - 1) * model_sets.deltaT
 
 
 class Parameters(EpiParameters):
@@ -16,6 +33,9 @@ class Parameters(EpiParameters):
 
         EpiParameters.__init__(self)
 
+        # values to use instead of sampled values (keyed by parameter names as in parameter_values.csv)
+        self.fixedValues = dict()
+
         one_over_364 = 1/364
         self.precIBySymp = [None] * len(SympStat)
         self.percIByRestProfile = [None] * (len(RestProfile) - 1)
@@ -123,6 +143,15 @@ class Parameters(EpiParameters):
         self.sizeI = None
         self.sizeIBySympAndRest = None
 
+        # relative infectivity, infectivity, and probability of receiving a rapid test over the time grid of
+        # the simulation (one row per simulation time index), tabulated once parameters are sampled
+        self.deltaT = model_sets.deltaT
+        self.nDeltaTs = int(model_sets.simulationDuration / model_sets.deltaT)
+        self.ratioInfOverTime = None  # (np.array of shape (n_time_indices, n_rest_profiles))
+        self.infectivityOverTime = None  # (np.array of shape (n_time_indices, n_rest_profiles))
+        self.probRapidTestOverTime = None  # (np.array of shape (n_time_indices, ))
+        self.untabulatedTimeDepParams = []  # time-dependent parameters that are not tabulated
+
         self.calculate_dependent_params(model_sets)
         self.build_dict_of_params()
 
@@ -261,8 +290,456 @@ class Parameters(EpiParameters):
         self.dictOfParams['Size of I'] = self.sizeI
         self.dictOfParams['Size of I by Symp/Rest'] = self.sizeIBySympAndRest
 
+    def list_time_dependent_params(self):
+
+        EpiParameters.list_time_dependent_params(self)
+        tabulated = {id(par) for par in self.ratioInf + self.infectivityByRestProfile + [self.probRapidTest]}
+        self.untabulatedTimeDepParams = [par for par in self.listOfTimeDependParams if id(par) not in tabulated]
+
+    def sample_parameters(self, rng, time):
+
+        EpiParameters.sample_parameters(self, rng=rng, time=time)
+        self.tabulate_time_dependent_params()
+
+    def tabulate_time_dependent_params(self, n_delta_ts=None):
+        """ evaluates the relative infectivity, infectivity, and probability of receiving a rapid test
+        at each time index of the simulation (with the sampled parameter values)
+        :param n_delta_ts: (int) number of simulation time-steps to tabulate (if the simulation duration has changed)
+        """
+
+        if n_delta_ts is not None:
+            self.nDeltaTs = n_delta_ts
+        times = np.arange(self.nDeltaTs + 1) * self.deltaT
+
+        # the vectorized version of TimeDependentSigmoid
+        self.ratioInfOverTime = np.zeros((len(times), len(RestProfile)))
+        for p, par in enumerate(self.ratioInf):
+            logistic = 1 / (1 + np.exp(-par.parB.value * (times - par.parTMid.value - par.parTMin.value)))
+            self.ratioInfOverTime[:, p] = np.where(
+                times < par.parTMin.value, 0, par.parMin.value + (par.parMax.value - par.parMin.value) * logistic)
+        self.infectivityOverTime = self.transm.value * self.ratioInfOverTime
+
+        self._tabulate_prob_rapid_test()
+
+    def _tabulate_prob_rapid_test(self):
+        """ evaluates the probability of receiving a rapid test at each time index of the simulation
+        (the vectorized version of TimeDependentStepWise) """
+
+        times = np.arange(self.nDeltaTs + 1) * self.deltaT
+        i = np.searchsorted(self.probRapidTest.ts, times, side='right') - 1
+        self.probRapidTestOverTime = np.where(i >= 0, np.array(self.probRapidTest.vs)[np.maximum(i, 0)], 0)
+
+    def update_time_dependent_params(self, rng, time):
+        """ updates time-dependent parameters (tabulated parameters are read from their tables
+        if time is on the time grid of the simulation; tables are extended for times past their end) """
+
+        if time is None:
+            time = 0
+
+        k = int(round(time / self.deltaT))
+        if self.infectivityOverTime is None or k < 0 or abs(k * self.deltaT - time) > TIME_TOLERANCE * self.deltaT:
+            EpiParameters.update_time_dependent_params(self, rng=rng, time=time)
+            return
+        if k >= len(self.infectivityOverTime):
+            # (at least doubled so that a simulation continued step by step extends the tables only a few times)
+            self.tabulate_time_dependent_params(n_delta_ts=max(k, 2 * self.nDeltaTs))
+
+        for par, value in zip(self.ratioInf, self.ratioInfOverTime[k].tolist()):
+            par.value = value
+        for par, value in zip(self.infectivityByRestProfile, self.infectivityOverTime[k].tolist()):
+            par.value = value
+        self.probRapidTest.value = self.probRapidTestOverTime[k].item()
+        for par in self.untabulatedTimeDepParams:
+            par.sample(rng=rng, time=time)
+
+    def _sample_this_param(self, param, rng, time, label):
+        """ samples a parameter and replaces the sampled value with the fixed value of this parameter
+        (if provided) so that the random number stream is the same with or without fixed values """
+
+        EpiParameters._sample_this_param(param=param, rng=rng, time=time, label=label)
+        if label in self.fixedValues:
+            param.value = self.fixedValues[label]
+
+    def update_rapid_test(self, model_sets):
+        """ updates the values of the coverage, sensitivity, and specificity of the rapid test to
+        those of the model settings (to continue simulating a model after the warm-up period,
+        before which the rapid test is not used, under a different rapid test scenario)
+        :param model_sets: (ModelSettings)
+        """
+
+        for par, dist, value in ((self.sensCIP, self.sensCIPBeta, model_sets.sensCIP),
+                                 (self.specCIP, self.specCIPBeta, model_sets.specCIP),
+                                 (self.sensTET, self.sensTETBeta, model_sets.sensTET),
+                                 (self.specTET, self.specTETBeta, model_sets.specTET)):
+            # use the value sampled from the beta distribution if the value is not provided
+            par.value = dist.value if value is None else value
+
+        for par in self.posCIPTest + self.posTETTest:
+            par.sample()
+
+        self.probRapidTest.vs = [model_sets.probRapidTest]
+        if self.probRapidTestOverTime is not None:
+            self._tabulate_prob_rapid_test()
+
+    def get_names_of_priors(self, if_scalar_only=True):
+        """
+        :param if_scalar_only: (bool) set to False to also include multivariate prior distributions
+        :return: (list) of names (as in parameter_values.csv) of parameters with prior distributions
+            (and of the outcomes of multivariate prior distributions), whose values determine the values of
+            all other parameters
+        """
+
+        names = []
+        for key, par in self.dictOfParams.items():
+            pars = [(key + '-' + str(i), p) for i, p in enumerate(par)] if isinstance(par, list) else [(key, par)]
+            for label, p in pars:
+                if isinstance(p, (Uniform, Beta)) or (isinstance(p, Dirichlet) and not if_scalar_only) or (
+                        isinstance(p, AnOutcomeOfAMultiVariateDist) and isinstance(p.multivariate, Dirichlet)):
+                    names.append(label)
+        return names
+
+    def get_bounds_of_uniform_priors(self):
+        """
+        :return: (dictionary) of (minimum, maximum) of parameters with uniform prior distributions
+            keyed by parameter names (as in parameter_values.csv)
+        """
+
+        bounds = dict()
+        for key, par in self.dictOfParams.items():
+            pars = [(key + '-' + str(i), p) for i, p in enumerate(par)] if isinstance(par, list) else [(key, par)]
+            for label, p in pars:
+                if isinstance(p, Uniform):
+                    bounds[label] = (p.par.loc, p.par.loc + p.par.scale)
+        return bounds
+
+
+class ParameterDraws:
+    """ draws of the parameters of Parameters sampled together: each prior distribution is sampled
+    for all draws at once and each dependent parameter is calculated for all draws by one vectorized expression.
+    Values are stored in a structured numpy array (one record per draw) whose fields are named as the columns
+    of parameter_values.csv and calibration_summary.csv (multivariate parameters have array fields). """
+
+    def __init__(self, model_sets, n, rng):
+        """
+        :param model_sets: (GonoSettings) model settings
+        :param n: (int) number of draws
+        :param rng: (RandomState) random number generator
+        """
+
+        start = time.time()
+
+        # the parameters of the model (which define the names of parameters and how they depend on each other)
+        self.params = Parameters(model_sets=model_sets)
+        self.nDraws = n
+        # time-dependent parameters are reported at the time of their last update (as EpiModel does)
+        self.time = _get_time_of_last_update(model_sets=model_sets)
+
+        self._rng = rng
+        self._values = dict()  # values of parameters for all draws keyed by the id of parameters
+        self._params = dict()  # parameters whose values are in self._values keyed by their id
+
+        # names of parameters with prior distributions, whose values determine the values of all other parameters
+        self.priorNames = self.params.get_names_of_priors(if_scalar_only=False)
+
+        # values of parameters keyed by names (as in parameter_values.csv)
+        columns = dict()
+        for key, par in self.params.dictOfParams.items():
+            pars = [(key + '-' + str(i), p) for i, p in enumerate(par)] if isinstance(par, list) else [(key, par)]
+            for label, p in pars:
+                columns[label] = self._get_values(par=p)
+
+        self.values = np.zeros(n, dtype=[(label, float, values.shape[1:]) for label, values in columns.items()])
+        for label, values in columns.items():
+            self.values[label] = values
+        self._values = None
+        self._params = None
+
+        self.runTime = time.time() - start  # time to sample the draws (seconds)
+
+    def _get_values(self, par):
+        """
+        :param par: a parameter of Parameters
+        :return: (np.array of shape (n, ) or (n, n_outcomes) for multivariate parameters) values of this parameter
+            in all draws (the vectorized versions of the sample methods of deampy's parameters;
+            parameters of other types are sampled draw by draw, see _sample_each_draw)
+        """
+
+        if id(par) in self._values:
+            return self._values[id(par)]
+
+        n = self.nDraws
+        if isinstance(par, Constant):
+            values = np.full(n, par.value, dtype=float)
+        elif isinstance(par, Uniform):
+            values = self._rng.uniform(low=par.par.loc, high=par.par.loc + par.par.scale, size=n)
+        elif isinstance(par, Beta):
+            values = self._rng.beta(par.par.a, par.par.b, size=n) * par.par.scale + par.par.loc
+        elif isinstance(par, Dirichlet):
+            a = np.array(par.parNs, dtype=float)
+            if_sampled = a > 0 if par.ifIgnore0s else np.ones(len(a), dtype=bool)
+            values = np.zeros((n, len(a)))
+            values[:, if_sampled] = self._rng.dirichlet(a[if_sampled], size=n)
+        elif isinstance(par, AnOutcomeOfAMultiVariateDist):
+            values = self._get_values(par=par.multivariate)[:, par.i]
+        elif isinstance(par, ValuesOfParams):
+            values = np.column_stack([self._get_values(par=p) for p in par.parameters])
+        elif isinstance(par, Equal):
+            values = self._get_values(par=par.par)
+        elif isinstance(par, OneMinus):
+            values = 1 - self._get_values(par=par.par)
+        elif isinstance(par, Inverse):
+            values = 1 / self._get_values(par=par.par)
+        elif isinstance(par, TenToPower):
+            values = np.power(10, self._get_values(par=par.par))
+        elif isinstance(par, Product):
+            values = np.ones(n)
+            for p in par.parameters:
+                values = values * self._get_values(par=p)
+        elif isinstance(par, TimeDependentSigmoid):
+            t_min = self._get_values(par=par.parTMin)
+            logistic = 1 / (1 + np.exp(-self._get_values(par=par.parB) * (
+                    self.time - self._get_values(par=par.parTMid) - t_min)))
+            values = np.where(self.time < t_min, 0, self._get_values(par=par.parMin) + (
+                    self._get_values(par=par.parMax) - self._get_values(par=par.parMin)) * logistic)
+        elif isinstance(par, TimeDependentStepWise):
+            values = np.full(n, par.sample(time=self.time), dtype=float)
+        else:
+            values = self._sample_each_draw(par=par)
+
+        self._values[id(par)] = values
+        self._params[id(par)] = par
+        return values
+
+    def _sample_each_draw(self, par):
+        """ samples a parameter for each draw by its sample method after setting the parameters sampled so far
+        to their values in the draw (the parameters a parameter depends on are defined before it in Parameters)
+        :param par: a parameter of Parameters
+        :return: (np.array) values of this parameter in all draws
+        """
+
+        sampled = [(self._params[key], values) for key, values in self._values.items()]
+        values = []
+        for i in range(self.nDraws):
+            for p, v in sampled:
+                p.value = v[i].tolist()
+            par.sample(rng=self._rng, time=self.time)
+            values.append(par.value)
+        return np.array(values, dtype=float)
+
+    def get_values(self, name, n_items=None):
+        """
+        :param name: (string) name of a parameter (as in parameter_values.csv)
+        :param n_items: (int) number of items of a list of parameters (named name-0, name-1, ...)
+        :return: (np.array of shape (n, ) or (n, n_items)) values of this parameter in all draws
+        """
+
+        if n_items is None:
+            return self.values[name]
+        return np.column_stack([self.values[name + '-' + str(i)] for i in range(n_items)])
 
+    def get_dict_of_param_values(self):
+        """
+        :return: (dictionary) of the values of each parameter in all draws (list) keyed by parameter names
+            (the columns of parameter_values.csv)
+        """
+
+        return {name: self.values[name].tolist() for name in self.values.dtype.names}
+
+    def get_prior_values(self, i):
+        """
+        :param i: (int) index of a draw
+        :return: (dictionary) of the values of parameters with prior distributions in this draw
+            keyed by parameter names (to use as the fixed values of Parameters)
+        """
 
+        return {name: self.values[name][i].tolist() for name in self.priorNames}
+
+    def get_prior_values_by_seed(self, seeds):
+        """
+        :param seeds: (list) of seeds (one per draw) of trajectories to simulate with these draws
+        :return: (dictionary) of the values of parameters with prior distributions (dictionary keyed by
+            parameter names) keyed by seed (see GonoSettings.paramValuesBySeed)
+        """
+
+        return {seed: self.get_prior_values(i=i) for i, seed in enumerate(seeds)}
+
+
+class BatchParameters:
+    """ parameter values of a batch of trajectories stored as numpy arrays
+    (one row per trajectory) to be used by the batch simulator """
+
+    def __init__(self, model_sets, seeds, draws=None):
+        """
+        :param model_sets: (GonoSettings) model settings
+        :param seeds: (list) of seeds (one per trajectory)
+        :param draws: (ParameterDraws) draws of parameters (one per trajectory) to use instead of
+            sampling the parameters of each seed
+        """
+
+        n = len(seeds)
+        n_rest_profiles = len(RestProfile)
+        self.seeds = seeds
+        self.nTrajs = n
+
+        # initial size of compartments
+        self.sizeS = np.zeros(n, dtype=np.int64)
+        self.sizeIBySympAndRest = np.zeros((n, len(SympStat) * n_rest_profiles), dtype=np.int64)
+
+        # infectivity
+        self.transm = np.zeros(n)
+        self.fitnessFMins = np.zeros((n, n_rest_profiles))
+        self.fitnessBs = np.zeros((n, n_rest_profiles))
+        self.fitnessTMids = np.zeros((n, n_rest_profiles))
+
+        # rapid test and treatment
+        self.probRapidTestSwitchTime = END_OF_WARM_UP
+        self.probRapidTest = np.zeros(n)
+        self.posCIPTest = np.zeros((n, n_rest_profiles))
+        self.posTETTest = np.zeros((n, n_rest_profiles))
+        self.probTxCIPIfSuspToCIPAndTET = np.zeros(n)
+        self.probResEmerge = np.zeros((n, len(AB)))
+
+        # natural history
+        self.probSym = np.zeros(n)
+        self.rateNaturalRecovery = np.zeros(n)
+        self.rateScreened = np.zeros(n)
+        self.rateTreatment = np.zeros(n)
+        self.rateRetreatment = np.zeros(n)
+        self.surveySize = np.zeros(n)
+
+        # sampled parameter values (with the same keys as the columns of parameter_values.csv)
+        self.dictOfParamValues = dict()
+
+        if draws is not None:
+            self._add_draws(draws=draws)
+            return
+
+        # time of the last update of time-dependent parameters
+        # (parameter values are reported at this time, as EpiModel does)
+        time_of_last_update = _get_time_of_last_update(model_sets=model_sets)
+
+        for i, seed in enumerate(seeds):
+            # sample parameters as EpiModel would do for this seed
+            # (EpiModel draws the seed of its noise generator before sampling the parameters)
+            rng = RandomState(seed=seed)
+            rng.randint(0, iinfo(int32).max)
+            params = Parameters(model_sets=model_sets)
+            params.fixedValues = model_sets.paramValuesBySeed.get(seed, dict())
+            params.sample_parameters(rng=rng, time=0)
+
+            self._add_sampled_params(i=i, params=params)
+
+            # store sampled values
+            params.list_time_dependent_params()
+            params.update_time_dependent_params(rng=rng, time=time_of_last_update)
+            for key, value in params.get_dic_of_parameter_samples().items():
+                if key in self.dictOfParamValues:
+                    self.dictOfParamValues[key].append(value)
+                else:
+                    self.dictOfParamValues[key] = [value]
+
+    def _add_sampled_params(self, i, params):
+        """ copies the values of a sampled Parameters object into the i-th row of the arrays
+        :param i: (int) row index
+        :param params: (Parameters) sampled parameters
+        """
 
+        # compartment sizes are truncated to integers as in Compartment.initialize
+        self.sizeS[i] = int(params.sizeS.value)
+        for j, par in enumerate(params.sizeIBySympAndRest):
+            self.sizeIBySympAndRest[i, j] = int(par.value)
 
+        self.transm[i] = params.transm.value
+        for p in range(len(RestProfile)):
+            self.fitnessFMins[i, p] = params.fitnessFMins[p].value
+            self.fitnessBs[i, p] = params.fitnessBs[p].value
+            self.fitnessTMids[i, p] = params.fitnessTMids[p].value
+            self.posCIPTest[i, p] = params.posCIPTest[p].value
+            self.posTETTest[i, p] = params.posTETTest[p].value
+
+        self.probRapidTestSwitchTime = params.probRapidTest.ts[0]
+        self.probRapidTest[i] = params.probRapidTest.vs[0]
+        self.probTxCIPIfSuspToCIPAndTET[i] = params.probTxCIPIfSuspToCIPAndTET.value
+        for a in range(len(AB)):
+            self.probResEmerge[i, a] = params.probResEmerge[a].value
+
+        self.probSym[i] = params.probSym.value
+        self.rateNaturalRecovery[i] = params.rateNaturalRecovery.value
+        self.rateScreened[i] = params.rateScreened.value
+        self.rateTreatment[i] = params.rateTreatment.value
+        self.rateRetreatment[i] = params.rateRetreatment.value
+        self.surveySize[i] = params.surveySize.value
+
+    def _add_draws(self, draws):
+        """ copies the values of draws of parameters into the arrays
+        :param draws: (ParameterDraws) draws of parameters (one per trajectory)
+        """
+
+        if draws.nDraws != self.nTrajs:
+            raise ValueError('The number of draws of parameters ({}) should be equal to the number of seeds ({}).'
+                             .format(draws.nDraws, self.nTrajs))
+
+        n_rest_profiles = len(RestProfile)
+
+        # compartment sizes are truncated to integers as in Compartment.initialize
+        self.sizeS = draws.get_values('Size of S').astype(np.int64)
+        self.sizeIBySympAndRest = draws.get_values(
+            'Size of I by Symp/Rest', n_items=len(SympStat) * n_rest_profiles).astype(np.int64)
+
+        self.transm = draws.get_values('Transmission parameter')
+        self.fitnessFMins = draws.get_values('Fitness-f_min', n_items=n_rest_profiles)
+        self.fitnessBs = draws.get_values('Fitness-b', n_items=n_rest_profiles)
+        self.fitnessTMids = draws.get_values('Fitness-t_mid', n_items=n_rest_profiles)
+        self.posCIPTest = draws.get_values('prob CIP test positive', n_items=n_rest_profiles)
+        self.posTETTest = draws.get_values('prob TET test positive', n_items=n_rest_profiles)
+
+        self.probRapidTestSwitchTime = draws.params.probRapidTest.ts[0]
+        self.probRapidTest = np.full(self.nTrajs, draws.params.probRapidTest.vs[0], dtype=float)
+        self.probTxCIPIfSuspToCIPAndTET = draws.get_values('Prob Tx-CIP if susceptible to CIP and TET')
+        self.probResEmerge = draws.get_values('Prob of resistance by antibiotics', n_items=len(AB))
+
+        self.probSym = draws.get_values('Prob symptomatic')
+        self.rateNaturalRecovery = draws.get_values('Rate of natural recovery')
+        self.rateScreened = draws.get_values('Rate of screening')
+        self.rateTreatment = draws.get_values('Rate of seeking treatment')
+        self.rateRetreatment = draws.get_values('Rate of seeking retreatment')
+        self.surveySize = draws.get_values('Survey size (over observation periods)')
+
+        self.dictOfParamValues = draws.get_dict_of_param_values()
+
+    def get_infectivity(self, time):
+        """
+        :param time: (float) epidemic time
+        :return: (np.array of shape (n, n_rest_profiles)) infectivity of each resistance profile at this time
+            (the vectorized version of TimeDependentSigmoid with t_min = 0 and max = 1)
+        """
+
+        if time < 0:
+            return np.zeros_like(self.fitnessFMins)
+
+        logistic = 1 / (1 + np.exp(-self.fitnessBs * (time - self.fitnessTMids)))
+        ratio_inf = self.fitnessFMins + (1 - self.fitnessFMins) * logistic
+        return self.transm[:, np.newaxis] * ratio_inf
+
+    def get_prob_rapid_test(self, time):
+        """
+        :param time: (float) epidemic time
+        :return: (np.array of shape (n, )) probability of receiving a rapid test at this time
+            (the vectorized version of TimeDependentStepWise)
+        """
+
+        if time < self.probRapidTestSwitchTime:
+            return np.zeros(self.nTrajs)
+        else:
+            return self.probRapidTest
+
+    def get_param_values(self, attr, time):
+        """
+        :param attr: (string) name of an attribute of Parameters
+        :param time: (float) epidemic time
+        :return: (np.array) values of this parameter at this time (one row per trajectory)
+        """
 
+        if attr == 'probRapidTest':
+            return self.get_prob_rapid_test(time=time)
+        return getattr(self, attr)
@@ -1,7 +1,10 @@
+import os
+
 from apacepy.inputs import ModelSettings
 from deampy.in_out_functions import read_csv_rows
 
-from definitions import get_survey_size, SIM_DURATION, END_OF_WARM_UP, END_OF_CALIB, get_scenario_name
+from definitions import get_survey_size, SIM_DURATION, END_OF_WARM_UP, END_OF_CALIB, get_scenario_name, \
+    get_run_root
 from model.data import Prevalence, GonorrheaRate, PercSymptomatic
 
 
@@ -10,7 +13,7 @@ class GonoSettings(ModelSettings):
 
     def __init__(self, if_calibrating=False, collect_traj_of_comparts=True,
                  if_m_available_for_1st_tx=False, sim_duration=None, calibration_seed=None,
-                 if_wider_priors=False, if_varying_transmission_factor=False):
+                 if_wider_priors=False, if_varying_transmission_factor=False, run_root=None):
         """
         :param if_calibrating: (bool) if calibrating the model
         :param collect_traj_of_comparts: (bool) if collect the trajectories of all compartments
@@ -20,6 +23,8 @@ class GonoSettings(ModelSettings):
         :param if_wider_priors: (bool) set to True for using wider prior distribution (for sensitivity analysis)
         :param if_varying_transmission_factor: (bool) set to True if transmission factor will be varied
             (for sensitivity analysis) this is mainly to make sure the results will be saved in the right folder
+        :param run_root: (string) root folder of the outputs of this run (if None, the root folder returned by
+            definitions.get_run_root)
         """
 
         ModelSettings.__init__(self)
@@ -37,10 +42,31 @@ class GonoSettings(ModelSettings):
         self.storeParameterValues = True
         self.ifCollectTrajsOfCompartments = collect_traj_of_comparts
         self.exportCalibrationTrajs = False  # if export calibration trajectories
+        # format of exported trajectories
+        # 'npz': all trajectories of a run in one columnar file (see trajectory_store)
+        # 'csv': one csv file per trajectory (as apacepy exports them)
+        self.trajectoryFormat = 'npz'
+
+        # simulation engine
+        # 'apacepy': to simulate each trajectory with an EpiModel (ActiveSetEpiModel) populated by build_model
+        # 'batch': to simulate all trajectories together with BatchEpidemics
+        # 'mean-field': to simulate the deterministic (mean-field) model with MeanFieldEpidemics
+        # 'hybrid': to simulate resistance profiles with many infected members deterministically and
+        #           the others stochastically with HybridEpidemics
+        # 'tau-leaping': to simulate each trajectory with a TauLeapingEpiModel (adaptive time-step)
+        #                populated by build_model
+        self.engine = 'apacepy'
+        # tolerance of the adaptive time-step of the 'tau-leaping' engine (0 for the fixed time-step)
+        self.tauLeapingTolerance = 0.1
+        # compartments with fewer members are not used to select the time-step of the 'tau-leaping' engine
+        self.tauLeapingCriticalSize = 1000
 
         # calibration settings
         self.calcLikelihood = if_calibrating
         self.calibSeed = calibration_seed
+        # values of parameters to use instead of values sampled from priors (dictionary keyed by parameter names)
+        # keyed by seed (e.g. for particles of SMC-ABC calibration whose parameter values are not prior draws)
+        self.paramValuesBySeed = dict()
 
         # projection period
         self.storeProjectedOutcomes = True
@@ -72,10 +98,13 @@ class GonoSettings(ModelSettings):
                                            calibration_seed=self.calibSeed,
                                            if_wider_priors=if_wider_priors)
 
-        self.folderToSaveTrajs = 'outputs/sim-{}/trajectories'.format(scenario_name)
-        self.folderToSaveSummary = 'outputs/sim-{}/summary'.format(scenario_name)
-        self.folderToSaveScenarioAnalysis = 'outputs/scen-{}/scenarios'.format(scenario_name)
-        self.folderToSaveCalibrationResults = 'outputs/calib-{}/calibration'.format(calib_scenario)
+        self.runRoot = get_run_root() if run_root is None else run_root
+        self.folderToSaveTrajs = os.path.join(self.runRoot, 'outputs/sim-{}/trajectories'.format(scenario_name))
+        self.folderToSaveSummary = os.path.join(self.runRoot, 'outputs/sim-{}/summary'.format(scenario_name))
+        self.folderToSaveScenarioAnalysis = os.path.join(
+            self.runRoot, 'outputs/scen-{}/scenarios'.format(scenario_name))
+        self.folderToSaveCalibrationResults = os.path.join(
+            self.runRoot, 'outputs/calib-{}/calibration'.format(calib_scenario))
 
         # probability of receiving CIP if someone is susceptible to both CIP and TET
         self.probTxCIPIfSuspToCIPAndTET = 0.5
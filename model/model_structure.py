@@ -1,4 +1,3 @@
-from apacepy.calibration_support import FeasibleConditions
 from apacepy.control import InterventionAffectingEvents, ConditionBasedDecisionRule, PredeterminedDecisionRule
 from apacepy.features_conditions import FeatureSurveillance, FeatureIntervention, \
     ConditionOnFeatures, ConditionOnConditions, ConditionAlwaysFalse
@@ -8,6 +7,7 @@ from deampy.parameters import Constant
 
 from definitions import RestProfile, AB, SympStat, REST_PROFILES, ANTIBIOTICS, TreatmentOutcome, \
     ConvertSympAndResitAndAntiBio, get_profile_after_resit_or_failure
+from model.feasible_conditions import RecordedFeasibleConditions
 from model.model_parameters import Parameters
 
 
@@ -521,22 +521,22 @@ def build_model(model):
     # ------------- calibration targets ---------------
     if sets.calcLikelihood:
         # prevalence
-        prevalence.add_feasible_conditions(feasible_conditions=FeasibleConditions(
+        prevalence.add_feasible_conditions(feasible_conditions=RecordedFeasibleConditions(
             feasible_min=0.025, feasible_max=0.065))
         prevalence.add_calibration_targets(ratios=sets.prevMean,
                                            survey_sizes=sets.prevN)
         # gonorrhea rate
-        gono_rate.add_feasible_conditions(feasible_conditions=FeasibleConditions(
+        gono_rate.add_feasible_conditions(feasible_conditions=RecordedFeasibleConditions(
             feasible_min=0.045, feasible_max=0.085))
         gono_rate.add_calibration_targets(ratios=sets.gonoRateMean,
                                           survey_sizes=sets.gonoRateN)
         # % cases symptomatic
-        perc_cases_sympt.add_feasible_conditions(feasible_conditions=FeasibleConditions(
+        perc_cases_sympt.add_feasible_conditions(feasible_conditions=RecordedFeasibleConditions(
             feasible_min=0.5, feasible_max=1))
         perc_cases_sympt.add_calibration_targets(ratios=sets.percSympMean,
                                                  survey_sizes=sets.percSympN)
         # % cases with resistance to CRO
-        perc_cases_CRO_NS.add_feasible_conditions(feasible_conditions=FeasibleConditions(
+        perc_cases_CRO_NS.add_feasible_conditions(feasible_conditions=RecordedFeasibleConditions(
             min_threshold_to_hit=0.05))
 
     # ------------- interventions ---------------
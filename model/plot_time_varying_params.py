@@ -2,8 +2,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 
 from deampy.parameters import Constant, TimeDependentSigmoid
-from deampy.plots.plot_support import output_figure
 from definitions import ROOT_DIR
+from model.atomic_io import atomic_output
 
 SIM_DURATION = 25
 T0 = 0
@@ -110,7 +110,9 @@ def plot_sigmoid_functions(b, f_min, f_max, t_mid, t_min,
 
     axarr[0].set_ylabel(y_label)
     plt.tight_layout()
-    output_figure(plt, filename=file_name)
+    # (saved as deampy's output_figure saves figures, which would drop the leading '/' of the absolute file name)
+    with atomic_output(file_name) as temp_file_name:
+        fig.savefig(temp_file_name, dpi=300, bbox_inches='tight')
     plt.show()
 
 
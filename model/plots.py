@@ -8,9 +8,12 @@ from definitions import RestProfile, SympStat, REST_PROFILES, ConvertSympAndResi
     EFFECT_OUTCOME, COST_OUTCOME, EFFECT_COST_LABELS, EFFECT_COST_LABELS_NO_LINE_BREAK, \
     TRANSMISSION_FACTOR_VALUES, TRANSMISSION_FACTOR_COLORS
 from model import data as D
+from model.atomic_io import atomic_output
 from model.scenario_and_sensitivity_analyses import get_rate_percentage_life, \
     get_sa_scenarios_with_specific_spec_coverage_ab, \
     get_sa_scenarios_varying_coverage
+from model.scenario_store import get_scenarios_df
+from model.trajectory_store import read_trajectories
 
 traj.SUBPLOT_W_SPACE = 0.25
 traj.TITLE_WEIGHT = 'normal'
@@ -33,7 +36,9 @@ def plot_trajectories(prev_multiplier=52, incd_multiplier=1,
     :param filename: (string) filename to save the trajectories as
     """
 
-    sim_outcomes = traj.SimOutcomeTrajectories(csv_directory=dir_of_traj_files)
+    # reads the trajectories.npz file of the directory if it exists (and csv files otherwise);
+    # only the outcomes of each figure are read (just before the figure is plotted)
+    sim_outcomes = read_trajectories(directory=dir_of_traj_files)
 
     # defaults
     traj.TIME_0 = 0  # 2014
@@ -71,14 +76,18 @@ def plot_trajectories(prev_multiplier=52, incd_multiplier=1,
             # increment i
             i += 1
 
-    sim_outcomes.plot_multi_panel(n_rows=4, n_cols=4,
-                                  list_plot_info=Is,
-                                  figure_size=(7, 7),
-                                  file_name=dir_of_traj_figs+'/(valid-Is) ' + filename)
-    sim_outcomes.plot_multi_panel(n_rows=4, n_cols=4,
-                                  list_plot_info=Fs,
-                                  figure_size=(7, 7),
-                                  file_name=dir_of_traj_figs+'/(valid-Fs) ' + filename)
+    sim_outcomes.load_outcomes(outcome_names=[info.outcomeName for info in Is])
+    with atomic_output(dir_of_traj_figs+'/(valid-Is) ' + filename) as temp_file_name:
+        sim_outcomes.plot_multi_panel(n_rows=4, n_cols=4,
+                                      list_plot_info=Is,
+                                      figure_size=(7, 7),
+                                      file_name=temp_file_name)
+    sim_outcomes.load_outcomes(outcome_names=[info.outcomeName for info in Fs])
+    with atomic_output(dir_of_traj_figs+'/(valid-Fs) ' + filename) as temp_file_name:
+        sim_outcomes.plot_multi_panel(n_rows=4, n_cols=4,
+                                      list_plot_info=Fs,
+                                      figure_size=(7, 7),
+                                      file_name=temp_file_name)
 
     # sim_outcomes.plot_multi_panel(n_rows=1, n_cols=2,
     #                               list_plot_info=[S, pop],
@@ -139,10 +148,12 @@ def plot_trajectories(prev_multiplier=52, incd_multiplier=1,
                      + perc_cases_by_rest_profile[0:3] + [perc_cases_by_rest_profile[4]] \
                      + [perc_cases_by_rest_profile[3]] + perc_cases_by_rest_profile[5:8]
 
-    sim_outcomes.plot_multi_panel(n_rows=3, n_cols=4,
-                                  list_plot_info=list_plot_info,
-                                  figure_size=(4*2.1, 3*2.1), show_subplot_labels=True,
-                                  file_name=calibration_filename)
+    sim_outcomes.load_outcomes(outcome_names=[info.outcomeName for info in list_plot_info])
+    with atomic_output(calibration_filename) as temp_file_name:
+        sim_outcomes.plot_multi_panel(n_rows=3, n_cols=4,
+                                      list_plot_info=list_plot_info,
+                                      figure_size=(4*2.1, 3*2.1), show_subplot_labels=True,
+                                      file_name=temp_file_name)
 
     # ------------- Successful treatment with different antibiotics ---------------
     Txs = []
@@ -156,10 +167,12 @@ def plot_trajectories(prev_multiplier=52, incd_multiplier=1,
     Txs.append(traj.TrajPlotInfo(outcome_name='To: Tx with M',
                                  title='Successful Tx-M',
                                  x_multiplier=incd_multiplier))
-    sim_outcomes.plot_multi_panel(n_rows=2, n_cols=3,
-                                  list_plot_info=Txs,
-                                  figure_size=(3*2.2, 2*2.2), show_subplot_labels=True,
-                                  file_name=dir_of_traj_figs+'/(valid-Tx) ' + filename)
+    sim_outcomes.load_outcomes(outcome_names=[info.outcomeName for info in Txs])
+    with atomic_output(dir_of_traj_figs+'/(valid-Tx) ' + filename) as temp_file_name:
+        sim_outcomes.plot_multi_panel(n_rows=2, n_cols=3,
+                                      list_plot_info=Txs,
+                                      figure_size=(3*2.2, 2*2.2), show_subplot_labels=True,
+                                      file_name=temp_file_name)
 
 
 def plot_sa_for_varying_coverage(csv_file_name, sim_duration, fig_file_name,
@@ -177,7 +190,7 @@ def plot_sa_for_varying_coverage(csv_file_name, sim_duration, fig_file_name,
     """
 
     # read scenarios into a dataframe
-    scenarios_df = scen.ScenarioDataFrame(csv_file_name=csv_file_name)
+    scenarios_df = get_scenarios_df(csv_file_name=csv_file_name)
 
     # plot CEA
     scen.ERROR_BAR_ALPHA = 0.75
@@ -194,21 +207,22 @@ def plot_sa_for_varying_coverage(csv_file_name, sim_duration, fig_file_name,
         list_of_scenario_sets = [get_sa_scenarios_varying_coverage(
             scenarios_df=scenarios_df, color=COLOR_VARYING_COVERAGE)]
 
-    vis.plot_sets_of_scenarios(
-        list_of_scenario_sets=list_of_scenario_sets,
-        name_of_base_scenario='Status quo (no rapid test)',
-        list_if_remove_base_scenario=[True, True, True], # in case there 3 sets of scenarios
-        effect_outcome=EFFECT_OUTCOME,
-        cost_outcome=COST_OUTCOME,
-        labels=EFFECT_COST_LABELS,
-        health_measure='u',
-        interval_type=interval,
-        x_range=x_range,
-        y_range=y_range,
-        cost_multiplier=100000,
-        effect_multiplier=sim_duration,
-        file_name=fig_file_name,
-        fig_size=SINGLE_FIG_SIZE)
+    with atomic_output(fig_file_name) as temp_file_name:
+        vis.plot_sets_of_scenarios(
+            list_of_scenario_sets=list_of_scenario_sets,
+            name_of_base_scenario='Status quo (no rapid test)',
+            list_if_remove_base_scenario=[True, True, True], # in case there 3 sets of scenarios
+            effect_outcome=EFFECT_OUTCOME,
+            cost_outcome=COST_OUTCOME,
+            labels=EFFECT_COST_LABELS,
+            health_measure='u',
+            interval_type=interval,
+            x_range=x_range,
+            y_range=y_range,
+            cost_multiplier=100000,
+            effect_multiplier=sim_duration,
+            file_name=temp_file_name,
+            fig_size=SINGLE_FIG_SIZE)
 
 
 def plot_sa_for_specific_ab_and_coverage(csv_file_name, fig_file_name, ab, test_coverage, include_sens_labels,
@@ -225,7 +239,7 @@ def plot_sa_for_specific_ab_and_coverage(csv_file_name, fig_file_name, ab, test_
     """
 
     # read scenarios into a dataframe
-    scenarios_df = scen.ScenarioDataFrame(csv_file_name=csv_file_name)
+    scenarios_df = get_scenarios_df(csv_file_name=csv_file_name)
 
     # get a specific outcome from a specific scenario
     if print_all_scenarios:
@@ -255,27 +269,28 @@ def plot_sa_for_specific_ab_and_coverage(csv_file_name, fig_file_name, ab, test_
                 include_sens_labels=include_sens_labels)
         )
 
-    vis.plot_sets_of_scenarios(
-        list_of_scenario_sets=list_of_scenario_sets,
-        name_of_base_scenario='Status quo (no rapid test)',
-        list_if_remove_base_scenario=[True] * len(spec_values),
-        effect_outcome=EFFECT_OUTCOME,
-        cost_outcome=COST_OUTCOME,
-        labels=EFFECT_COST_LABELS,
-        health_measure='u',
-        x_range=x_range,
-        y_range=y_range,
-        cost_multiplier=100000,
-        effect_multiplier=SIM_DURATION,
-        file_name=fig_file_name,
-        fig_size=SINGLE_FIG_SIZE)
+    with atomic_output(fig_file_name) as temp_file_name:
+        vis.plot_sets_of_scenarios(
+            list_of_scenario_sets=list_of_scenario_sets,
+            name_of_base_scenario='Status quo (no rapid test)',
+            list_if_remove_base_scenario=[True] * len(spec_values),
+            effect_outcome=EFFECT_OUTCOME,
+            cost_outcome=COST_OUTCOME,
+            labels=EFFECT_COST_LABELS,
+            health_measure='u',
+            x_range=x_range,
+            y_range=y_range,
+            cost_multiplier=100000,
+            effect_multiplier=SIM_DURATION,
+            file_name=temp_file_name,
+            fig_size=SINGLE_FIG_SIZE)
 
 
 def plot_sa_for_specific_ab(ab, include_sens_labels,  csv_file_name, fig_file_name,
                             x_range=None, y_range=None, l_b_r_t=None, fig_size=None):
 
     # read scenarios into a dataframe
-    scenarios_df = scen.ScenarioDataFrame(csv_file_name=csv_file_name)
+    scenarios_df = get_scenarios_df(csv_file_name=csv_file_name)
 
     if ab == 'CIP':
         spec_values = CIP_SPEC_VALUES
@@ -297,19 +312,20 @@ def plot_sa_for_specific_ab(ab, include_sens_labels,  csv_file_name, fig_file_na
             )
         list_list_series.append(list_of_scenario_sets)
 
-    vis.multi_plot_series(
-        list_list_series=list_list_series,
-        list_of_titles=list_of_titles,
-        name_of_base_scenario='Status quo (no rapid test)',
-        list_if_remove_base_scenario=[True] * len(spec_values),
-        effect_outcome=EFFECT_OUTCOME,
-        cost_outcome=COST_OUTCOME,
-        x_range=x_range,
-        y_range=y_range,
-        labels=EFFECT_COST_LABELS_NO_LINE_BREAK,
-        cost_multiplier=100000,
-        effect_multiplier=SIM_DURATION,
-        fig_size=fig_size,
-        l_b_r_t=l_b_r_t,
-        file_name=fig_file_name
-    )
+    with atomic_output(fig_file_name) as temp_file_name:
+        vis.multi_plot_series(
+            list_list_series=list_list_series,
+            list_of_titles=list_of_titles,
+            name_of_base_scenario='Status quo (no rapid test)',
+            list_if_remove_base_scenario=[True] * len(spec_values),
+            effect_outcome=EFFECT_OUTCOME,
+            cost_outcome=COST_OUTCOME,
+            x_range=x_range,
+            y_range=y_range,
+            labels=EFFECT_COST_LABELS_NO_LINE_BREAK,
+            cost_multiplier=100000,
+            effect_multiplier=SIM_DURATION,
+            fig_size=fig_size,
+            l_b_r_t=l_b_r_t,
+            file_name=temp_file_name
+        )
@@ -0,0 +1,162 @@
+import glob
+import hashlib
+import os
+import pickle
+from importlib.metadata import version
+
+from model.atomic_io import atomic_output
+
+"""
+Cache of the outputs of trajectories simulated for scenario analyses.
+The outputs (MultiEpidemicsOutputs) of each (scenario, seed) cell are stored in a separate file whose name is
+a hash of the model settings (after they are updated for the scenario), the scenario definition,
+the calibration summary file (posterior) that seeds and parameter values are taken from, the model code
+(the sources of the model package and the versions of apacepy and deampy), and the seed.
+A cell is therefore simulated again only if something it depends on changes.
+When the files of the cache take more than the disk budget, the least recently used files are deleted
+(so files of cells simulated with earlier versions of the model code are deleted first).
+The folder of the cache may be shared by runs, so a file may be deleted by another run at any time
+(a file that cannot be read is a cache miss).
+"""
+
+# attributes of model settings that do not affect simulated trajectories
+# (parameter values by seed are accounted for by the hash of the calibration summary file)
+_SETTINGS_NOT_HASHED = ('exportTrajectories', 'exportCalibrationTrajs', 'trajectoryFormat', 'paramValuesBySeed',
+                        'runRoot')
+
+
+def _get_digest_of_file(file_name):
+    """
+    :param file_name: (string) name of a file
+    :return: (string) sha256 hash of the content of the file
+    """
+
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024*1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _get_digest_of_model_code():
+    """
+    :return: (string) sha256 hash of the sources of the model package (this folder and its sub-folders)
+        and of the versions of the simulation packages (apacepy and deampy)
+    """
+
+    folder = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for file_name in sorted(glob.glob(os.path.join(folder, '**', '*.py'), recursive=True)):
+        digest.update(os.path.relpath(file_name, folder).encode())
+        digest.update(_get_digest_of_file(file_name).encode())
+    for package in ('apacepy', 'deampy'):
+        digest.update('{}-{}'.format(package, version(package)).encode())
+    return digest.hexdigest()
+
+
+class ScenarioResultCache:
+    """ outputs of simulated (scenario, seed) cells stored in files named by their keys """
+
+    def __init__(self, folder, calibration_summary_file=None, max_size=2*1024**3):
+        """
+        :param folder: (string) folder to store the cache in
+        :param calibration_summary_file: (string) calibration summary file that seeds (and parameter values
+            of seeds) are taken from (None if seeds are not from a calibration)
+        :param max_size: (int) disk budget of the cache (bytes)
+        """
+
+        self.folder = folder
+        self.maxSize = max_size
+        self.calibDigest = '' if calibration_summary_file is None \
+            else _get_digest_of_file(calibration_summary_file)
+        self.codeDigest = _get_digest_of_model_code()
+
+        # (last time used, size) of files in the cache keyed by file name
+        self.files = dict()
+        if os.path.isdir(folder):
+            for sub_folder in os.scandir(folder):
+                if sub_folder.is_dir():
+                    for entry in os.scandir(sub_folder.path):
+                        # temporary files left by interrupted runs (see atomic_io) are not part of the cache
+                        if entry.name.endswith('.pkl') and '.tmp-' not in entry.name:
+                            stat = entry.stat()
+                            self.files[entry.path] = stat.st_mtime, stat.st_size
+
+    def get_keys(self, model_settings, scenario_definition, seeds, sim_duration=None):
+        """
+        :param model_settings: (GonoSettings) model settings updated for the scenario
+        :param scenario_definition: (list) of values of scenario variables
+        :param seeds: (list) of seeds
+        :param sim_duration: (float) simulation duration (if None, that of model settings)
+        :return: (list) of keys of the (scenario, seed) cells
+        """
+
+        settings = dict()
+        for name, value in vars(model_settings).items():
+            if not (name in _SETTINGS_NOT_HASHED or name.startswith('folder') or name.startswith('nDeltaTs')):
+                settings[name] = value
+        if sim_duration is not None:
+            settings['simulationDuration'] = sim_duration
+
+        digest = hashlib.sha256(repr((sorted(settings.items()), list(scenario_definition),
+                                      self.calibDigest, self.codeDigest)).encode()).hexdigest()
+
+        return [hashlib.sha256('{}-{}'.format(digest, seed).encode()).hexdigest() for seed in seeds]
+
+    def get(self, key):
+        """
+        :param key: (string) key of a (scenario, seed) cell
+        :return: (MultiEpidemicsOutputs) outputs of the trajectory of this cell or None if it is not in the cache
+        """
+
+        file_name = self._get_file_name(key=key)
+        if file_name not in self.files:
+            return None
+
+        try:
+            with open(file_name, 'rb') as file:
+                outputs = pickle.load(file)
+            # mark the file as recently used
+            os.utime(file_name)
+            self.files[file_name] = os.stat(file_name).st_mtime, self.files[file_name][1]
+        except (FileNotFoundError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            # deleted by another run sharing the folder (see evict) or unreadable, so the cell is simulated again
+            self.files.pop(file_name, None)
+            return None
+        return outputs
+
+    def put(self, key, outputs):
+        """ stores the outputs of a (scenario, seed) cell
+        :param key: (string) key of the cell
+        :param outputs: (MultiEpidemicsOutputs) outputs of the trajectory of this cell
+        """
+
+        file_name = self._get_file_name(key=key)
+        # write to a temporary file first so that an interrupted run does not leave a partial file
+        with atomic_output(file_name) as temp_file_name:
+            with open(temp_file_name, 'wb') as file:
+                pickle.dump(outputs, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        stat = os.stat(file_name)
+        self.files[file_name] = stat.st_mtime, stat.st_size
+
+    def evict(self):
+        """ deletes the least recently used files until the cache is within its disk budget """
+
+        size = sum(s for t, s in self.files.values())
+        for file_name in sorted(self.files, key=lambda f: self.files[f][0]):
+            if size <= self.maxSize:
+                break
+            try:
+                os.remove(file_name)
+            except FileNotFoundError:
+                pass
+            size -= self.files.pop(file_name)[1]
+
+    def _get_file_name(self, key):
+        """
+        :param key: (string) key of a (scenario, seed) cell
+        :return: (string) name of the file storing the outputs of this cell
+        """
+
+        return os.path.join(self.folder, key[:2], key + '.pkl')
@@ -3,80 +3,86 @@ from deampy.in_out_functions import write_csv
 from deampy.sensitivity_analysis import SensitivityAnalysis
 
 from definitions import ROOT_DIR, get_scenario_name, ANTIBIOTICS, get_name_of_scenario_analysis, \
-    TRANSMISSION_FACTOR_VALUES, FIG_EXT
+    TRANSMISSION_FACTOR_VALUES, FIG_EXT, get_run_path
+from model.atomic_io import atomic_output
+from model.scenario_stats import ScenarioStats
+from model.scenario_store import get_scenarios_df
 
 SCENARIO_COLORS = ['purple', 'blue', 'red', 'green', 'orange', 'brown']
 
 
-def get_rate_percentage_life(scenarios_df, scenario_name, sim_duration):
+# outcomes reported in the performance summary of scenarios
+RATE_OUTCOME = 'Rate of gonorrhea cases (average incidence after epidemic warm-up)'
+SUCCESS_OUTCOME = 'Time-averaged proportion of cases treated successfully with CIP, TET, or CRO ' \
+                  '(average incidence after epidemic warm-up)'
+SUSCEPTIBLE_OUTCOMES = ['Time-averaged proportion of cases {}-S '
+                        '(average incidence after epidemic warm-up)'.format(ab) for ab in ANTIBIOTICS]
+
+
+def get_scenario_stats(scenarios_df, scenario_names=None):
+    """
+    :param scenarios_df: (scenario dataframe)
+    :param scenario_names: (list) of scenario names (if None, all scenarios)
+    :return: (ScenarioStats) of outcomes reported in the performance summary of scenarios
+    """
+    return ScenarioStats(scenarios_df=scenarios_df,
+                         outcome_names=[RATE_OUTCOME, SUCCESS_OUTCOME] + SUSCEPTIBLE_OUTCOMES,
+                         scenario_names=scenario_names)
+
+
+def get_rate_percentage_life(scenarios_df, scenario_name, sim_duration, scenario_stats=None):
     """
     :param scenarios_df: (scenario dataframe)
     :param scenario_name: (string) scenario name
     :param sim_duration: (float) simulation duration
+    :param scenario_stats: (ScenarioStats) of scenarios_df (see get_scenario_stats);
+        if None, it is calculated for this scenario
     :return: (annual rate of gonorrhea cases, % cases treated with CIP, TET, or CRO, lifespan of CIP, TET, or CRO)
         all calculated after the end of warm-up and formulated as estimated and prediction interval
     """
-    rate = scenarios_df.get_mean_interval(
-        scenario_name=scenario_name,
-        outcome_name='Rate of gonorrhea cases (average incidence after epidemic warm-up)',
-        interval_type='p', deci=0, multiplier=100000, form=',')
 
-    proportion = [scenarios_df.get_mean_interval(
-        scenario_name=scenario_name,
-        outcome_name='Time-averaged proportion of cases treated successfully with CIP, TET, or CRO '
-                     '(average incidence after epidemic warm-up)',
-        interval_type='p', deci=1, form='%')]
-
-    for ab in ANTIBIOTICS:
-        proportion.append(scenarios_df.get_mean_interval(
-            scenario_name=scenario_name,
-            outcome_name='Time-averaged proportion of cases {}-S '
-                         '(average incidence after epidemic warm-up)'.format(ab),
-            interval_type='p', deci=1, form='%'))
-
-    life = [scenarios_df.get_mean_interval(
-        scenario_name=scenario_name,
-        outcome_name='Time-averaged proportion of cases treated successfully with CIP, TET, or CRO '
-                     '(average incidence after epidemic warm-up)',
-        interval_type='p', deci=1, multiplier=sim_duration)]
+    if scenario_stats is None:
+        scenario_stats = get_scenario_stats(scenarios_df=scenarios_df, scenario_names=[scenario_name])
 
-    for ab in ANTIBIOTICS:
-        life.append(
-            scenarios_df.get_mean_interval(
-                scenario_name=scenario_name,
-                outcome_name='Time-averaged proportion of cases {}-S '
-                             '(average incidence after epidemic warm-up)'.format(ab),
-                interval_type='p', deci=1, multiplier=sim_duration)
-        )
+    rate = scenario_stats.get_formatted_mean_and_interval(
+        scenario_name=scenario_name, outcome_name=RATE_OUTCOME, deci=0, multiplier=100000, form=',')
+
+    proportion = [scenario_stats.get_formatted_mean_and_interval(
+        scenario_name=scenario_name, outcome_name=name, deci=1, form='%')
+        for name in [SUCCESS_OUTCOME] + SUSCEPTIBLE_OUTCOMES]
+
+    life = [scenario_stats.get_formatted_mean_and_interval(
+        scenario_name=scenario_name, outcome_name=name, deci=1, multiplier=sim_duration)
+        for name in [SUCCESS_OUTCOME] + SUSCEPTIBLE_OUTCOMES]
 
     return rate, proportion, life
 
 
-def get_perc_change_rate_life(scenarios_df, scenario_name_base, scenario_name_new):
-    perc_change_rate = scenarios_df.get_relative_diff_mean_interval(
-        scenario_name_base=scenario_name_base,
-        scenario_names=scenario_name_new,
-        outcome_name='Rate of gonorrhea cases (average incidence after epidemic warm-up)',
-        deci=1, form='%')
+def get_perc_change_rate_life(scenarios_df, scenario_name_base, scenario_name_new, scenario_stats=None):
+    """
+    :param scenarios_df: (scenario dataframe)
+    :param scenario_name_base: (string) name of the base scenario
+    :param scenario_name_new: (string) name of the new scenario
+    :param scenario_stats: (ScenarioStats) of scenarios_df (see get_scenario_stats);
+        if None, it is calculated for these two scenarios
+    :return: (% change in the rate of gonorrhea cases, % change in lifespan of CIP, TET, or CRO)
+    """
+
+    if scenario_stats is None:
+        scenario_stats = get_scenario_stats(scenarios_df=scenarios_df,
+                                            scenario_names=[scenario_name_base, scenario_name_new])
+
+    perc_change_rate = scenario_stats.get_formatted_relative_diff(
+        scenario_name_base=scenario_name_base, scenario_name=scenario_name_new,
+        outcome_name=RATE_OUTCOME, deci=1, form='%')
 
     perc_change_life = []
-    perc_change_life.append(scenarios_df.get_relative_diff_mean_interval(
-        scenario_name_base=scenario_name_base,
-        scenario_names=scenario_name_new,
-        outcome_name='Time-averaged proportion of cases treated successfully with CIP, TET, or CRO '
-                     '(average incidence after epidemic warm-up)',
-        deci=1, form='%'))
-
-    for ab in ANTIBIOTICS:
-        try:
-            perc_change_life.append(scenarios_df.get_relative_diff_mean_interval(
-                scenario_name_base=scenario_name_base,
-                scenario_names=scenario_name_new,
-                outcome_name='Time-averaged proportion of cases {}-S '
-                             '(average incidence after epidemic warm-up)'.format(ab),
-                deci=1, form='%')
-            )
-        except:
+    for name in [SUCCESS_OUTCOME] + SUSCEPTIBLE_OUTCOMES:
+        if name in scenario_stats.outcomeIndex:
+            perc_change_life.append(scenario_stats.get_formatted_relative_diff(
+                scenario_name_base=scenario_name_base, scenario_name=scenario_name_new,
+                outcome_name=name, deci=1, form='%'))
+        else:
             perc_change_life.append('')
 
     return perc_change_rate, perc_change_life
@@ -153,11 +159,13 @@ def export_performance_of_scenarios(if_m_available_for_1st_tx, coverage_values,
         if_wider_priors=if_wider_priors
     )
 
-    csv_file_scenarios = 'outputs/scen-{}/scenarios/simulated_scenarios.csv'.format(scenario_name)
-    csv_file_summary = 'outputs/scen-{}/scenarios/performance_summary.csv'.format(scenario_name)
+    csv_file_scenarios = get_run_path('outputs/scen-{}/scenarios/simulated_scenarios.csv'.format(scenario_name))
+    csv_file_summary = get_run_path('outputs/scen-{}/scenarios/performance_summary.csv'.format(scenario_name))
 
     # read scenarios into a dataframe
-    scenarios_df = scen.ScenarioDataFrame(csv_file_name=csv_file_scenarios)
+    scenarios_df = get_scenarios_df(csv_file_name=csv_file_scenarios)
+    # statistics of outcomes of all scenarios (calculated at once)
+    scenario_stats = get_scenario_stats(scenarios_df=scenarios_df)
 
     # rows
     rows = [
@@ -182,7 +190,8 @@ def export_performance_of_scenarios(if_m_available_for_1st_tx, coverage_values,
     # status quo
     scenario_name_base = 'Status quo (no rapid test)'
     rate, prob_success, eff_life = get_rate_percentage_life(
-        scenarios_df=scenarios_df, scenario_name=scenario_name_base, sim_duration=simulation_duration)
+        scenarios_df=scenarios_df, scenario_name=scenario_name_base, sim_duration=simulation_duration,
+        scenario_stats=scenario_stats)
     rows.append([scenario_name_base, rate] + prob_success + eff_life + ['', '', '', '', ''])
 
     # find the range of transmission factors
@@ -197,17 +206,20 @@ def export_performance_of_scenarios(if_m_available_for_1st_tx, coverage_values,
 
             # get rate, percentage treated with 1st-line drugs, and lifespan of 1st-line drugs
             rate, prob_success, eff_life = get_rate_percentage_life(
-                scenarios_df=scenarios_df, scenario_name=scenario_name, sim_duration=simulation_duration)
+                scenarios_df=scenarios_df, scenario_name=scenario_name, sim_duration=simulation_duration,
+                scenario_stats=scenario_stats)
 
             # get % change in rate, % change in lifespan
             perc_change_rate, perc_change_life = get_perc_change_rate_life(
-                scenarios_df=scenarios_df, scenario_name_base=scenario_name_base, scenario_name_new=scenario_name)
+                scenarios_df=scenarios_df, scenario_name_base=scenario_name_base, scenario_name_new=scenario_name,
+                scenario_stats=scenario_stats)
 
             # append row
             rows.append([scenario_name, rate] + prob_success + eff_life + [perc_change_rate] + perc_change_life)
 
     # export to csv
-    write_csv(rows=rows, file_name=csv_file_summary)
+    with atomic_output(csv_file_summary) as temp_file_name:
+        write_csv(rows=rows, file_name=temp_file_name)
 
 
 def get_scenarios_csv_filename_and_fig_filename(
@@ -240,7 +252,8 @@ def get_scenarios_csv_filename_and_fig_filename(
         else:
             fig_file_name = 'figures/SA/{}-{}-coverage.{}'.format(scenario_name, ab, FIG_EXT)
 
-    csv_file_name = 'outputs/scen-{}/scenarios/simulated_scenarios.csv'.format(scenario_name)
+    fig_file_name = get_run_path(fig_file_name)
+    csv_file_name = get_run_path('outputs/scen-{}/scenarios/simulated_scenarios.csv'.format(scenario_name))
 
     return csv_file_name, fig_file_name
 
@@ -0,0 +1,222 @@
+import os
+
+from deampy.in_out_functions import read_csv_rows, write_csv
+
+from model.atomic_io import atomic_output, file_lock
+from model.compact_outputs import unpack_results
+from model.forked_scenarios import _simulate_scenarios_with_template_of_process
+from model.template_epidemics import STREAMING_BATCH_SIZE
+from model.worker_pool import get_pool
+
+"""
+Simulates the scenarios of several configurations (ForkedScenarioSimulators with different model settings)
+together. The jobs of all configurations (the scenarios of a seed, see ForkedScenarioSimulator.get_jobs)
+are found up front and dispatched to the processes of the session's pool, the longest first,
+so processes are not left idle at the end of each configuration.
+The run time of a job is estimated from the run times of its scenarios recorded in previous runs
+(see RunTimeRecords); scenarios without a record are assumed to take a time proportional to
+their simulation duration.
+The file of run times is shared by runs (including runs with different root folders, see definitions.get_run_root),
+so each run adds the run times it records to those in the file when it saves them.
+"""
+
+
+def _add_to_records(records, key, mean, n):
+    """ updates the average run time of a record with the run times of n trajectories
+    :param records: (dictionary) of (average run time, number of trajectories) keyed by
+        (folder, scenario name, simulation duration)
+    :param key: (tuple) key of the record
+    :param mean: (float) average run time of the trajectories
+    :param n: (int) number of trajectories
+    """
+
+    mean_of_record, n_of_record = records.get(key, (0, 0))
+    records[key] = (mean_of_record * n_of_record + mean * n) / (n_of_record + n), n_of_record + n
+
+
+class RunTimeRecords:
+    """ average run times of simulating scenarios keyed by (folder to save the scenario analysis,
+    scenario name, simulation duration), stored in a csv file (that may be shared by runs) """
+
+    def __init__(self, file_name):
+        """
+        :param file_name: (string) csv file to store the run times in
+        """
+
+        self.fileName = file_name
+        # (average run time, number of trajectories) keyed by (folder, scenario name, simulation duration)
+        self.records = self._read()
+        # records of the run times added since the file was read (see save)
+        self.newRecords = dict()
+
+    def _read(self):
+        """
+        :return: (dictionary) of the records of the csv file (empty if there is no file)
+        """
+
+        records = dict()
+        if os.path.isfile(self.fileName):
+            for row in read_csv_rows(file_name=self.fileName, if_ignore_first_row=True, if_convert_float=True):
+                records[(row[0], row[1], float(row[2]))] = row[3], int(row[4])
+        return records
+
+    def get(self, folder, scenario_name, sim_duration):
+        """
+        :return: (float) average run time of a scenario (seconds) or None if it is not recorded
+        """
+
+        record = self.records.get((folder, scenario_name, float(sim_duration)))
+        return None if record is None else record[0]
+
+    def get_run_time_per_year(self):
+        """
+        :return: (float) average run time of simulating one year of a scenario (seconds) over all records
+            (1 if there is no record)
+        """
+
+        if len(self.records) == 0:
+            return 1
+        return sum(r[0] for r in self.records.values()) / sum(key[2] for key in self.records)
+
+    def add(self, folder, scenario_name, sim_duration, run_time):
+        """ updates the average run time of a scenario with the run time of a new trajectory """
+
+        key = (folder, scenario_name, float(sim_duration))
+        for records in (self.records, self.newRecords):
+            _add_to_records(records=records, key=key, mean=run_time, n=1)
+
+    def save(self):
+        """ adds the run times recorded since the file was read to the run times in the csv file
+        (which other runs may have updated in the meantime) """
+
+        with file_lock(self.fileName):
+            records = self._read()
+            for key, (mean, n) in self.newRecords.items():
+                _add_to_records(records=records, key=key, mean=mean, n=n)
+
+            rows = [['Folder', 'Scenario', 'Simulation duration', 'Average run time', 'Number of trajectories']]
+            for (folder, scenario_name, sim_duration), (mean, n) in records.items():
+                rows.append([folder, scenario_name, sim_duration, mean, n])
+            with atomic_output(self.fileName) as temp_file_name:
+                write_csv(rows=rows, file_name=temp_file_name)
+
+        self.records = records
+        self.newRecords = dict()
+
+
+
+class ScenarioScheduler:
+    """ simulates the jobs of several ForkedScenarioSimulators together (the longest job first) """
+
+    def __init__(self, run_times_file):
+        """
+        :param run_times_file: (string) csv file to record the run times of scenarios in
+        """
+
+        self.runTimes = RunTimeRecords(file_name=run_times_file)
+        self.simulators = []
+        self.jobs = []
+
+    def add(self, simulator, function_to_populate_model, num_of_sims=1,
+            seeds=None, weights=None, sample_seeds_by_weights=True, initial_seed=None,
+            extended_sim_durations=None, extended_scenario_names=None):
+        """ adds the jobs of a simulator (the arguments are the same as those of ForkedScenarioSimulator.get_jobs)
+        :param simulator: (ForkedScenarioSimulator) simulator of the scenarios of a configuration
+        """
+
+        self.simulators.append(simulator)
+        self.jobs.extend(simulator.get_jobs(
+            function_to_populate_model=function_to_populate_model, num_of_sims=num_of_sims,
+            seeds=seeds, weights=weights, sample_seeds_by_weights=sample_seeds_by_weights, initial_seed=initial_seed,
+            extended_sim_durations=extended_sim_durations, extended_scenario_names=extended_scenario_names))
+
+    def simulate(self, if_run_in_parallel=True, print_summary_stats=False, sig_digits=5, interval='p'):
+        """ simulates the jobs of all simulators and then calculates the results of each simulator
+        (the arguments are the same as those of ForkedScenarioSimulator.simulate) """
+
+        # the longest jobs first
+        jobs = sorted(self.jobs, key=self._get_estimated_run_time, reverse=True)
+
+        # if a simulator is in the streaming mode, jobs are simulated in batches
+        # (so the outputs of only one batch of jobs are held at once)
+        if any(simulator.ifStreaming for simulator in self.simulators):
+            batch_size = STREAMING_BATCH_SIZE
+        else:
+            batch_size = max(len(jobs), 1)
+
+        for j in range(0, len(jobs), batch_size):
+            batch = jobs[j:j + batch_size]
+            if not if_run_in_parallel:
+                results = [_simulate_scenarios_with_template_of_process(*job.args) for job in batch]
+            else:
+                # jobs are sent to processes one at a time (in this order) as processes become available
+                results = get_pool().starmap(
+                    _simulate_scenarios_with_template_of_process, [job.args for job in batch], chunksize=1)
+
+            # outputs are returned in the compact form (see compact_outputs)
+            list_of_outputs_of_jobs = unpack_results(results=[result[1] for result in results])
+            for job, result, list_of_outputs in zip(batch, results, list_of_outputs_of_jobs):
+                job.simulator.set_outputs_of_job(job=job, list_of_outputs=list_of_outputs)
+                self._record_run_times(job=job, list_of_outputs=list_of_outputs, snapshot_run_time=result[0])
+        self.runTimes.save()
+
+        for simulator in self.simulators:
+            simulator.calculate_results(print_summary_stats=print_summary_stats, sig_digits=sig_digits,
+                                        interval=interval)
+
+        self.simulators = []
+        self.jobs = []
+
+    def _get_folder(self, job):
+        """
+        :param job: (ScenarioJob) a job
+        :return: (string) folder to save the scenario analysis of the job's configuration
+            relative to the root folder of the run (so run times are shared by runs with different roots)
+        """
+
+        sets = job.simulator.modelSets
+        return os.path.relpath(sets.folderToSaveScenarioAnalysis, sets.runRoot or os.curdir)
+
+    def _get_durations(self, job, scenario_index):
+        """
+        :return: (list) of simulation durations a scenario of a job is simulated for
+        """
+
+        simulator = job.simulator
+        return [simulator.modelSets.simulationDuration] \
+            + (simulator.extendedSimDurations if simulator.ifExtend[scenario_index] else [])
+
+    def _get_estimated_run_time(self, job):
+        """
+        :param job: (ScenarioJob) a job
+        :return: (float) estimated run time of the job (without the run time of its snapshot, which every job
+            simulates until the end of the warm-up period, so it does not change the order of jobs)
+        """
+
+        run_time = 0
+        for i in job.scenarioIndices:
+            # the run time of the longest simulation duration includes the run time of the others
+            sim_duration = self._get_durations(job=job, scenario_index=i)[-1]
+            recorded = self.runTimes.get(folder=self._get_folder(job=job),
+                                         scenario_name=job.simulator.scenariosNames[i],
+                                         sim_duration=sim_duration)
+            if recorded is None:
+                recorded = self.runTimes.get_run_time_per_year() * sim_duration
+            run_time += recorded
+        return run_time
+
+    def _record_run_times(self, job, list_of_outputs, snapshot_run_time):
+        """ records the run times of the scenarios of a simulated job
+        :param job: (ScenarioJob) a simulated job
+        :param list_of_outputs: (list) of outputs of each scenario of the job
+            (list of MultiEpidemicsOutputs for each simulation duration)
+        :param snapshot_run_time: (float) run time of the snapshot the scenarios of the job are forked from
+        """
+
+        for i, outputs in zip(job.scenarioIndices, list_of_outputs):
+            for sim_duration, o in zip(self._get_durations(job=job, scenario_index=i), outputs):
+                # the run time of a fork includes that of the snapshot, which is simulated once for
+                # the scenarios of the job
+                self.runTimes.add(folder=self._get_folder(job=job),
+                                  scenario_name=job.simulator.scenariosNames[i],
+                                  sim_duration=sim_duration, run_time=o.runTimes[0] - snapshot_run_time)
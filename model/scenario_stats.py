@@ -0,0 +1,94 @@
+import numpy as np
+from deampy.format_functions import format_estimate_interval
+
+"""
+Summary statistics of outcomes of simulated scenarios calculated for all scenarios and outcomes at once.
+Realizations of the selected outcomes are stacked into one matrix (scenarios x outcomes x realizations)
+and means, percentile intervals and paired relative differences (with respect to a base scenario) are
+calculated along the last axis. The formatted estimates are the same as those of
+ScenarioDataFrame.get_mean_interval(interval_type='p') and ScenarioDataFrame.get_relative_diff_mean_interval,
+including for realizations they cannot use:
+    - the mean and percentile interval of an outcome with a realization that is not a number are not a number
+      (as those of deampy's SummaryStat), and
+    - the relative differences of an outcome with a realization of 0 in the base scenario are not computable
+      for all scenarios (as those of deampy's RelativeDifferencePaired), so their mean and percentile interval
+      are not a number.
+"""
+
+
+class ScenarioStats:
+    """ means, percentile intervals and paired relative differences of outcomes of scenarios """
+
+    def __init__(self, scenarios_df, outcome_names, scenario_names=None, alpha=0.05):
+        """
+        :param scenarios_df: (ScenarioDataFrame) of simulated scenarios
+        :param outcome_names: (list) of names of outcomes
+            (outcomes that are not in the scenarios dataframe are skipped)
+        :param scenario_names: (list) of names of scenarios (if None, all scenarios of the dataframe)
+        :param alpha: (float) significance level of percentile intervals
+        """
+
+        if scenario_names is None:
+            scenario_names = list(scenarios_df.scenarios)
+        scenarios = [scenarios_df.scenarios[name] for name in scenario_names]
+        outcome_names = [name for name in outcome_names if name in scenarios[0].outcomes]
+
+        self.alpha = alpha
+        self.scenarioIndex = {name: i for i, name in enumerate(scenario_names)}
+        self.outcomeIndex = {name: j for j, name in enumerate(outcome_names)}
+
+        # realizations of outcomes (scenarios x outcomes x realizations);
+        # all scenarios are simulated with the same seeds so they have the same number of realizations
+        self.data = np.array([[np.asarray(s.outcomes[name], dtype=float) for name in outcome_names]
+                              for s in scenarios])
+
+        self.means, self.intervals = self._get_means_and_intervals(data=self.data)
+
+        # (means, intervals) of relative differences keyed by the name of the base scenario
+        self._relativeDiffs = dict()
+
+    def _get_means_and_intervals(self, data):
+        """
+        :param data: (np.array) of realizations (scenarios x outcomes x realizations)
+        :return: (tuple) of means (scenarios x outcomes) and percentile intervals (2 x scenarios x outcomes)
+        """
+
+        # (realizations that are not a number are not skipped, see above)
+        return data.mean(axis=2), np.percentile(data, [100 * self.alpha / 2, 100 * (1 - self.alpha / 2)], axis=2)
+
+    def get_formatted_mean_and_interval(self, scenario_name, outcome_name, multiplier=1,
+                                        deci=None, sig_digits=None, form=None):
+        """
+        :return: (string) mean and percentile interval of an outcome of a scenario
+        """
+
+        i, j = self.scenarioIndex[scenario_name], self.outcomeIndex[outcome_name]
+        return format_estimate_interval(
+            estimate=float(self.means[i, j]) * multiplier,
+            interval=[float(v) * multiplier for v in self.intervals[:, i, j]],
+            deci=deci, sig_digits=sig_digits, format=form)
+
+    def get_formatted_relative_diff(self, scenario_name_base, scenario_name, outcome_name,
+                                    deci=None, sig_digits=None, form=None):
+        """
+        :return: (string) mean and percentile interval of (X-X_base)/X_base, where X is an outcome of a scenario
+            and X_base is the same outcome of the base scenario under the same seed
+        """
+
+        if scenario_name_base not in self._relativeDiffs:
+            base = self.data[self.scenarioIndex[scenario_name_base]]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                diffs = self.data / base - 1
+            means, intervals = self._get_means_and_intervals(data=diffs)
+            # relative differences of an outcome are not computable if any of its realizations
+            # in the base scenario is 0 (see above)
+            if_computable = ~np.any(base == 0, axis=1)
+            means[:, ~if_computable] = np.nan
+            intervals[:, :, ~if_computable] = np.nan
+            self._relativeDiffs[scenario_name_base] = means, intervals
+
+        means, intervals = self._relativeDiffs[scenario_name_base]
+        i, j = self.scenarioIndex[scenario_name], self.outcomeIndex[outcome_name]
+        return format_estimate_interval(
+            estimate=float(means[i, j]), interval=[float(v) for v in intervals[:, i, j]],
+            deci=deci, sig_digits=sig_digits, format=form)
@@ -0,0 +1,77 @@
+import os
+import pickle
+
+import apacepy.analysis.scenarios as scen
+
+from model.atomic_io import atomic_output
+from model.streaming_stats import SUMMARY_COLUMNS
+
+"""
+Reads the csv files of simulated scenarios (simulated_scenarios.csv) into ScenarioDataFrames only once.
+A ScenarioDataFrame read from a csv file is
+    - kept in memory (for the life of the process) and shared by all functions that export or plot
+      the results of scenarios, and
+    - stored in a binary file next to the csv file (simulated_scenarios.pkl) so that it is not parsed again
+      in later sessions.
+Both are keyed by the modification time and size of the csv file, so a ScenarioDataFrame is read again
+from the csv file when the file changes (e.g. when scenarios are simulated again).
+ScenarioDataFrames returned by get_scenarios_df are shared and should not be modified.
+The results of scenarios simulated in the streaming mode (the summary statistics of outcomes,
+see ForkedScenarioSimulator) cannot be read into ScenarioDataFrames.
+"""
+
+# (modification time, size, ScenarioDataFrame) of csv files keyed by their absolute path
+_scenarios_dfs = dict()
+
+
+def _get_sidecar_file_name(csv_file_name):
+    """
+    :param csv_file_name: (string) csv file of simulated scenarios
+    :return: (string) name of the binary file storing the ScenarioDataFrame of this csv file
+    """
+
+    return os.path.splitext(csv_file_name)[0] + '.pkl'
+
+
+def get_scenarios_df(csv_file_name):
+    """
+    :param csv_file_name: (string) csv file where scenarios and realizations of outcomes are located
+    :return: (ScenarioDataFrame) of scenarios in this csv file
+    """
+
+    path = os.path.abspath(csv_file_name)
+    stat = os.stat(path)
+    version = stat.st_mtime_ns, stat.st_size
+
+    # read in this process
+    if path in _scenarios_dfs and _scenarios_dfs[path][0] == version:
+        return _scenarios_dfs[path][1]
+
+    # read in a previous session
+    scenarios_df = None
+    sidecar_file_name = _get_sidecar_file_name(csv_file_name=path)
+    if os.path.isfile(sidecar_file_name):
+        try:
+            with open(sidecar_file_name, 'rb') as file:
+                sidecar_version, scenarios_df = pickle.load(file)
+            if sidecar_version != version:
+                scenarios_df = None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            # an unreadable binary file is replaced below
+            scenarios_df = None
+
+    if scenarios_df is None:
+        with open(path) as file:
+            header = file.readline().rstrip('\n').split(',')
+        if set(SUMMARY_COLUMNS).issubset(header):
+            raise ValueError('{} has the summary statistics of outcomes of scenarios simulated in the streaming mode '
+                             '(and not the outcomes of each trajectory).'.format(csv_file_name))
+        scenarios_df = scen.ScenarioDataFrame(csv_file_name=path)
+
+        # write to a temporary file first so that an interrupted run does not leave a partial file
+        with atomic_output(sidecar_file_name) as temp_file_name:
+            with open(temp_file_name, 'wb') as file:
+                pickle.dump((version, scenarios_df), file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    _scenarios_dfs[path] = version, scenarios_df
+    return scenarios_df
@@ -0,0 +1,81 @@
+import heapq
+
+from deampy.discrete_event_sim import SimulationCalendar
+
+"""
+Simulation calendar with the interface of deampy's SimulationCalendar (which EpiModel uses) that keeps its own heap
+of events, so that models can find the time of the next scheduled event, find and delay scheduled events,
+and stop a simulation at a time (EpiModel.simulate processes events while the calendar has events, so
+a calendar with a stop time reports no events once the next event is at or after the stop time).
+"""
+
+
+class SimCalendar(SimulationCalendar):
+    """ simulation calendar that can find, delay, and stop at scheduled events """
+
+    def __init__(self):
+
+        SimulationCalendar.__init__(self)
+        self._events = []  # heap of [time, priority, order of scheduling, event]
+        self._nScheduled = 0  # number of events scheduled (to order events with the same time and priority)
+        self.stopTime = None  # events scheduled at or after this time are not reported (None for no stop time)
+
+    def n_events(self):
+        """
+        :return: number of scheduled events (0 if the next event is at or after the stop time)
+        """
+
+        if self.stopTime is not None and len(self._events) > 0 and self._events[0][0] >= self.stopTime:
+            return 0
+        return len(self._events)
+
+    def add_event(self, event):
+
+        if event.time < self.time:
+            raise ValueError('An event with event time less than the current time cannot be added to the calendar.')
+
+        heapq.heappush(self._events, [event.time, event.priority, self._nScheduled, event])
+        self._nScheduled += 1
+
+    def get_next_event(self):
+
+        self.time, priority, order, next_event = heapq.heappop(self._events)
+        return next_event
+
+    def clear_calendar(self):
+
+        self._events.clear()
+
+    def reset(self):
+        """ deletes all scheduled events and resets the current time to zero (the stop time is kept) """
+
+        SimulationCalendar.reset(self)
+        self._events.clear()
+
+    def get_time_of_next_event(self):
+        """
+        :return: (int) time of the earliest scheduled event (None if no event is scheduled)
+        """
+
+        return self._events[0][0] if len(self._events) > 0 else None
+
+    def if_scheduled(self, time, event_type):
+        """
+        :param time: (int) time of the event
+        :param event_type: class of the event
+        :return: (bool) if an event of this type is scheduled at this time
+        """
+
+        return any(entry[0] == time and isinstance(entry[3], event_type) for entry in self._events)
+
+    def delay_events(self, event_type, delay):
+        """ delays the scheduled events of a type
+        :param event_type: class of the events
+        :param delay: (int) time to add to the time of these events
+        """
+
+        for entry in self._events:
+            if isinstance(entry[3], event_type):
+                entry[3].time += delay
+                entry[0] = entry[3].time
+        heapq.heapify(self._events)
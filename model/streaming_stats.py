@@ -0,0 +1,246 @@
+import math
+
+import numpy as np
+from deampy.statistics import DiscreteTimeStat
+from scipy.stats import chi2
+
+"""
+Summary statistics of the outputs of trajectories that are updated as each trajectory is simulated,
+so the outputs of a trajectory can be dropped once they are recorded (the streaming mode of
+TemplateMultiEpidemics and ForkedScenarioSimulator). The memory used does not grow with the number
+of trajectories:
+    - means and variances are updated by Welford's algorithm,
+    - percentiles are calculated from the observations themselves until EXACT_BUFFER_SIZE observations
+      are recorded (so they are the same as those of deampy's SummaryStat for runs with fewer trajectories);
+      the observations are then replaced by P-square estimators (Jain and Chlamtac, 1985) of the bounds of
+      the percentile interval of the significance level the statistics are created with, which are updated
+      with each new observation (so only these percentiles are available, whatever the number of observations).
+The summary statistics are exported as one row per outcome (SUMMARY_COLUMNS), which is not the format
+of the outputs of trajectories that ScenarioDataFrame reads.
+"""
+
+EXACT_BUFFER_SIZE = 1000  # number of observations stored to calculate percentiles exactly
+# columns of the summary statistics of outcomes (see StreamingOutputs.get_dict_of_summary)
+SUMMARY_COLUMNS = ('Outcome', 'N', 'Mean', 'St Dev', 'CI lower', 'CI upper', 'PI lower', 'PI upper', 'Min', 'Max')
+
+
+class _P2Quantile:
+    """ P-square estimator of a quantile (5 markers whose heights approximate the minimum, the quantile,
+    the quantile's midpoints to the minimum and maximum, and the maximum) """
+
+    def __init__(self, p, sorted_obss):
+        """
+        :param p: (float) quantile to estimate (between 0 and 1)
+        :param sorted_obss: (np.array) of at least 5 observations (sorted) to initialize the markers with
+        """
+
+        n = len(sorted_obss)
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+        # desired positions of markers (1-based)
+        self.desired = [1 + (n - 1) * dp for dp in self.increments]
+        # positions of markers (1-based and strictly increasing)
+        self.positions = [1]
+        for d in self.desired[1:-1]:
+            self.positions.append(min(max(int(round(d)), self.positions[-1] + 1), n - (4 - len(self.positions))))
+        self.positions.append(n)
+        # heights of markers
+        self.heights = [float(sorted_obss[k - 1]) for k in self.positions]
+
+    def record(self, obs):
+        """ updates the markers with a new observation """
+
+        q = self.heights
+        n = self.positions
+
+        # cell of the new observation
+        if obs < q[0]:
+            q[0] = obs
+            k = 0
+        elif obs >= q[4]:
+            q[4] = obs
+            k = 3
+        else:
+            k = 0
+            while obs >= q[k + 1]:
+                k += 1
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # adjust the heights of the middle markers
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                # piecewise-parabolic prediction
+                height = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                        (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                        + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < height < q[i + 1]:
+                    # linear prediction
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def get_value(self):
+        """
+        :return: (float) estimate of the quantile
+        """
+
+        return float(self.heights[2])
+
+
+class StreamingStat(DiscreteTimeStat):
+    """ summary statistics of observations recorded one at a time (with percentiles and percentile intervals,
+    which DiscreteTimeStat does not provide) """
+
+    def __init__(self, name=None, buffer_size=EXACT_BUFFER_SIZE, alpha=0.05):
+        """
+        :param name: (string) name of the statistics
+        :param buffer_size: (int) number of observations stored to calculate percentiles exactly
+        :param alpha: (float) significance level of the percentile interval
+            (whose bounds are the only percentiles available, see get_percentile)
+        """
+
+        DiscreteTimeStat.__init__(self, name=name)
+        self.bufferSize = max(buffer_size, 5)
+        self.alpha = alpha
+        self.percentiles = (100 * alpha / 2, 100 * (1 - alpha / 2))
+        self._m2 = 0  # sum of squared deviations from the mean
+        self._buffer = []  # observations (None after they are replaced by the estimators of percentiles)
+        self._estimators = dict()  # P-square estimators keyed by percentile
+
+    def record(self, obs):
+        """ updates the statistics with a new observation (None is not recorded) """
+
+        if obs is None:
+            return
+
+        DiscreteTimeStat.record(self, obs=obs)
+        delta = obs - self._mean
+        self._mean += delta / self._n
+        self._m2 += delta * (obs - self._mean)
+
+        if self._buffer is not None:
+            self._buffer.append(obs)
+            if len(self._buffer) > self.bufferSize:
+                sorted_obss = np.sort(self._buffer)
+                self._estimators = {q: _P2Quantile(p=q / 100, sorted_obss=sorted_obss) for q in self.percentiles}
+                self._buffer = None
+        else:
+            for estimator in self._estimators.values():
+                estimator.record(obs=obs)
+
+    def get_n(self):
+        return self._n
+
+    def get_mean(self):
+        return self._mean if self._n > 0 else math.nan
+
+    def get_stdev(self):
+        # unbiased estimator of the standard deviation (as in SummaryStat)
+        return math.sqrt(self._m2 / (self._n - 1)) if self._n > 1 else math.nan
+
+    def get_stdev_CI(self, alpha=0.05):
+
+        df = self._n - 1
+        s2 = self.get_var()
+        return [math.sqrt(df * s2 / chi2.ppf(1 - alpha / 2, df)), math.sqrt(df * s2 / chi2.ppf(alpha / 2, df))]
+
+    def get_percentile(self, q):
+        """
+        :param q: percentile to compute (one of the bounds of the percentile interval, see self.percentiles)
+        :returns: qth percentile (exact if no more than buffer_size observations are recorded
+            and estimated otherwise) """
+
+        # other percentiles are refused even while they could be calculated exactly,
+        # so the percentiles available do not depend on the number of observations
+        percentiles = [percentile for percentile in self.percentiles if math.isclose(percentile, q)]
+        if len(percentiles) == 0:
+            raise ValueError('Percentile {} is not estimated by {} (estimated percentiles: {}; '
+                             'create the statistics with the significance level of the percentile interval '
+                             'needed).'.format(q, self.name, self.percentiles))
+
+        if self._n == 0:
+            return math.nan
+        if self._buffer is not None:
+            return float(np.percentile(self._buffer, q))
+        return self._estimators[percentiles[0]].get_value()
+
+    def get_PI(self, alpha=0.05):
+        """
+        :param alpha: significance level (between 0 and 1; the one the statistics are created with)
+        :return: percentile interval in the format of list [l, u]
+        """
+        return [self.get_percentile(100 * alpha / 2), self.get_percentile(100 * (1 - alpha / 2))]
+
+
+class StreamingOutputs:
+    """ summary statistics of the outputs of trajectories (updated as the outputs of each trajectory are added);
+    has the statistics attributes of MultiEpidemicsOutputs, so MultiEpidemics.print_summary_stats can print them """
+
+    def __init__(self, alpha=0.05):
+        """
+        :param alpha: (float) significance level of the confidence and percentile intervals of outcomes
+        """
+
+        self.alpha = alpha
+        self.nTrajs = 0  # number of trajectories
+        self.nFeasible = 0  # number of feasible trajectories
+        self.statRunTimes = StreamingStat(name='Run time', alpha=alpha)
+        self.statCost = None
+        self.statEffect = None
+        self.dictOfStatsForProjectedOutcomes = dict()
+
+    def add(self, outputs):
+        """ updates the statistics with the outputs of trajectories
+        :param outputs: (MultiEpidemicsOutputs) outputs of trajectories
+        """
+
+        self.nTrajs += len(outputs.ids)
+        self.nFeasible += sum(outputs.ifFeasible)
+        for run_time in outputs.runTimes:
+            self.statRunTimes.record(obs=run_time)
+
+        if len(outputs.discountedCosts) > 0:
+            if self.statCost is None:
+                self.statCost = StreamingStat(name='Discounted cost', alpha=self.alpha)
+                self.statEffect = StreamingStat(name='Discounted effect', alpha=self.alpha)
+            for cost, health in zip(outputs.discountedCosts, outputs.discountedHealths):
+                self.statCost.record(obs=cost)
+                self.statEffect.record(obs=health)
+
+        for key, values in outputs.dictOfProjectedOutcomes.items():
+            stat = self.dictOfStatsForProjectedOutcomes.setdefault(key, StreamingStat(name=key, alpha=self.alpha))
+            for value in values:
+                stat.record(obs=value)
+
+    def calculate_summary_stats(self):
+        """ (statistics are updated as outputs are added) """
+        pass
+
+    def get_dict_of_summary(self):
+        """
+        :return: (dictionary) of columns of the summary statistics (one row per outcome, see SUMMARY_COLUMNS)
+            with the mean, standard deviation, confidence interval, percentile interval, minimum, and maximum
+            of each outcome (intervals are of the significance level of these statistics)
+        """
+
+        stats = [self.statRunTimes]
+        if self.statCost is not None:
+            stats.extend([self.statCost, self.statEffect])
+        stats.extend(self.dictOfStatsForProjectedOutcomes.values())
+
+        dict_of_summary = {key: [] for key in SUMMARY_COLUMNS}
+        for stat in stats:
+            ci = stat.get_t_CI(alpha=self.alpha)
+            pi = stat.get_PI(alpha=self.alpha)
+            for key, value in (('Outcome', stat.name), ('N', stat.get_n()), ('Mean', stat.get_mean()),
+                               ('St Dev', stat.get_stdev()), ('CI lower', ci[0]), ('CI upper', ci[1]),
+                               ('PI lower', pi[0]), ('PI upper', pi[1]),
+                               ('Min', stat.get_min()), ('Max', stat.get_max())):
+                dict_of_summary[key].append(value)
+
+        return dict_of_summary
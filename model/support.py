@@ -1,11 +1,17 @@
 import apacepy.calibration as calib
 import deampy.parameter_estimation as P
-from apacepy.multi_epidemics import MultiEpidemics
 
-from definitions import ROOT_DIR, get_scenario_name
+from definitions import ROOT_DIR, get_scenario_name, get_run_path
+from model.atomic_io import atomic_output
+from model.batch_simulator import BatchEpidemics
+from model.calibration import read_param_values_by_seed
+from model.hybrid_simulator import HybridEpidemics
+from model.mean_field_simulator import MeanFieldEpidemics
+from model.model_parameters import Parameters
 from model.model_settings import GonoSettings
 from model.model_structure import build_model
 from model.plots import plot_trajectories
+from model.template_epidemics import TemplateMultiEpidemics
 
 
 def simulate_multi_trajectories(n, sim_duration=None, calibration_seed=None,
@@ -28,15 +34,29 @@ def simulate_multi_trajectories(n, sim_duration=None, calibration_seed=None,
     # get model settings
     sets = GonoSettings() if settings is None else settings
 
-    # build multiple epidemics
-    multi_model = MultiEpidemics(model_settings=sets)
-
-    multi_model.simulate(function_to_populate_model=build_model,
-                         n=n,
-                         seeds=seeds,
-                         weights=weights,
-                         sample_seeds_by_weights=sample_seeds_by_weights,
-                         if_run_in_parallel=if_run_in_parallel)
+    if sets.engine in ('batch', 'mean-field', 'hybrid'):
+        # simulate all trajectories together
+        if sets.engine == 'batch':
+            multi_model = BatchEpidemics(model_settings=sets)
+        elif sets.engine == 'hybrid':
+            multi_model = HybridEpidemics(model_settings=sets)
+        else:
+            multi_model = MeanFieldEpidemics(model_settings=sets)
+
+        multi_model.simulate(n=n,
+                             seeds=seeds,
+                             weights=weights,
+                             sample_seeds_by_weights=sample_seeds_by_weights)
+    else:
+        # build multiple epidemics (the model is populated once and re-simulated for each trajectory)
+        multi_model = TemplateMultiEpidemics(model_settings=sets)
+
+        multi_model.simulate(function_to_populate_model=build_model,
+                             n=n,
+                             seeds=seeds,
+                             weights=weights,
+                             sample_seeds_by_weights=sample_seeds_by_weights,
+                             if_run_in_parallel=if_run_in_parallel)
 
     # save ids, seeds, runtime,
     multi_model.save_summary()
@@ -50,8 +70,8 @@ def simulate_multi_trajectories(n, sim_duration=None, calibration_seed=None,
                                       calibration_seed=calibration_seed,
                                       if_wider_priors=sets.ifWiderPrior)
 
-    dir_of_traj_files = 'outputs/sim-{}/trajectories'.format(scenario_name)
-    dir_of_traj_figs = 'figures/sim-{}/trajs'.format(scenario_name)
+    dir_of_traj_files = get_run_path('outputs/sim-{}/trajectories'.format(scenario_name))
+    dir_of_traj_figs = get_run_path('figures/sim-{}/trajs'.format(scenario_name))
 
     # plot trajectories
     plot_trajectories(prev_multiplier=1,  # to show weeks on the x-axis of prevalence data
@@ -80,7 +100,14 @@ def simulate_calibrated_model(n_of_sims, sim_duration, calibration_seed=None,
 
     # ------- simulate the calibrated model ----------
     # get the seeds and probability weights
-    seeds, ln, weights = calib.get_seeds_lnl_probs(settings.folderToSaveCalibrationResults+'/calibration_summary.csv')
+    calibration_summary_file = settings.folderToSaveCalibrationResults+'/calibration_summary.csv'
+    seeds, ln, weights = calib.get_seeds_lnl_probs(calibration_summary_file)
+
+    # calibrated values of parameters with prior distributions (these differ from values sampled for the seeds
+    # if the model was calibrated by CalibrationWithSMC or with prior draws sampled together by ParameterDraws)
+    settings.paramValuesBySeed = read_param_values_by_seed(
+        calibration_summary_file=calibration_summary_file,
+        param_names=list(Parameters(model_sets=settings).get_names_of_priors()))
 
     # simulate the calibrated model
     simulate_multi_trajectories(n=n_of_sims,
@@ -94,6 +121,30 @@ def simulate_calibrated_model(n_of_sims, sim_duration, calibration_seed=None,
                                 settings=settings)
 
 
+def sweep_rapid_test_coverage(coverage_values, seeds, settings=None):
+    """
+    projects outcomes of the mean-field model for a range of rapid test coverage values
+    :param coverage_values: (list) of probabilities of receiving a rapid test
+    :param seeds: (list) of seeds (one for each parameter sample)
+    :param settings: (GonoSettings) model settings
+    :return: (dictionary) of projected outcomes (dictionary of lists keyed by outcome name) keyed by coverage value
+    """
+
+    sets = GonoSettings() if settings is None else settings
+    prob_rapid_test = sets.probRapidTest
+
+    results = dict()
+    for coverage in coverage_values:
+        sets.probRapidTest = coverage
+        multi_model = MeanFieldEpidemics(model_settings=sets)
+        multi_model.simulate(n=len(seeds), seeds=seeds, sample_seeds_by_weights=False, if_export_trajs=False)
+        results[coverage] = multi_model.dictOfProjectedOutcomes
+
+    sets.probRapidTest = prob_rapid_test
+
+    return results
+
+
 def estimate_parameters(n_of_resamples,
                         calibration_summary_file,
                         calibration_folder,
@@ -108,13 +159,14 @@ def estimate_parameters(n_of_resamples,
     # ---------- parameter estimation -----------
     # calculate posterior distributions and plot figures
     estimator = P.ParameterAnalyzer()
-    estimator.resample_param_values(
-        csvfile_param_values_and_weights=calibration_summary_file,
-        n=n_of_resamples,
-        weight_col=3,
-        sample_by_weight=False,
-        csvfile_resampled_params=calibration_folder+'/resampled_parameter_values.csv',
-        seed=0)
+    with atomic_output(calibration_folder+'/resampled_parameter_values.csv') as temp_file_name:
+        estimator.resample_param_values(
+            csvfile_param_values_and_weights=calibration_summary_file,
+            n=n_of_resamples,
+            weight_col=3,
+            sample_by_weight=False,
+            csvfile_resampled_params=temp_file_name,
+            seed=0)
 
     param_list_for_table = [
         'Transmission parameter',
@@ -144,11 +196,13 @@ def estimate_parameters(n_of_resamples,
     ]
     # print('\nPosterior distributions:')
     # estimator.print_means_and_intervals(param_names=param_list_for_table)
-    estimator.export_means_and_intervals(poster_file=calibration_folder+'/posteriors.csv',
-                                         param_names=param_list_for_table,
-                                         prior_info_csv_file=ROOT_DIR+'/model/data/priors.csv')
-
-    estimator.plot_pairwise(fig_filename=figure_folder+'/posterior.png',
-                            par_names=param_list_for_figure,
-                            prior_info_csv_file=ROOT_DIR + '/model/data/priors.csv',
-                            figure_size=(9, 9))
+    with atomic_output(calibration_folder+'/posteriors.csv') as temp_file_name:
+        estimator.export_means_and_intervals(poster_file=temp_file_name,
+                                             param_names=param_list_for_table,
+                                             prior_info_csv_file=ROOT_DIR+'/model/data/priors.csv')
+
+    with atomic_output(figure_folder+'/posterior.png') as temp_file_name:
+        estimator.plot_pairwise(fig_filename=temp_file_name,
+                                par_names=param_list_for_figure,
+                                prior_info_csv_file=ROOT_DIR + '/model/data/priors.csv',
+                                figure_size=(9, 9))
@@ -0,0 +1,377 @@
+import math
+
+import numpy as np
+
+from apacepy.epidemic import EpiModel
+from apacepy.sim_events import UpdateCompartments, RecordSimHistory, RecordObservedHistory, EndOfSim
+from scipy.stats import t
+
+from model.active_set_model import ActiveSetEpiModel
+from model.sim_calendar import SimCalendar
+
+"""
+Epidemic model whose time-step (leap) adapts to how fast the state of the epidemic changes.
+Each update of compartments advances the model by a number of simulation time-steps (deltaT's) selected by
+the Cao-Gillespie tau-selection conditions (Cao, Gillespie, and Petzold, 2006): over the leap,
+the expected change of the size x of each compartment should stay within max(eps * x / g, 1) and
+its standard deviation within the same bound (eps is the tolerance and g = ORDER_OF_EVENTS).
+Since the model is a discrete-time model, the expected change and the variance of the change over m time-steps
+are those of a compartment with the arrivals and the exit probability of the current time-step
+(e.g. the size of a compartment whose members leave within a few days changes little over a leap
+when its arrivals and exits are balanced).
+Compartments with fewer than the critical number of members (usually the compartments of resistance profiles
+that have not taken hold) are not used to select the leap, as in the treatment of critical reactions
+by Cao et al.
+Over a leap of m time-steps:
+    - the members of each compartment leave it with the probability of leaving over m time-steps,
+    - the members who arrive at a compartment during the leap (and would arrive over the m time-steps)
+      leave it before the end of the leap with the probability that a member who arrives at a random time-step
+      of the leap leaves before its end, and the members they send to other compartments
+      are moved in the same way (up to MAX_TRANSIT_PASSES times),
+    - rates and probabilities (time-dependent parameters, force of infection, interventions in effect)
+      are those at the start of the leap.
+A leap ends at or before the time of the next scheduled event (recording simulation outputs and surveillance,
+making decisions, end of simulation) and at the end of the warm-up period, so surveys and decision rules are
+evaluated at the same times as with a fixed time-step. With a tolerance of 0 (or if no compartment has
+the critical number of members), leaps are one time-step long and trajectories are the same as those
+of ActiveSetEpiModel.
+Models with queue compartments are simulated with the fixed time-step.
+Only public attributes of apacepy's nodes and events are used (the members leaving a compartment over a leap
+are sampled here as Compartment.sample_outgoing samples them over a time-step), and the model has its own
+simulation calendar (see sim_calendar) so that the time of the next scheduled event can be found.
+"""
+
+ORDER_OF_EVENTS = 2  # highest order of events (infections depend on the sizes of S and infectious compartments)
+MAX_TRANSIT_PASSES = 10  # maximum number of times members who arrive at compartments during a leap are moved
+
+
+def _get_max_n_steps(change, bound, retained):
+    """
+    :param change: (float) expected change (or variance of the change) over one time-step
+    :param bound: (float) bound on the accumulated change
+    :param retained: (float) share of the change of a time-step that remains after each next time-step
+    :return: (float) largest number of time-steps m over which the accumulated change
+        change * (1 + retained + ... + retained^(m-1)) stays within bound
+    """
+
+    if retained >= 1:
+        return bound / change
+    rest = 1 - bound * (1 - retained) / change
+    if rest <= 0:
+        # the accumulated change never reaches the bound
+        return math.inf
+    if retained <= 0:
+        return 0
+    return math.log(rest) / math.log(retained)
+
+
+def if_equivalent(diffs, margin, alpha):
+    """ two one-sided tests (TOST) of whether the mean of paired differences (e.g. between the outcomes of
+    this model and of the fixed time-step model for the same seeds) is within (-margin, margin)
+    :param diffs: (numpy.array) of paired differences
+    :param margin: (float) margin of equivalence
+    :param alpha: (float) significance level of each one-sided test
+    :return: (bool) if the (1 - 2 alpha) confidence interval of the mean difference is within the margins
+    """
+
+    half_width = t.ppf(1 - alpha, len(diffs) - 1) * diffs.std(ddof=1) / np.sqrt(len(diffs))
+    return -margin < diffs.mean() - half_width and diffs.mean() + half_width < margin
+
+
+class TauLeapingEpiModel(ActiveSetEpiModel):
+    """ an epidemic model with an adaptive time-step (see the description of this module) """
+
+    def __init__(self, id, settings):
+        """
+        :param id: (int) id of the model
+        :param settings: model settings (with tauLeapingTolerance and tauLeapingCriticalSize)
+        """
+
+        ActiveSetEpiModel.__init__(self, id=id, settings=settings)
+        self.simCal = SimCalendar()
+
+        self._events = None  # (list) of (event, index of destination node) of each compartment
+        self._poissonEvents = None  # (list) of (Poisson event, index of destination node) of each compartment
+        self._outcomes = None  # (list) of indices of destination nodes (or None) of each chance node
+        self._chanceNodesInOrder = None  # indices of chance nodes (each before the chance nodes it leads to)
+        self._leap = 1  # number of time-steps of the current leap
+        self.nLeaps = 0  # number of leaps of the current simulation
+
+    def reset(self):
+
+        ActiveSetEpiModel.reset(self)
+        self.nLeaps = 0
+
+    def _build_graph(self):
+
+        ActiveSetEpiModel._build_graph(self)
+
+        index_of_nodes = {id(node): i for i, node in enumerate(self._nodes)}
+        n_comparts = len(self.compartments)
+
+        self._events = []
+        self._poissonEvents = []
+        for c in self.compartments:
+            self._events.append([(e, index_of_nodes.get(id(e.destComp))) for e in c.epiDepEvents + c.epiIndEvents])
+            self._poissonEvents.append([(e, index_of_nodes.get(id(e.destComp))) for e in c.poissonEvents])
+        self._outcomes = []
+        for c in self.chanceNodes:
+            self._outcomes.append([None if d is None else index_of_nodes.get(id(d)) for d in c.destComps])
+
+        # chance nodes in topological order
+        post_order = []
+        visited = set()
+        for j in range(len(self.chanceNodes)):
+            stack = [(n_comparts + j, False)]
+            while stack:
+                i, if_expanded = stack.pop()
+                if if_expanded:
+                    post_order.append(i)
+                    continue
+                if i in visited:
+                    continue
+                visited.add(i)
+                stack.append((i, True))
+                for d in self._outcomes[i - n_comparts]:
+                    if d is not None and d >= n_comparts and d not in visited:
+                        stack.append((d, False))
+        self._chanceNodesInOrder = post_order[::-1]
+
+    def _get_events_in_effect(self, i):
+        """
+        :param i: (int) index of a compartment
+        :return: (list) of (event, index of destination node) of the events of the compartment
+            that are in effect (as Compartment.sample_outgoing finds them)
+        """
+
+        return [(e, dest) for e, dest in self._events[i]
+                if e.intervToActivate is None or e.intervToActivate.switchValue == 1]
+
+    def _get_rates(self, i):
+        """
+        :param i: (int) index of a compartment
+        :return: (list) of (rate, index of destination node) of the events of the compartment that are in effect
+        """
+
+        return [(e.get_rate(), dest) for e, dest in self._get_events_in_effect(i)]
+
+    def _get_n_delta_ts_in_leap(self):
+        """
+        :return: (int) number of simulation time-steps of the next leap
+        """
+
+        n_delta_ts_to_next_event = self.settings.nDeltaTsInSimulation - self.simCal.time
+        if self.simCal.n_events() > 0:
+            n_delta_ts_to_next_event = self.simCal.get_time_of_next_event() - self.simCal.time
+        if self.simCal.time < self.settings.nDeltaTsInWarmUpPeriod:
+            n_delta_ts_to_next_event = min(n_delta_ts_to_next_event,
+                                           self.settings.nDeltaTsInWarmUpPeriod - self.simCal.time)
+        max_leap = max(n_delta_ts_to_next_event, 1)
+        if max_leap == 1 or self.settings.tauLeapingTolerance <= 0:
+            return 1
+
+        delta_t = self.settings.deltaT
+        n_comparts = len(self.compartments)
+
+        # expected number of members arriving at each node and leaving each compartment over one time-step
+        arrivals = [0.0] * len(self._nodes)
+        exit_probs = [0.0] * n_comparts
+        for i in self._activeComparts:
+            c = self.compartments[i]
+            rates = self._get_rates(i)
+            sum_rates = sum(rate for rate, dest in rates)
+            if sum_rates > 0 and c.size > 0:
+                exit_probs[i] = 1 - math.exp(-sum_rates * delta_t)
+                coeff = c.size * exit_probs[i] / sum_rates
+                for rate, dest in rates:
+                    if dest is not None:
+                        arrivals[dest] += coeff * rate
+            for e, dest in self._poissonEvents[i]:
+                if dest is not None:
+                    arrivals[dest] += e.get_rate() * delta_t
+        for j in self._chanceNodesInOrder:
+            n_in = arrivals[j]
+            if n_in == 0:
+                continue
+            node = self._nodes[j]
+            dests = self._outcomes[j - n_comparts]
+            if len(dests) == 2:
+                probs = (node.probParam.value, 1 - node.probParam.value)
+            else:
+                probs = node.probParam.value
+            for dest, prob in zip(dests, probs):
+                if dest is not None:
+                    arrivals[dest] += n_in * prob
+
+        # largest leap over which the change of each compartment with at least the critical number of members
+        # stays within max(eps * x / g, 1)
+        eps = self.settings.tauLeapingTolerance / ORDER_OF_EVENTS
+        leap = max_leap
+        for i, c in enumerate(self.compartments):
+            if c.size < self.settings.tauLeapingCriticalSize:
+                continue
+            bound = max(eps * c.size, 1)
+            exits = c.size * exit_probs[i]
+            retained = 1 - exit_probs[i]
+            # expected change
+            if arrivals[i] != exits:
+                leap = min(leap, _get_max_n_steps(change=abs(arrivals[i] - exits), bound=bound, retained=retained))
+            # variance of the change
+            if arrivals[i] + exits > 0:
+                leap = min(leap, _get_max_n_steps(change=arrivals[i] + exits, bound=bound ** 2,
+                                                  retained=retained ** 2))
+            if leap < 2:
+                return 1
+
+        return int(leap)
+
+    def update_compartments(self):
+        """ updates compartment sizes over a leap """
+
+        if len(self.queueCompartments) > 0:
+            EpiModel.update_compartments(self)
+            return
+
+        delta_t = self.settings.deltaT
+        sim_time_index = self.simCal.time
+        epi_time_index = self.epiHistory.timeMonitor.get_epidemic_time_index(sim_time_index=sim_time_index)
+        epi_time = sim_time_index * delta_t if epi_time_index is not None else None
+
+        # update time dependent parameters
+        self.params.update_time_dependent_params(rng=self.rng, time=epi_time)
+
+        # update transmission rates
+        self.FOIModel.update_transmission_rates(interventions_in_effect=self.decisionMaker.interventionsInEffect)
+
+        # select the leap
+        if self._nodes is None:
+            self._build_graph()
+        if self._activeComparts is None:
+            # (the first update moves the members of all compartments)
+            leap = 1
+        else:
+            leap = self._get_n_delta_ts_in_leap()
+        self.nLeaps += 1
+
+        # reset past delta_t information
+        for c in self.compartments:
+            c.n_past_delta_t_incoming = 0
+        for c in self.chanceNodes:
+            c.n_past_delta_t_incoming = 0
+
+        # push members of compartments forward
+        self._leap = leap
+        self._push_members_forward(nodes=self.compartments)
+        self._leap = 1
+        self._push_members_through_chance_nodes()
+
+        # push members who arrived during the leap forward
+        if leap > 1:
+            arrivals = [c.n_past_delta_t_incoming for c in self.compartments]
+            for _ in range(MAX_TRANSIT_PASSES):
+                past_incoming = [c.n_past_delta_t_incoming for c in self.compartments]
+                if not self._push_arrivals_forward(arrivals=arrivals, leap=leap):
+                    break
+                self._push_members_through_chance_nodes()
+                arrivals = [c.n_past_delta_t_incoming - n for c, n in zip(self.compartments, past_incoming)]
+
+        # update the incidence of summation time series
+        self.epiHistory.update_incd_of_sum_time_series(sim_time_index=sim_time_index)
+
+        # find if the disease is eradicated
+        if self.settings.checkEradicationConditions:
+            self._find_if_eradicated()
+
+        # schedule the next time to update the compartments
+        next_time = self.simCal.time + leap
+        if not self.ifEradicated:
+            self.simCal.add_event(event=UpdateCompartments(time=next_time, epi_model=self))
+        else:
+            # schedule record sim history if it is not already schedule for next time index
+            if next_time % self.settings.nDeltaTsInSimOutputPeriod != 0:
+                self.simCal.add_event(event=RecordSimHistory(time=next_time, epi_model=self))
+
+            # schedule record observed history if it is not already schedule for next time index
+            if next_time % self.settings.nDeltaTsInObsPeriod != 0:
+                self.simCal.add_event(event=RecordObservedHistory(time=next_time, epi_model=self))
+
+            # (a leap can end at the time of the end of simulation, which is already scheduled)
+            if not self.simCal.if_scheduled(time=next_time, event_type=EndOfSim):
+                self.simCal.add_event(event=EndOfSim(time=next_time, epi_model=self))
+
+    def _sample_outgoing(self, i):
+        """ finds the number of members leaving a node over the current leap
+        :param i: (int) index of the node
+        """
+
+        if self._leap == 1 or i >= len(self.compartments):
+            ActiveSetEpiModel._sample_outgoing(self, i=i)
+            return
+
+        # as Compartment.sample_outgoing does over a time-step of length leap * deltaT
+        leap_length = self._leap * self.settings.deltaT
+        for e, dest in self._poissonEvents[i]:
+            e.destComp.n_delta_t_incoming += self.rng.poisson(e.get_rate() * leap_length)
+
+        c = self.compartments[i]
+        if c.size > 0:
+            self._move_out(i=i, n=c.size, get_prob_stay=lambda sum_rates: math.exp(-sum_rates * leap_length))
+
+    def _move_out(self, i, n, get_prob_stay):
+        """ moves members of a compartment to the destinations of its events
+        :param i: (int) index of the compartment
+        :param n: (int) number of members who can leave
+        :param get_prob_stay: function of the sum of rates of events that returns the probability of staying
+        :return: (bool) if members could leave (if the compartment has events with positive rates)
+        """
+
+        events = self._get_events_in_effect(i)
+        rates = [e.get_rate() for e, dest in events]
+        sum_rates = sum(rates)
+        if sum_rates <= 0:
+            return False
+
+        # at position 0 is the probability of staying in the compartment and the probability of leaving
+        # due to event i is (prob of leaving due to any event) * rate_i / sum(rate_i)
+        prob_stay = get_prob_stay(sum_rates)
+        coeff = (1 - prob_stay) / sum_rates
+        outs = self.rng.multinomial(n, [prob_stay] + [coeff * rate for rate in rates])
+
+        c = self.compartments[i]
+        for (e, dest), out in zip(events, outs[1:]):
+            e.destComp.n_delta_t_incoming += out
+            c.size -= out
+        return True
+
+    def _push_members_through_chance_nodes(self):
+        """ moves the members of chance nodes until all chance nodes are empty """
+
+        while len(self._reachedChanceNodes) > 0:
+            self._push_members_forward(nodes=self.chanceNodes)
+
+    def _push_arrivals_forward(self, arrivals, leap):
+        """ moves the members who arrived at compartments during a leap and leave them before its end
+        :param arrivals: (list) of the number of members who arrived at each compartment
+        :param leap: (int) number of time-steps of the leap
+        :return: (bool) if any compartment sent members to other nodes
+        """
+
+        delta_t = self.settings.deltaT
+
+        def get_prob_stay(sum_rates):
+            # probability that a member who arrives at a random time-step of the leap stays until its end
+            exit_prob = 1 - math.exp(-sum_rates * delta_t)
+            if exit_prob <= 0:
+                return 1
+            return (1 - (1 - exit_prob) ** leap) / (leap * exit_prob)
+
+        reached = set()
+        for i, n_arrived in enumerate(arrivals):
+            if n_arrived == 0:
+                continue
+            # the arrivals leave by the events of the compartment with probability 1 - prob_stay
+            if self._move_out(i=i, n=n_arrived, get_prob_stay=get_prob_stay):
+                reached.update(self._destinations[i])
+
+        self._receive_incoming(reached=reached)
+        return len(reached) > 0
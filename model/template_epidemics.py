@@ -0,0 +1,342 @@
+import os
+
+from apacepy.multi_epidemics import MultiEpidemics, MultiEpidemicsOutputs
+from deampy.in_out_functions import write_dictionary_to_csv
+from deampy.support.simulation import SeedGenerator
+from numpy import iinfo, int32
+from numpy.random import RandomState
+
+from model.active_set_model import ActiveSetEpiModel
+from model.atomic_io import atomic_output
+from model.compact_outputs import get_batch_id, pack_outputs, unpack_results
+from model.feasible_conditions import get_violation
+from model.streaming_stats import StreamingOutputs
+from model.tau_leaping_model import TauLeapingEpiModel
+from model.trajectory_store import get_trajectory_columns, write_trajectories, delete_trajectories
+from model.worker_pool import get_pool, get_template, get_template_key, get_template_settings
+
+"""
+Simulates multiple trajectories of an epidemic model that is populated (by build_model) only once.
+Populating a model creates all compartments, chance nodes, events, and time-series of the model,
+while only the parameter values change from one trajectory to another.
+Since EpiModel.simulate resets the state of the model and resamples its parameters,
+a populated model (a template) can be simulated again with a new seed.
+When trajectories are simulated in parallel, each process of the session's pool (see worker_pool)
+populates its own template once.
+In the streaming mode, trajectories are simulated in batches of STREAMING_BATCH_SIZE and the outputs of
+each batch only update the summary statistics of outcomes (see streaming_stats).
+"""
+
+STREAMING_BATCH_SIZE = 1000  # number of trajectories whose outputs are held at once in the streaming mode
+SUMMARY_STATS_FILE = 'simulation_summary_stats.csv'  # summary statistics of outcomes in the streaming mode
+
+
+def get_model_class(model_settings):
+    """
+    :param model_settings: model settings
+    :return: (class) of the epidemic model to populate for the engine of these settings
+    """
+
+    if model_settings.engine == 'tau-leaping':
+        return TauLeapingEpiModel
+    return ActiveSetEpiModel
+
+
+def _simulate_template(model, epi_id, seed, param_values, if_run_until_a_feasible_traj, max_tries,
+                       if_export_trajs, trajs_folder, outputs):
+    """ simulates a template model with a new id and seed and stores its outputs
+    :param model: (EpiModel) a populated model
+    :param epi_id: (int) id of the trajectory
+    :param seed: (int) random number seed
+    :param param_values: (dictionary) of parameters with fixed values for this seed
+        (see GonoSettings.paramValuesBySeed)
+    :param if_run_until_a_feasible_traj: (bool) if run until a feasible trajectory is obtained
+    :param max_tries: (int) maximum number of simulation runs to try to find a feasible trajectory
+    :param if_export_trajs: (bool) set to True to export the simulated trajectory
+    :param trajs_folder: (string) folder to store the simulated trajectory to
+    :param outputs: (MultiEpidemicsOutputs) to store the outputs of this trajectory
+    :return: (tuple) of
+        - (int) number of trajectories discarded to find a feasible trajectory
+        - (list) of (name of the violated time-series, abort time) of each infeasible trajectory simulated
+        - (list) of columns of the trajectory to export in the 'npz' format (see trajectory_store) or None
+    """
+
+    model.id = epi_id
+    model.nTrajsDiscarded = 0
+    violations = []
+    if if_run_until_a_feasible_traj:
+        # as EpiModel.simulate_until_a_feasible_traj does (but recording why each trajectory is discarded)
+        model.params.fixedValues = dict()
+        rng = RandomState(seed=seed)
+        while model.nTrajsDiscarded < max_tries:
+            model.simulate(seed=rng.randint(0, iinfo(int32).max))
+            if model.ifAFeasibleTraj:
+                break
+            violations.append(get_violation(model=model))
+            model.nTrajsDiscarded += 1
+        print('ID: {}, # discarded: {}, Seed: {}, lnl = {}'.format(
+            model.id, model.nTrajsDiscarded, model.seed, model.lnl[0]))
+    else:
+        model.params.fixedValues = param_values
+        model.simulate(seed=seed)
+        if not model.ifAFeasibleTraj:
+            violations.append(get_violation(model=model))
+
+    if model.settings.calcLikelihood and not model.ifAFeasibleTraj and violations[-1][0] is not None:
+        name, time = violations[-1]
+        model.lnl = model.lnl[0], '{} ({} is infeasible at year {:.1f})'.format(model.lnl[1], name, time)
+
+    columns = None
+    if if_export_trajs:
+        if model.settings.trajectoryFormat == 'csv':
+            model.export_trajectories(folder=trajs_folder, delete_existing_files=False)
+        else:
+            columns = get_trajectory_columns(model=model)
+
+    outputs.extract_outputs(simulated_model=model, store_param_values=model.settings.storeParameterValues)
+    # reset the model
+    model.reset()
+
+    return model.nTrajsDiscarded, violations, columns
+
+
+def _simulate_with_template_of_process(template_key, model_settings, function_to_populate_model, batch_id,
+                                       epi_id, seed, param_values, if_run_until_a_feasible_traj, max_tries,
+                                       if_export_trajs, trajs_folder):
+    """ simulates the template model of this process (see worker_pool.get_template for the first 3 arguments,
+    compact_outputs.pack_outputs for batch_id, and _simulate_template for the others)
+    :return: (tuple) of number of trajectories discarded, violations of feasible conditions,
+        the outputs of this trajectory (CompactOutputs), and the columns of the trajectory to export (or None)
+    """
+
+    outputs = MultiEpidemicsOutputs()
+    model = get_template(key=template_key, model_class=get_model_class(model_settings),
+                         model_settings=model_settings, function_to_populate_model=function_to_populate_model)
+    n_discarded, violations, columns = _simulate_template(
+        model=model, epi_id=epi_id, seed=seed, param_values=param_values,
+        if_run_until_a_feasible_traj=if_run_until_a_feasible_traj, max_tries=max_tries,
+        if_export_trajs=if_export_trajs, trajs_folder=trajs_folder, outputs=outputs)
+    return n_discarded, violations, pack_outputs(outputs=outputs, batch_id=batch_id), columns
+
+
+def _append_outputs(outputs, new_outputs):
+    """ appends the outputs of trajectories (simulated separately) to outputs
+    :param outputs: (MultiEpidemicsOutputs) outputs to append to
+    :param new_outputs: (MultiEpidemicsOutputs) outputs to append
+    """
+
+    outputs.ids.extend(new_outputs.ids)
+    outputs.seeds.extend(new_outputs.seeds)
+    outputs.ifFeasible.extend(new_outputs.ifFeasible)
+    outputs.runTimes.extend(new_outputs.runTimes)
+    outputs.discountedCosts.extend(new_outputs.discountedCosts)
+    outputs.discountedHealths.extend(new_outputs.discountedHealths)
+    for existing_dict, new_dict in ((outputs.dictOfProjectedOutcomes, new_outputs.dictOfProjectedOutcomes),
+                                    (outputs.dictParameterValues, new_outputs.dictParameterValues)):
+        for key, values in new_dict.items():
+            existing_dict.setdefault(key, []).extend(values)
+    outputs.listOfParamValues.extend(new_outputs.listOfParamValues)
+    outputs.lnL.extend(new_outputs.lnL)
+
+
+class TemplateMultiEpidemics(MultiEpidemics):
+    """ simulates multiple epidemic models by re-simulating a model that is populated only once
+    (in each process) instead of populating a new model for each trajectory """
+
+    def __init__(self, model_settings, checkpoint=None, if_streaming=False):
+        """
+        :param model_settings: model settings
+        :param checkpoint: (CalibrationCheckpoint) to store the outputs of simulated trajectories and
+            to skip trajectories that are already simulated (if None, no checkpoint is used)
+        :param if_streaming: (bool) set to True to only keep the summary statistics of outcomes
+            (see streaming_stats), which are updated as trajectories are simulated, instead of the outputs of
+            all trajectories (so the memory used does not grow with the number of trajectories)
+        """
+
+        MultiEpidemics.__init__(self, model_settings=model_settings)
+
+        if if_streaming and checkpoint is not None:
+            raise ValueError('Outputs of trajectories cannot be stored in a checkpoint in the streaming mode.')
+
+        self.checkpoint = checkpoint
+        self.ifStreaming = if_streaming
+        # (name of the violated time-series, abort time) of each infeasible trajectory simulated
+        self.violations = []
+
+    def simulate(self, function_to_populate_model, n,
+                 if_export_trajs=None, trajs_folder=None,
+                 seeds=None, weights=None, sample_seeds_by_weights=True, initial_seed=None,
+                 if_run_in_parallel=False, if_run_until_a_feasible_traj=False, max_tries=100):
+        """ (the arguments are the same as those of MultiEpidemics.simulate) """
+
+        # seeds generator
+        seed_generator = SeedGenerator(seeds=seeds, weights=weights)
+        initial_seed = 0 if initial_seed is None else initial_seed
+        seeds = seed_generator.next_seeds(
+            n=n, rng=RandomState(initial_seed), sample_by_weight=sample_seeds_by_weights)
+
+        if if_export_trajs is None:
+            if_export_trajs = self.modelSets.exportTrajectories
+        if trajs_folder is None:
+            trajs_folder = self.modelSets.folderToSaveTrajs
+        if self.ifStreaming and if_export_trajs and self.modelSets.trajectoryFormat != 'csv':
+            raise ValueError("Trajectories can only be exported in the 'csv' format in the streaming mode.")
+
+        # delete the trajectories of the previous run
+        delete_trajectories(folder=trajs_folder)
+
+        self.nTrajsDiscarded = 0  # total trajectories discarded to find feasible trajectories
+        self.violations = []
+
+        # the template of the session (if not run in parallel)
+        model = None
+        if not if_run_in_parallel and n > 0:
+            # populate the template once
+            model = get_model_class(self.modelSets)(id=0, settings=self.modelSets)
+            function_to_populate_model(model)
+
+        if self.ifStreaming:
+            # outputs of each batch of trajectories update the summary statistics and are then dropped
+            self.multiModelOutputs = StreamingOutputs()
+            for j in range(0, n, STREAMING_BATCH_SIZE):
+                batch_results = self._simulate_batch(
+                    function_to_populate_model=function_to_populate_model, model=model,
+                    batch=list(range(j, min(j + STREAMING_BATCH_SIZE, n))), seeds=seeds,
+                    if_run_until_a_feasible_traj=if_run_until_a_feasible_traj, max_tries=max_tries,
+                    if_export_trajs=if_export_trajs, trajs_folder=trajs_folder)
+                self._record_results(results=[result[:3] for result in batch_results])
+            return
+
+        # (number of trajectories discarded, violations, outputs) of each trajectory
+        results = [None] * n
+        # columns of trajectories to export in the 'npz' format
+        trajectories = [None] * n
+
+        # trajectories stored in the checkpoint are not simulated again
+        to_simulate = []
+        for i in range(n):
+            if self.checkpoint is not None and self.checkpoint.if_simulated(seed=seeds[i]):
+                results[i] = self.checkpoint.get_outputs(seed=seeds[i])
+                results[i][2].ids[0] = i
+            else:
+                to_simulate.append(i)
+
+        # trajectories are simulated in batches (the outputs of each batch are added to the checkpoint)
+        batch_size = len(to_simulate) if self.checkpoint is None else self.checkpoint.batchSize
+        batches = [to_simulate[j:j + batch_size] for j in range(0, len(to_simulate), max(batch_size, 1))]
+
+        for batch in batches:
+            batch_results = self._simulate_batch(
+                function_to_populate_model=function_to_populate_model, model=model, batch=batch, seeds=seeds,
+                if_run_until_a_feasible_traj=if_run_until_a_feasible_traj, max_tries=max_tries,
+                if_export_trajs=if_export_trajs, trajs_folder=trajs_folder)
+            for i, result in zip(batch, batch_results):
+                results[i], trajectories[i] = result[:3], result[3]
+            self._add_to_checkpoint(seeds=[seeds[i] for i in batch], results=[results[i] for i in batch])
+
+        # export trajectories (in the 'npz' format) into one file
+        exported = [i for i in range(n) if trajectories[i] is not None]
+        if len(exported) > 0:
+            write_trajectories(folder=trajs_folder,
+                               ids=[results[i][2].ids[0] for i in exported],
+                               seeds=[results[i][2].seeds[0] for i in exported],
+                               list_of_columns=[trajectories[i] for i in exported])
+
+        # record outcomes from simulating all trajectories
+        self._record_results(results=results)
+
+        # calculate summary statistics on performance_analysis measures
+        self.multiModelOutputs.calculate_summary_stats()
+
+    def _simulate_batch(self, function_to_populate_model, model, batch, seeds,
+                        if_run_until_a_feasible_traj, max_tries, if_export_trajs, trajs_folder):
+        """ simulates a batch of trajectories
+        (in this process if model is not None and in the processes of the session's pool otherwise)
+        :param function_to_populate_model: function to populate the template
+        :param model: (EpiModel) the populated template of this process or None to simulate in parallel
+        :param batch: (list) of ids of trajectories
+        :param seeds: (list) of seeds of all trajectories
+        (see _simulate_template for the other arguments)
+        :return: (list) of (number of trajectories discarded, violations, outputs,
+            columns of the trajectory to export or None) of each trajectory of the batch
+        """
+
+        batch_results = []
+        if model is not None:
+            for i in batch:
+                outputs = MultiEpidemicsOutputs()
+                n_discarded, violations, columns = _simulate_template(
+                    model=model, epi_id=i, seed=seeds[i],
+                    param_values=self.modelSets.paramValuesBySeed.get(seeds[i], dict()),
+                    if_run_until_a_feasible_traj=if_run_until_a_feasible_traj, max_tries=max_tries,
+                    if_export_trajs=if_export_trajs, trajs_folder=trajs_folder, outputs=outputs)
+                batch_results.append((n_discarded, violations, outputs, columns))
+
+        elif len(batch) > 0:  # if run models in parallel
+            # each process of the session's pool populates its template once and then simulates many trajectories
+            template_key = get_template_key(model_class=get_model_class(self.modelSets),
+                                            model_settings=self.modelSets,
+                                            function_to_populate_model=function_to_populate_model)
+
+            # create a list of arguments for simulating the trajectories in parallel
+            # (each with the parameter values of its own seed)
+            batch_id = get_batch_id()
+            model_settings = get_template_settings(model_settings=self.modelSets)
+            args = [(template_key, model_settings, function_to_populate_model, batch_id,
+                     i, seeds[i], self.modelSets.paramValuesBySeed.get(seeds[i], dict()),
+                     if_run_until_a_feasible_traj, max_tries, if_export_trajs, trajs_folder)
+                    for i in batch]
+            results = get_pool().starmap(_simulate_with_template_of_process, args)
+            # outputs are returned in the compact form (see compact_outputs)
+            list_of_outputs = unpack_results(results=[result[2] for result in results])
+            for result, outputs in zip(results, list_of_outputs):
+                batch_results.append((result[0], result[1], outputs, result[3]))
+
+        return batch_results
+
+    def _record_results(self, results):
+        """ records the outputs of simulated trajectories
+        :param results: (list) of (number of trajectories discarded, violations, outputs) of each trajectory
+        """
+
+        for n_discarded, violations, outputs in results:
+            self.nTrajsDiscarded += n_discarded
+            self.violations.extend(violations)
+            if self.ifStreaming:
+                self.multiModelOutputs.add(outputs=outputs)
+            else:
+                _append_outputs(outputs=self.multiModelOutputs, new_outputs=outputs)
+
+    def get_dict_summary_and_projections(self):
+
+        if self.ifStreaming:
+            raise ValueError('Outputs of trajectories are not stored in the streaming mode '
+                             '(see save_summary for the summary statistics of outcomes).')
+        return MultiEpidemics.get_dict_summary_and_projections(self)
+
+    def save_summary(self, folder_to_save_summary=None):
+        """ exports the summary of simulation into csv files (see MultiEpidemics.save_summary);
+        in the streaming mode, exports the summary statistics of outcomes (mean, standard deviation,
+        confidence and percentile intervals, minimum, and maximum) into SUMMARY_STATS_FILE
+        :param folder_to_save_summary: (string) folder to save the summary files to
+        """
+
+        if not self.ifStreaming:
+            MultiEpidemics.save_summary(self, folder_to_save_summary=folder_to_save_summary)
+            return
+
+        if folder_to_save_summary is None:
+            folder_to_save_summary = self.modelSets.folderToSaveSummary
+
+        with atomic_output(os.path.join(folder_to_save_summary, SUMMARY_STATS_FILE)) as temp_file_name:
+            write_dictionary_to_csv(dictionary=self.multiModelOutputs.get_dict_of_summary(),
+                                    file_name=temp_file_name)
+
+    def _add_to_checkpoint(self, seeds, results):
+        """ appends the outputs of a batch of trajectories to the checkpoint (if any)
+        :param seeds: (list) of seeds of trajectories
+        :param results: (list) of (number of trajectories discarded, violations, outputs) of each trajectory
+        """
+
+        if self.checkpoint is not None:
+            self.checkpoint.append(seeds=seeds, results=results)
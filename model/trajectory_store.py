@@ -0,0 +1,270 @@
+import os
+
+import numpy as np
+import pandas as pd
+from apacepy.analysis.trajectories import SimOutcomeTrajectories, TrajOneOutcomeOneRep, \
+    TrajsOneOutcomeMultipleReps
+from apacepy.support import _add_column, _add_prev, _add_accum_incd, _add_incd
+from apacepy.time_series import SumPrevalence, SumCumulativeIncidence, SumIncidence
+from deampy.in_out_functions import delete_files
+
+from model.atomic_io import atomic_output
+
+"""
+Stores all simulated trajectories of a run in one columnar file (trajectories.npz) instead of
+one csv file per trajectory. The file contains
+    - 'ids' and 'seeds' of trajectories,
+    - 'names' of outcomes (the columns of the csv files that apacepy exports, in the same order),
+    - an array (trajectories x time points) for each outcome (named by the index of the outcome in 'names');
+      outcomes with fewer time points than others are padded with NaN (as they are when read from csv files).
+The columns are built with the helpers of apacepy.support that EpiModel.export_trajectories uses
+(tests/test_trajectory_store.py checks that they are the columns of the csv file of the same trajectory).
+Arrays of an .npz file are loaded only when they are accessed, so reading the outcomes needed for a figure
+does not require parsing all the others.
+The readers of this module (for the .npz file and for csv files) read the outcomes of each figure
+just before it is plotted (see plots.plot_trajectories).
+"""
+
+TRAJECTORY_FILE = 'trajectories.npz'
+# columns with the time of outcomes that follow them (as in apacepy csv files)
+TIME_COLUMNS = ('Simulation Time', 'Simulation Period', 'Observation Time', 'Observation Period')
+
+
+def get_trajectory_columns(model):
+    """
+    :param model: (EpiModel) a simulated model
+    :return: (list) of columns ([title, value 1, value 2, ...]) of the trajectory of this model
+        (the same columns that EpiModel.export_trajectories writes to a csv file)
+    """
+
+    epi_history = model.epiHistory
+    decision_maker = model.decisionMaker
+    cols = []
+
+    # time-based simulation outputs
+    _add_column(cols=cols, col_title='Simulation Time',
+                values=[row[0] for row in epi_history.timeMonitor.simTimesAndSimPeriods])
+    _add_prev(cols=cols, nodes=epi_history.compartments)
+    _add_prev(cols=cols, nodes=epi_history.queueCompartments)
+    _add_accum_incd(cols=cols, nodes=epi_history.compartments)
+    _add_accum_incd(cols=cols, nodes=epi_history.chanceNodes)
+    for s in epi_history.sumTimeSeries:
+        if isinstance(s, SumPrevalence) or isinstance(s, SumCumulativeIncidence):
+            _add_column(cols=cols, col_title=s.name, values=s.timeSeries)
+    for r in epi_history.ratioTimeSeries:
+        if r.type in ('prev/prev', 'cum-incd/cum-incd', 'cum-incd/prev'):
+            _add_column(cols=cols, col_title=r.name, values=r.simTimeSeries)
+
+    # period-based simulation outputs
+    _add_column(cols=cols, col_title='Simulation Period',
+                values=[row[1] for row in epi_history.timeMonitor.simTimesAndSimPeriods])
+    _add_incd(cols=cols, nodes=epi_history.compartments)
+    _add_incd(cols=cols, nodes=epi_history.chanceNodes)
+    _add_incd(cols=cols, nodes=epi_history.queueCompartments)
+    for s in epi_history.sumTimeSeries:
+        if isinstance(s, SumIncidence):
+            _add_column(cols=cols, col_title=s.name, values=s.get_sim_time_series())
+    for r in epi_history.ratioTimeSeries:
+        if r.type in ('incd/incd', 'incd/prev', 'incd/cum-incd'):
+            _add_column(cols=cols, col_title=r.name, values=r.simTimeSeries)
+    _add_column(cols=cols, col_title='Interventions', values=decision_maker.statusOfIntvsOverPastSimOutPeriods)
+
+    # surveyed outputs
+    if epi_history.ifAnySurveillance:
+        _add_column(cols=cols, col_title='Observation Time',
+                    values=[row[0] for row in epi_history.timeMonitor.surveyTimesAndSurveyPeriods])
+        for s in epi_history.sumTimeSeries:
+            if s.surveillance and (isinstance(s, SumPrevalence) or isinstance(s, SumCumulativeIncidence)):
+                _add_column(cols=cols, col_title='Obs: ' + s.name, values=s.surveillance.surveyedTimeSeries)
+        for r in epi_history.ratioTimeSeries:
+            if r.ifSurveyed and r.type in ('prev/prev', 'cum-incd/cum-incd', 'cum-incd/prev'):
+                _add_column(cols=cols, col_title='Obs: ' + r.name, values=r.surveyedTimeSeries)
+
+        _add_column(cols=cols, col_title='Observation Period',
+                    values=[row[1] for row in epi_history.timeMonitor.surveyTimesAndSurveyPeriods])
+        for s in epi_history.sumTimeSeries:
+            if s.surveillance and isinstance(s, SumIncidence):
+                _add_column(cols=cols, col_title='Obs: ' + s.name, values=s.surveillance.surveyedTimeSeries)
+        for r in epi_history.ratioTimeSeries:
+            if r.ifSurveyed and r.type in ('incd/incd', 'incd/prev', 'incd/cum-incd'):
+                _add_column(cols=cols, col_title='Obs: ' + r.name, values=r.surveyedTimeSeries)
+
+        _add_column(cols=cols, col_title='Obs: Interventions',
+                    values=decision_maker.statusOfIntvsOverPastObsPeriods)
+
+    return cols
+
+
+def write_trajectories(folder, ids, seeds, list_of_columns):
+    """ writes trajectories into one file (TRAJECTORY_FILE) in a folder
+    (csv files of trajectories in this folder are deleted)
+    :param folder: (string) folder to store the trajectories in
+    :param ids: (list) of ids of trajectories
+    :param seeds: (list) of seeds of trajectories
+    :param list_of_columns: (list) of columns of each trajectory (see get_trajectory_columns)
+    """
+
+    os.makedirs(folder, exist_ok=True)
+    delete_files('.csv', path=folder)
+
+    names = [col[0] for col in list_of_columns[0]]
+    n_rows = max(len(col) - 1 for cols in list_of_columns for col in cols)
+
+    arrays = {'ids': np.array(ids), 'seeds': np.array(seeds), 'names': np.array(names)}
+    for j, name in enumerate(names):
+        values = [cols[j][1:] for cols in list_of_columns]
+        if any(isinstance(v, (str, list)) for row in values for v in row):
+            # non-numeric outcomes (e.g. status of interventions) are stored as text
+            array = np.full((len(values), n_rows), '', dtype=object)
+            for i, row in enumerate(values):
+                array[i, :len(row)] = [str(v) for v in row]
+            array = array.astype(str)
+        else:
+            array = np.full((len(values), n_rows), np.nan)
+            for i, row in enumerate(values):
+                array[i, :len(row)] = [np.nan if v is None else v for v in row]
+        arrays[str(j)] = array
+
+    with atomic_output(os.path.join(folder, TRAJECTORY_FILE)) as temp_file_name:
+        np.savez(temp_file_name, **arrays)
+
+
+def delete_trajectories(folder):
+    """ deletes the trajectories stored in a folder (the csv files and the TRAJECTORY_FILE)
+    :param folder: (string) folder of trajectories
+    """
+
+    delete_files('.csv', path=folder)
+    if os.path.isfile(os.path.join(folder, TRAJECTORY_FILE)):
+        os.remove(os.path.join(folder, TRAJECTORY_FILE))
+
+
+class _ProjectedTrajectories(SimOutcomeTrajectories):
+    """ base class of readers that read only the outcomes that are needed (to be used instead of
+    SimOutcomeTrajectories, which reads all outcomes of all trajectories);
+    load_outcomes should be called with the outcomes of a figure before the figure is plotted """
+
+    def __init__(self, outcome_names, n_trajs):
+        """
+        :param outcome_names: (list) of names of outcomes (in the order of columns of trajectory files)
+        :param n_trajs: (int) number of trajectories
+        """
+
+        self.outcomeNames = outcome_names
+        # only the number of trajectories is used by SimOutcomeTrajectories.plot_multi_panel
+        self.replicationDFs = [None] * n_trajs
+        self.dictOfSimOutcomeTrajectories = dict()
+
+        # name of the time column of each outcome (the last time column before the outcome)
+        self.timeColNames = dict()
+        time_col_name = TIME_COLUMNS[0]
+        for name in self.outcomeNames:
+            if name in TIME_COLUMNS:
+                time_col_name = name
+            self.timeColNames[name] = time_col_name
+
+    def load_outcomes(self, outcome_names):
+        """ reads the trajectories of outcomes (trajectories of other outcomes are released)
+        :param outcome_names: (list) of names of outcomes
+        """
+
+        # outcomes that do not exist are skipped (SimOutcomeTrajectories warns about them when plotting)
+        names = [name for name in dict.fromkeys(outcome_names) if name in self.timeColNames]
+        loaded = {name: self.dictOfSimOutcomeTrajectories[name]
+                  for name in names if name in self.dictOfSimOutcomeTrajectories}
+        to_read = [name for name in names if name not in loaded]
+        if len(to_read) > 0:
+            loaded.update(self._read_outcomes(outcome_names=to_read))
+        self.dictOfSimOutcomeTrajectories = loaded
+
+    def _read_outcomes(self, outcome_names):
+        """
+        :param outcome_names: (list) of names of outcomes
+        :return: (dict) of trajectories of outcomes (TrajsOneOutcomeMultipleReps) keyed by outcome name
+        """
+        raise NotImplementedError
+
+    def _get_trajs(self, list_of_times, list_of_obss):
+        """
+        :param list_of_times: (list) of times of observations of each trajectory
+        :param list_of_obss: (list) of observations of each trajectory
+        :return: (TrajsOneOutcomeMultipleReps) trajectories of an outcome
+        """
+
+        trajs = TrajsOneOutcomeMultipleReps()
+        for i, (times, obss) in enumerate(zip(list_of_times, list_of_obss)):
+            traj = TrajOneOutcomeOneRep(i)
+            traj.add_observations(times=times, observations=obss)
+            trajs.add_traj_from_one_rep(traj)
+        return trajs
+
+
+class TrajectoryStoreReader(_ProjectedTrajectories):
+    """ reads trajectories from the TRAJECTORY_FILE of a folder """
+
+    def __init__(self, directory):
+        """
+        :param directory: directory where the TRAJECTORY_FILE is located
+        """
+
+        self.file = np.load(os.path.join(directory, TRAJECTORY_FILE))
+        self.ids = self.file['ids']
+        self.seeds = self.file['seeds']
+        self.filenames = ['trajectory {} - {}.csv'.format(i, s) for i, s in zip(self.ids, self.seeds)]
+
+        _ProjectedTrajectories.__init__(self, outcome_names=self.file['names'].tolist(), n_trajs=len(self.ids))
+
+    def _read_outcomes(self, outcome_names):
+
+        index = {name: j for j, name in enumerate(self.outcomeNames)}
+        result = dict()
+        for name in outcome_names:
+            result[name] = self._get_trajs(
+                list_of_times=self.file[str(index[self.timeColNames[name]])],
+                list_of_obss=self.file[str(index[name])])
+        return result
+
+
+class CsvTrajectoryReader(_ProjectedTrajectories):
+    """ reads trajectories from the csv files of a folder (one file per trajectory) """
+
+    def __init__(self, directory):
+        """
+        :param directory: directory where csv files are located
+        """
+
+        self.directory = directory
+        # in the order that SimOutcomeTrajectories reads the files
+        self.filenames = [f for f in os.listdir(directory) if f.endswith('.csv')]
+
+        _ProjectedTrajectories.__init__(
+            self,
+            outcome_names=pd.read_csv(os.path.join(directory, self.filenames[0]), nrows=0).columns.tolist(),
+            n_trajs=len(self.filenames))
+
+    def _read_outcomes(self, outcome_names):
+
+        # read only the columns of these outcomes (and their time columns) from each file
+        columns = set(outcome_names).union(self.timeColNames[name] for name in outcome_names)
+        dfs = [pd.read_csv(os.path.join(self.directory, f), usecols=lambda c: c in columns)
+               for f in self.filenames]
+
+        result = dict()
+        for name in outcome_names:
+            result[name] = self._get_trajs(
+                list_of_times=[df[self.timeColNames[name]] for df in dfs],
+                list_of_obss=[df[name] for df in dfs])
+        return result
+
+
+def read_trajectories(directory):
+    """
+    :param directory: directory of simulated trajectories
+    :return: (_ProjectedTrajectories) reader of the TRAJECTORY_FILE of the directory if it exists
+        (TrajectoryStoreReader) or otherwise of the csv files of the directory (CsvTrajectoryReader)
+    """
+
+    if os.path.isfile(os.path.join(directory, TRAJECTORY_FILE)):
+        return TrajectoryStoreReader(directory=directory)
+    else:
+        return CsvTrajectoryReader(directory=directory)
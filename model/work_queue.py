@@ -0,0 +1,306 @@
+import os
+import pickle
+import socket
+import threading
+import time
+import uuid
+
+from model.atomic_io import atomic_output
+
+"""
+Queue of jobs (e.g. simulating a trajectory or the scenarios of a seed) to distribute the simulations of
+a session over processes on several hosts.
+A session publishes jobs to the queue and waits for their results; workers (see analysis/run_worker.py),
+which may run on other hosts, take jobs from the queue, run them, and write their results back to the queue.
+QueuePool has the starmap method of multiprocessing.Pool, so it can replace the session's pool
+(see worker_pool.get_pool) without changing the code that simulates trajectories.
+
+DirectoryQueue is the reference implementation, which keeps the queue in a folder
+(of a file system shared by the hosts):
+    pending/    jobs waiting to be taken by a worker,
+    claimed/    jobs taken by a worker (a worker takes a job by moving it from pending/ to claimed/,
+                which only one worker can do, and touches the file every HEARTBEAT_INTERVAL seconds
+                while it runs the job),
+    done/       results of jobs.
+A job claimed by a worker that stopped touching its file (e.g. a worker on a host that went down) can be returned
+to the pending jobs (see QueuePool), and once a session has the results of its jobs it removes the files of
+these jobs (including the results of jobs that were run more than once).
+Files are written atomically (see atomic_io), so a worker never reads a partially written job or result.
+Jobs and results are pickled, so the functions of jobs should be defined at the module level and
+workers should run the same version of the code in the same folder (usually analysis/) and with the same
+root folder of outputs (see definitions.get_run_path) as the session.
+"""
+
+PENDING = 'pending'
+CLAIMED = 'claimed'
+DONE = 'done'
+HEARTBEAT_INTERVAL = 30  # seconds between the touches of the file of a claimed job by the worker running it
+# seconds after which a claimed job whose file is not touched is returned to the pending jobs (see QueuePool)
+CLAIM_TIMEOUT = 4 * HEARTBEAT_INTERVAL
+
+
+class JobError(Exception):
+    """ raised in the session when a job fails on a worker """
+    pass
+
+
+class DirectoryQueue:
+    """ queue of jobs stored in a folder """
+
+    def __init__(self, folder):
+        """
+        :param folder: (string) folder of the queue
+        """
+
+        self.folder = folder
+        for sub_folder in (PENDING, CLAIMED, DONE):
+            os.makedirs(os.path.join(folder, sub_folder), exist_ok=True)
+
+    def _get_file_name(self, sub_folder, job_id):
+        """
+        :return: (string) name of the file of a job in a sub-folder of the queue
+        """
+
+        return os.path.join(self.folder, sub_folder, job_id + '.pkl')
+
+    def publish(self, function, list_of_args):
+        """ adds jobs to the queue
+        :param function: function to run (defined at the module level)
+        :param list_of_args: (list) of arguments of each job
+        :return: (list) of ids of jobs (jobs are taken by workers in the order of their ids)
+        """
+
+        batch_id = '{}-{}'.format(int(time.time()), uuid.uuid4().hex[:8])
+        job_ids = []
+        for i, args in enumerate(list_of_args):
+            job_id = '{}-{:06d}'.format(batch_id, i)
+            with atomic_output(self._get_file_name(sub_folder=PENDING, job_id=job_id)) as temp_file_name:
+                with open(temp_file_name, 'wb') as file:
+                    pickle.dump((function, args), file, protocol=pickle.HIGHEST_PROTOCOL)
+            job_ids.append(job_id)
+        return job_ids
+
+    def claim(self):
+        """ takes the first pending job of the queue
+        :return: (string) id of the job, or None if there is no pending job
+        """
+
+        for entry in sorted(os.listdir(os.path.join(self.folder, PENDING))):
+            # temporary files of jobs being published (see atomic_io) are skipped
+            if not entry.endswith('.pkl') or '.tmp-' in entry:
+                continue
+            job_id = entry[:-len('.pkl')]
+            claimed_file_name = self._get_file_name(sub_folder=CLAIMED, job_id=job_id)
+            try:
+                # moving a file is atomic, so only one worker can take a job
+                os.rename(self._get_file_name(sub_folder=PENDING, job_id=job_id), claimed_file_name)
+            except FileNotFoundError:
+                # taken by another worker
+                continue
+            # the time the job was claimed (see requeue_claimed)
+            os.utime(claimed_file_name)
+            return job_id
+        return None
+
+    def get_job(self, job_id):
+        """
+        :param job_id: (string) id of a claimed job
+        :return: (tuple) of (function, arguments) of the job
+        """
+
+        with open(self._get_file_name(sub_folder=CLAIMED, job_id=job_id), 'rb') as file:
+            return pickle.load(file)
+
+    def touch(self, job_id):
+        """ records that the worker running a claimed job is alive (see requeue_claimed)
+        :param job_id: (string) id of the job
+        """
+
+        try:
+            os.utime(self._get_file_name(sub_folder=CLAIMED, job_id=job_id))
+        except FileNotFoundError:
+            # returned to the pending jobs or removed
+            pass
+
+    def complete(self, job_id, result, error=None):
+        """ stores the result of a job (or the error it raised)
+        :param job_id: (string) id of the job
+        :param result: result of the job
+        :param error: (string) description of the error if the job failed
+        """
+
+        if not os.path.isfile(self._get_file_name(sub_folder=CLAIMED, job_id=job_id)) \
+                and not os.path.isfile(self._get_file_name(sub_folder=PENDING, job_id=job_id)):
+            # the session already has the result of this job, which was run more than once (see remove)
+            return
+
+        with atomic_output(self._get_file_name(sub_folder=DONE, job_id=job_id)) as temp_file_name:
+            with open(temp_file_name, 'wb') as file:
+                pickle.dump((result, error), file, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            os.remove(self._get_file_name(sub_folder=CLAIMED, job_id=job_id))
+        except FileNotFoundError:
+            # the job was returned to the pending jobs (see requeue_claimed)
+            pass
+
+    def get_result(self, job_id):
+        """
+        :param job_id: (string) id of a job
+        :return: (tuple) of (result, error) of the job (which is removed from the queue),
+            or None if the job is not done yet
+        """
+
+        file_name = self._get_file_name(sub_folder=DONE, job_id=job_id)
+        if not os.path.isfile(file_name):
+            return None
+        with open(file_name, 'rb') as file:
+            result = pickle.load(file)
+        os.remove(file_name)
+        return result
+
+    def requeue_claimed(self, job_ids, claim_timeout):
+        """ returns the claimed jobs whose workers have not touched their files for claim_timeout seconds
+        (e.g. workers that stopped) to the pending jobs
+        :param job_ids: (list) of ids of jobs
+        :param claim_timeout: (float) seconds (longer than HEARTBEAT_INTERVAL)
+        """
+
+        for job_id in job_ids:
+            if os.path.isfile(self._get_file_name(sub_folder=DONE, job_id=job_id)):
+                # completed (its claimed file is being removed)
+                continue
+            claimed_file_name = self._get_file_name(sub_folder=CLAIMED, job_id=job_id)
+            try:
+                if time.time() - os.stat(claimed_file_name).st_mtime > claim_timeout:
+                    os.rename(claimed_file_name, self._get_file_name(sub_folder=PENDING, job_id=job_id))
+            except FileNotFoundError:
+                # not claimed or completed
+                pass
+
+    def remove(self, job_ids):
+        """ removes the files of jobs (pending, claimed, and done) from the queue
+        :param job_ids: (list) of ids of jobs
+        """
+
+        for job_id in job_ids:
+            for sub_folder in (PENDING, CLAIMED, DONE):
+                try:
+                    os.remove(self._get_file_name(sub_folder=sub_folder, job_id=job_id))
+                except FileNotFoundError:
+                    pass
+
+
+def _touch_until_stopped(queue, job_id, heartbeat_interval, stop):
+    """ touches the file of a claimed job every heartbeat_interval seconds until stop is set
+    :param queue: (DirectoryQueue) queue of jobs
+    :param job_id: (string) id of the job
+    :param heartbeat_interval: (float) seconds
+    :param stop: (threading.Event) set when the job is done
+    """
+
+    while not stop.wait(heartbeat_interval):
+        queue.touch(job_id=job_id)
+
+
+def run_job(queue, heartbeat_interval=HEARTBEAT_INTERVAL):
+    """ takes a job from the queue, runs it, and stores its result in the queue
+    :param queue: (DirectoryQueue) queue of jobs
+    :param heartbeat_interval: (float) seconds between the touches of the file of the job while it runs
+    :return: (bool) True if a job was run and False if there was no pending job
+    """
+
+    job_id = queue.claim()
+    if job_id is None:
+        return False
+
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_touch_until_stopped, args=(queue, job_id, heartbeat_interval, stop),
+                                 daemon=True)
+    heartbeat.start()
+    try:
+        function, args = queue.get_job(job_id=job_id)
+        result, error = function(*args), None
+    except Exception as e:
+        result, error = None, '{} on {}: {!r}'.format(type(e).__name__, socket.gethostname(), e)
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    queue.complete(job_id=job_id, result=result, error=error)
+    return True
+
+
+def work(queue_folder, poll_interval=1, max_idle_time=None):
+    """ runs the jobs of a queue until there is no pending job for max_idle_time seconds
+    :param queue_folder: (string) folder of the queue
+    :param poll_interval: (float) seconds to wait before looking for new jobs when the queue is empty
+    :param max_idle_time: (float) seconds to wait for new jobs before stopping (if None, never stops)
+    """
+
+    queue = DirectoryQueue(folder=queue_folder)
+    idle_since = time.time()
+    while max_idle_time is None or time.time() - idle_since < max_idle_time:
+        if run_job(queue=queue):
+            idle_since = time.time()
+        else:
+            time.sleep(poll_interval)
+
+
+class QueuePool:
+    """ runs jobs on the workers of a queue (to be used as the session's pool, see worker_pool.get_pool) """
+
+    def __init__(self, queue, poll_interval=0.2, if_work_while_waiting=True, claim_timeout=CLAIM_TIMEOUT):
+        """
+        :param queue: (DirectoryQueue) queue of jobs
+        :param poll_interval: (float) seconds to wait between checking for the results of jobs
+        :param if_work_while_waiting: (bool) set to True to also run jobs of the queue in this process
+            while waiting for the results (so jobs are run even if no worker is running)
+        :param claim_timeout: (float) seconds after which a job whose worker has not touched its file
+            (see HEARTBEAT_INTERVAL) is returned to the pending jobs (if None, jobs are not returned)
+        """
+
+        self.queue = queue
+        self.pollInterval = poll_interval
+        self.ifWorkWhileWaiting = if_work_while_waiting
+        self.claimTimeout = claim_timeout
+
+    def starmap(self, func, iterable, chunksize=None):
+        """ runs func on each arguments of iterable on the workers of the queue
+        (jobs are taken by workers in the order of iterable; chunksize is not used)
+        :return: (list) of results in the order of iterable
+        """
+
+        job_ids = self.queue.publish(function=func, list_of_args=list(iterable))
+
+        results = dict()
+        while len(results) < len(job_ids):
+            for job_id in job_ids:
+                if job_id not in results:
+                    result = self.queue.get_result(job_id=job_id)
+                    if result is not None:
+                        results[job_id] = result
+
+            if len(results) < len(job_ids):
+                if not (self.ifWorkWhileWaiting and run_job(queue=self.queue)):
+                    time.sleep(self.pollInterval)
+                if self.claimTimeout is not None:
+                    self.queue.requeue_claimed(job_ids=[job_id for job_id in job_ids if job_id not in results],
+                                               claim_timeout=self.claimTimeout)
+
+        # remove what is left of these jobs (e.g. results of jobs that were returned to the pending jobs
+        # and run again)
+        self.queue.remove(job_ids=job_ids)
+
+        for job_id in job_ids:
+            error = results[job_id][1]
+            if error is not None:
+                raise JobError('Job {} failed: {}'.format(job_id, error))
+        return [results[job_id][0] for job_id in job_ids]
+
+    def close(self):
+        """ (as multiprocessing.Pool.close; workers of the queue keep running) """
+        pass
+
+    def join(self):
+        """ (as multiprocessing.Pool.join) """
+        pass
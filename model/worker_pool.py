@@ -0,0 +1,123 @@
+import atexit
+import copy
+import hashlib
+import multiprocessing as mp
+import os
+import pickle
+
+from model.work_queue import CLAIM_TIMEOUT, DirectoryQueue, QueuePool
+
+"""
+Pool of processes to simulate trajectories in parallel that is created once per session
+(the first time trajectories are simulated in parallel) and is shared by all configurations simulated in the session,
+so the cost of starting processes (and importing apacepy, deampy and scipy in them) is paid only once.
+If the environment variable GONO_WORK_QUEUE is set to the folder of a work queue, the session's pool
+sends the jobs to the workers of the queue instead (which may run on other hosts, see work_queue);
+jobs whose workers stop are returned to the queue after the seconds in the environment variable
+GONO_WORK_QUEUE_TIMEOUT (work_queue.CLAIM_TIMEOUT if not set).
+Each process keeps the template models it populates (keyed by the model settings they are populated with)
+so that a process populates the model of a configuration only once.
+Templates are populated with settings without the parameter values of seeds (see GonoSettings.paramValuesBySeed,
+which holds the values of thousands of seeds in calibrations), and each job is sent the values of its own seed.
+"""
+
+# maximum number of template models each process keeps
+MAX_TEMPLATES = 4
+# environment variable with the folder of the work queue to send jobs to (see work_queue)
+WORK_QUEUE_ENV = 'GONO_WORK_QUEUE'
+# environment variable with the claim timeout (seconds) of jobs of the work queue (see work_queue.QueuePool)
+WORK_QUEUE_TIMEOUT_ENV = 'GONO_WORK_QUEUE_TIMEOUT'
+
+# pool of this session (see get_pool)
+_pool = None
+# template models of this process keyed by get_template_key
+_templates = dict()
+
+
+def _preload_modules():
+    """ imports the modules needed to populate and simulate the model when a process starts """
+
+    import model.model_structure
+    import model.forked_scenarios
+    import model.template_epidemics
+
+
+def get_pool():
+    """
+    :return: (multiprocessing.Pool or QueuePool) pool of processes of this session
+    """
+
+    global _pool
+    if _pool is None:
+        queue_folder = os.environ.get(WORK_QUEUE_ENV, '')
+        if queue_folder != '':
+            claim_timeout = float(os.environ.get(WORK_QUEUE_TIMEOUT_ENV, CLAIM_TIMEOUT))
+            set_pool(pool=QueuePool(queue=DirectoryQueue(folder=queue_folder), claim_timeout=claim_timeout))
+        else:
+            set_pool(pool=mp.Pool(mp.cpu_count(), initializer=_preload_modules))
+    return _pool
+
+
+def set_pool(pool):
+    """ sets the pool of this session (the current pool is closed)
+    :param pool: pool with the starmap, close and join methods of multiprocessing.Pool (e.g. QueuePool)
+    """
+
+    global _pool
+    close_pool()
+    _pool = pool
+    atexit.register(close_pool)
+
+
+def close_pool():
+    """ closes the pool of processes of this session (a new pool is created if get_pool is called again) """
+
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool.join()
+        _pool = None
+
+
+def get_template_settings(model_settings):
+    """
+    :param model_settings: model settings
+    :return: a copy of model settings without the parameter values of seeds (to populate templates with)
+    """
+
+    settings = copy.copy(model_settings)
+    if hasattr(settings, 'paramValuesBySeed'):
+        settings.paramValuesBySeed = dict()
+    return settings
+
+
+def get_template_key(model_class, model_settings, function_to_populate_model):
+    """
+    :param model_class: (class) of the model (e.g. EpiModel)
+    :param model_settings: model settings
+    :param function_to_populate_model: function to build the epidemic model (should take 'model' as an argument)
+    :return: (string) key of the template model populated with these settings
+        (the parameter values of seeds are not part of the key, see get_template_settings)
+    """
+
+    return hashlib.sha256(pickle.dumps(
+        (model_class, get_template_settings(model_settings=model_settings), function_to_populate_model))).hexdigest()
+
+
+def get_template(key, model_class, model_settings, function_to_populate_model):
+    """
+    :param key: (string) key of the template model (see get_template_key)
+    :param model_class: (class) of the model (e.g. EpiModel)
+    :param model_settings: model settings
+    :param function_to_populate_model: function to build the epidemic model (should take 'model' as an argument)
+    :return: the template model of this process for these settings (populated only if not populated before)
+    """
+
+    if key not in _templates:
+        # remove the template populated first
+        if len(_templates) >= MAX_TEMPLATES:
+            del _templates[next(iter(_templates))]
+        model = model_class(id=0, settings=model_settings)
+        function_to_populate_model(model)
+        _templates[key] = model
+    return _templates[key]
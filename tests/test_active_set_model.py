@@ -0,0 +1,58 @@
+import os
+
+import pytest
+from apacepy.epidemic import EpiModel
+
+from model.active_set_model import ActiveSetEpiModel
+from model.model_settings import GonoSettings
+from model.model_structure import build_model
+
+SEEDS = [1, 2021, 720098724]
+
+
+def read_exported_trajectories(model_class, model_settings, seeds, folder):
+    """ simulates a model (populated once) for each seed and exports its trajectories
+    :return: (list) of the contents of the csv files exported for each seed """
+
+    model = model_class(id=0, settings=model_settings)
+    build_model(model)
+
+    contents = []
+    for seed in seeds:
+        model.simulate(seed=seed)
+        model.export_trajectories(folder=folder)
+        files = sorted(os.listdir(folder))
+        assert len(files) == 1
+        with open(os.path.join(folder, files[0])) as file:
+            contents.append(file.read())
+        model.reset()
+    return contents
+
+
+@pytest.mark.parametrize('if_m_available', [True, False])
+def test_trajectories_match_epi_model(if_m_available, tmp_path, monkeypatch):
+
+    # (trajectories are exported relative to the current folder)
+    monkeypatch.chdir(tmp_path)
+    sets = GonoSettings(if_m_available_for_1st_tx=if_m_available)
+
+    assert read_exported_trajectories(model_class=ActiveSetEpiModel, model_settings=sets, seeds=SEEDS,
+                                      folder='active-set') \
+        == read_exported_trajectories(model_class=EpiModel, model_settings=sets, seeds=SEEDS, folder='epi-model')
+
+
+def test_likelihoods_match_epi_model():
+
+    sets = GonoSettings(if_calibrating=True, collect_traj_of_comparts=False, if_m_available_for_1st_tx=True)
+
+    results = []
+    for model_class in (ActiveSetEpiModel, EpiModel):
+        model = model_class(id=0, settings=sets)
+        build_model(model)
+        results.append([])
+        for seed in SEEDS:
+            model.simulate(seed=seed)
+            results[-1].append((model.ifAFeasibleTraj, model.lnl))
+            model.reset()
+
+    assert results[0] == results[1]
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from apacepy.epidemic import EpiModel
+from apacepy.features_conditions import FeatureSurveillance
+
+from model.batch_simulator import BatchEpidemics
+from model.model_settings import GonoSettings
+from model.model_structure import build_model
+
+# surveyed % of cases CRO-NS over observation periods (nan if not surveyed)
+SURVEYED_PERC_CRO_NS = [0.01, 0.06, 0.03, np.nan, 0.02, 0.07, 0.08, 0.01, 0.05, 0.04]
+
+
+def get_switches_of_build_model(model_settings, surveyed):
+    """
+    :return: (list) of [CRO switch, M switch] after each decision of an EpiModel populated by build_model
+        when the surveyed % of cases CRO-NS takes the values in surveyed
+    """
+
+    model = EpiModel(id=0, settings=model_settings)
+    build_model(model)
+
+    time_monitor = model.epiHistory.timeMonitor
+    model.decisionMaker.initialize(delta_t=model_settings.deltaT, time_monitor=time_monitor)
+    time_monitor.reset()
+    model.decisionMaker.reset()
+
+    switches = []
+    for k, value in enumerate(surveyed):
+        # as EpiHistory.record_surveillance updates features and conditions
+        for f in model.epiHistory.features:
+            if isinstance(f, FeatureSurveillance):
+                f.value = None if np.isnan(value) else value
+            else:
+                f.update()
+        for c in model.epiHistory.conditions:
+            c.update()
+        model.decisionMaker.make_a_decision(sim_time_index=(k + 1) * model_settings.nDeltaTsInObsPeriod)
+        switches.append([i.switchValue for i in model.decisionMaker.interventions])
+    return switches
+
+
+def get_switches_of_batch(model_settings, surveyed):
+    """
+    :return: (list) of [CRO switch, M switch] after each decision of BatchEpidemics
+        when the surveyed % of cases CRO-NS takes the values in surveyed
+    """
+
+    batch = BatchEpidemics(model_settings=model_settings)
+    batch._initialize_decisions(n=1)
+    batch.surveyedRatios = {'Proportion of cases CRO-NS': []}
+
+    switches = []
+    for k, value in enumerate(surveyed):
+        batch.surveyedRatios['Proportion of cases CRO-NS'].append(np.array([value]))
+        batch._make_decisions(k=(k + 1) * model_settings.nDeltaTsInObsPeriod)
+        switches.append([int(batch.switchCRO[0]), int(batch.switchM[0])])
+    return switches
+
+
+@pytest.mark.parametrize('if_m_available', [True, False])
+def test_decisions_match_build_model(if_m_available):
+
+    sets = GonoSettings(if_m_available_for_1st_tx=if_m_available)
+    assert get_switches_of_batch(model_settings=sets, surveyed=SURVEYED_PERC_CRO_NS) \
+        == get_switches_of_build_model(model_settings=sets, surveyed=SURVEYED_PERC_CRO_NS)
@@ -0,0 +1,106 @@
+import apacepy.calibration as calib
+import numpy as np
+from numpy import iinfo, int32
+
+from model.calibration import CalibrationWithScreenedPriors, CalibrationWithSMC
+from model.model_settings import GonoSettings
+
+"""
+The mean-field model and the stochastic model are replaced by a toy model with one parameter
+('theta', uniform on [0, 1]) so that the weights of calibrations can be checked against known distributions.
+"""
+
+THRESHOLD_OF_MEAN_FIELD = 0.7  # mean-field trajectories are feasible if theta < this threshold
+POSTERIOR_MEAN, LIKELIHOOD_ST_DEV = 0.7, 0.01  # the likelihood of theta is normal
+
+
+class ToyScreenedPriors(CalibrationWithScreenedPriors):
+
+    def _sample_and_screen(self, size, rng):
+        seeds = rng.randint(0, iinfo(int32).max, size=size).tolist()
+        thetas = rng.random_sample(size=size)
+        return seeds, thetas < THRESHOLD_OF_MEAN_FIELD, [{'theta': theta} for theta in thetas]
+
+
+class ToySMC(CalibrationWithSMC):
+
+    def __init__(self, model_settings, **kwargs):
+        CalibrationWithSMC.__init__(self, model_settings=model_settings, **kwargs)
+        self.paramNames = ['theta']
+        self.lowerBounds, self.upperBounds = np.array([0.0]), np.array([1.0])
+
+    _sample_and_screen = ToyScreenedPriors._sample_and_screen
+
+    def _simulate_particles(self, function_to_populate_model, seeds, if_run_in_parallel):
+        thetas = np.array([[self.sets.paramValuesBySeed[seed]['theta']] for seed in seeds])
+        lnl = -0.5 * ((thetas[:, 0] - POSTERIOR_MEAN) / LIKELIHOOD_ST_DEV) ** 2
+        results = [calib.CalibResultOfATraj(epi_id=self.nSimulations + i, seed=seed, lnl=lnl[i], message='',
+                                            param_values=thetas[i].tolist())
+                   for i, seed in enumerate(seeds)]
+        self.nSimulations += len(seeds)
+        return results, thetas, -lnl
+
+
+def test_screening_selects_and_weights_draws():
+
+    calibration = ToyScreenedPriors(model_settings=GonoSettings(if_calibrating=True),
+                                    prob_simulating_screened_out=0.2)
+    seeds = calibration.screen_prior_draws(n=4000, initial_seed=1)
+
+    assert len(seeds) == 4000
+    assert calibration.nDrawsScreened == len(seeds) + calibration.nDrawsScreenedOut
+    assert calibration.sets.paramValuesBySeed == calibration.priorValuesBySeed
+
+    thetas = np.array([calibration.priorValuesBySeed[seed]['theta'] for seed in seeds])
+    probs = np.array([calibration.probsOfSimulatingBySeed[seed] for seed in seeds])
+    # draws with feasible mean-field trajectories are always simulated and the others with probability 0.2
+    assert np.all(probs[thetas < THRESHOLD_OF_MEAN_FIELD] == 1)
+    assert np.all(probs[thetas >= THRESHOLD_OF_MEAN_FIELD] == 0.2)
+    n_infeasible = calibration.nDrawsScreened - calibration.nFeasibleDraws
+    assert abs((thetas >= THRESHOLD_OF_MEAN_FIELD).sum() / n_infeasible - 0.2) < 0.02
+
+    # weighted by the inverse of the probability of simulating them, simulated draws follow the prior
+    weights = 1 / probs
+    assert abs(np.average(thetas, weights=weights) - 0.5) < 0.02
+    assert abs(np.average(thetas < 0.5, weights=weights) - 0.5) < 0.02
+
+
+def test_probabilities_are_divided_by_probabilities_of_simulating():
+
+    calibration = ToyScreenedPriors(model_settings=GonoSettings(if_calibrating=True),
+                                    prob_simulating_screened_out=0.25)
+    calibration.probsOfSimulatingBySeed = {1: 1, 2: 0.25, 3: 0.25}
+    calibration.calibResultsOfTrajs = [
+        calib.CalibResultOfATraj(epi_id=0, seed=1, lnl=np.log(0.5), message=''),
+        calib.CalibResultOfATraj(epi_id=1, seed=2, lnl=np.log(0.25), message=''),
+        calib.CalibResultOfATraj(epi_id=2, seed=3, lnl=float('-inf'), message='')]
+    calibration._calculate_probs()
+
+    assert np.allclose([r.prob for r in calibration.calibResultsOfTrajs], [1 / 3, 2 / 3, 0])
+    assert calibration.nTrajsWithNonZeroProb == 2
+
+
+def test_smc_approximates_posterior_with_a_larger_effective_sample_size():
+
+    calibration = ToySMC(model_settings=GonoSettings(if_calibrating=True), n_populations=8,
+                         prob_simulating_screened_out=0.1)
+    calibration.run(function_to_populate_model=None, num_of_iterations=200, initial_seed=1,
+                    if_run_in_parallel=False)
+
+    # all simulated particles are weighted
+    assert len(calibration.calibResultsOfTrajs) == calibration.nSimulations
+    thetas = np.array([r.paramValues[0] for r in calibration.calibResultsOfTrajs])
+    probs = np.array([r.prob for r in calibration.calibResultsOfTrajs])
+    assert abs(probs.sum() - 1) < 1e-9
+
+    # the posterior is normal (as the prior is uniform and the likelihood is normal)
+    assert abs(np.average(thetas, weights=probs) - POSTERIOR_MEAN) < 0.2 * LIKELIHOOD_ST_DEV
+    assert abs(np.sqrt(np.average((thetas - POSTERIOR_MEAN) ** 2, weights=probs)) - LIKELIHOOD_ST_DEV) \
+        < 0.2 * LIKELIHOOD_ST_DEV
+    assert abs(np.average(thetas < POSTERIOR_MEAN, weights=probs) - 0.5) < 0.1
+
+    # random sampling with the same number of simulations
+    thetas = np.random.RandomState(1).random_sample(size=calibration.nSimulations)
+    w = np.exp(-0.5 * ((thetas - POSTERIOR_MEAN) / LIKELIHOOD_ST_DEV) ** 2)
+    ess_of_random_sampling = w.sum() ** 2 / (w ** 2).sum()
+    assert calibration.effectiveSampleSize > 5 * ess_of_random_sampling
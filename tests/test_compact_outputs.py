@@ -0,0 +1,37 @@
+from apacepy.multi_epidemics import MultiEpidemicsOutputs
+
+import model.compact_outputs as compact_outputs
+from model.compact_outputs import get_batch_id, pack_outputs, unpack_results
+
+N_BATCHES = 50
+
+
+def get_outputs(epi_id):
+    """
+    :return: (MultiEpidemicsOutputs) outputs of a trajectory
+    """
+
+    outputs = MultiEpidemicsOutputs()
+    outputs.ids.append(epi_id)
+    outputs.seeds.append(100 + epi_id)
+    outputs.ifFeasible.append(True)
+    outputs.runTimes.append(0.5)
+    outputs.lnL.append(None)
+    outputs.dictOfProjectedOutcomes = {'Rate of cases': [0.01 * epi_id], 'Duration of M': [None]}
+    outputs.dictParameterValues = {'Transmission': [1.5], 'Fitness': [[0.9, 0.8]]}
+    return outputs
+
+
+def test_layouts_are_sent_once_per_batch_and_not_kept_for_past_batches():
+
+    for b in range(N_BATCHES):
+        batch_id = get_batch_id()
+        results = [pack_outputs(outputs=get_outputs(epi_id=i), batch_id=batch_id) for i in range(3)]
+
+        # the layout is only sent with the first outputs of each batch
+        assert [r.layout is not None for r in results] == [True, False, False]
+        for i, outputs in enumerate(unpack_results(results=results)):
+            assert vars(outputs) == vars(get_outputs(epi_id=i))
+
+    # the layouts sent for past batches are not kept
+    assert len(compact_outputs._sentLayouts) == 1
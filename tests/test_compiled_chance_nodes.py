@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+from apacepy.epidemic import EpiModel
+from numpy import iinfo, int32
+from numpy.random import RandomState
+
+from definitions import END_OF_WARM_UP
+from model.batch_simulator import get_entry_and_counted_nodes, compile_chance_nodes, N_ENTRIES
+from model.model_parameters import BatchParameters
+from model.model_settings import GonoSettings
+from model.model_structure import build_model
+
+SEEDS = [0, 1, 2]
+# epidemic times of the time-steps (before and after the rapid test becomes available)
+TIMES = [0, END_OF_WARM_UP - 0.5, END_OF_WARM_UP, END_OF_WARM_UP + 0.5]
+MAX_N_IN = 1000  # maximum number of members entering each entry node over a time-step
+
+
+class ExpectedDraws:
+    """ replaces the draws of chance nodes by their expected values """
+
+    @staticmethod
+    def binomial(n, p):
+        return n * p
+
+    @staticmethod
+    def multinomial(n, pvals):
+        return n * np.asarray(pvals)
+
+
+def get_settings():
+    """
+    :return: (GonoSettings) model settings with a rapid test (so every branch of chance nodes is taken)
+    """
+
+    sets = GonoSettings()
+    sets.update_settings(cip_sens=0.9, cip_spec=0.95, tet_sens=0.8, tet_spec=0.9, prob_rapid_test=0.5)
+    return sets
+
+
+def get_history_of_chance_nodes(model_settings, seed, n_in_by_time):
+    """
+    :return: (tuple) of sizes of compartments and the incidence of counted nodes at each time-step when
+        n_in_by_time members enter the entry nodes of an EpiModel populated by build_model (with parameters
+        sampled for the seed) and move through its chance nodes
+    """
+
+    model = EpiModel(id=0, settings=model_settings)
+    build_model(model)
+    entry_nodes, counted_nodes = get_entry_and_counted_nodes(model=model)
+
+    # (as EpiModel, which draws the seed of its noise generator before sampling the parameters)
+    rng = RandomState(seed=seed)
+    rng.randint(0, iinfo(int32).max)
+    model.params.sample_parameters(rng=rng, time=0)
+    model.params.list_time_dependent_params()
+    model.rng = ExpectedDraws()
+
+    sizes, incidences = [], []
+    for time, n_in in zip(TIMES, n_in_by_time):
+        model.params.update_time_dependent_params(rng=rng, time=time)
+        # (as EpiModel.process_end_of_sim_delta_t)
+        for c in model.chanceNodes:
+            c.n_past_delta_t_incoming = 0
+        for node, n in zip(entry_nodes, n_in):
+            node.n_delta_t_incoming += n
+            node.receive_delta_t_incoming()
+        while any(c.size > 0 for c in model.chanceNodes):
+            model._push_members_forward(nodes=model.chanceNodes)
+
+        sizes.append([c.size for c in model.compartments])
+        incidences.append([c.n_past_delta_t_incoming for c in counted_nodes])
+    return np.array(sizes), np.array(incidences)
+
+
+def get_history_of_compiled_chance_nodes(model_settings, seed, n_in_by_time):
+    """
+    :return: (tuple) of sizes of compartments and the incidence of counted nodes at each time-step when
+        n_in_by_time members enter the entry nodes of the compiled chance nodes (with parameters sampled
+        for the seed)
+    """
+
+    model = EpiModel(id=0, settings=model_settings)
+    build_model(model)
+    chance_nodes = compile_chance_nodes(model=model)
+    params = BatchParameters(model_sets=model_settings, seeds=[seed])
+
+    sizes, incidences = [], []
+    size = np.zeros(chance_nodes.nComparts)
+    for time, n_in in zip(TIMES, n_in_by_time):
+        probs = chance_nodes.get_probs(
+            n=1, get_param_values=lambda attr: params.get_param_values(attr=attr, time=time))
+        to_comparts, to_nodes = chance_nodes.get_expected_transfers(probs=probs)
+        size = size + n_in @ to_comparts[0]
+        sizes.append(size)
+        incidences.append(n_in @ to_nodes[0])
+    return np.array(sizes), np.array(incidences)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_compiled_chance_nodes_match_chain_of_chance_nodes(seed):
+
+    sets = get_settings()
+    n_in_by_time = RandomState(seed).randint(0, MAX_N_IN, size=(len(TIMES), N_ENTRIES)).astype(float)
+
+    sizes, incidences = get_history_of_chance_nodes(model_settings=sets, seed=seed, n_in_by_time=n_in_by_time)
+    compiled_sizes, compiled_incidences = get_history_of_compiled_chance_nodes(
+        model_settings=sets, seed=seed, n_in_by_time=n_in_by_time)
+
+    assert np.allclose(compiled_sizes, sizes)
+    assert np.allclose(compiled_incidences, incidences)
@@ -0,0 +1,26 @@
+import os
+
+import definitions
+from definitions import RUN_ROOT_ENV, get_run_path, set_run_root
+
+
+def test_run_root_does_not_change_with_current_folder(tmp_path, monkeypatch):
+
+    monkeypatch.setenv(RUN_ROOT_ENV, '')
+    monkeypatch.setattr(definitions, '_runRoot', None)
+    (tmp_path / 'analysis').mkdir()
+    monkeypatch.chdir(tmp_path / 'analysis')
+
+    set_run_root(run_root=str(tmp_path / 'run'))
+    path = get_run_path('outputs/summary')
+    assert not os.path.isabs(path)
+    assert os.path.abspath(path) == str(tmp_path / 'run' / 'outputs' / 'summary')
+
+    monkeypatch.chdir(tmp_path)
+    assert get_run_path('outputs/summary') == path
+
+    # a root set as an absolute path in the environment is also resolved once
+    monkeypatch.setenv(RUN_ROOT_ENV, str(tmp_path / 'other-run'))
+    path = get_run_path('outputs/summary')
+    monkeypatch.chdir(tmp_path / 'analysis')
+    assert get_run_path('outputs/summary') == path == os.path.join('other-run', 'outputs', 'summary')
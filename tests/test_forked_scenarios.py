@@ -0,0 +1,101 @@
+import pytest
+from apacepy.scenario_simulation import ScenarioSimulator
+from deampy.support.simulation import SeedGenerator
+from numpy.random import RandomState
+
+from model.forked_scenarios import ForkedScenarioSimulator
+from model.model_settings import GonoSettings
+from model.model_structure import build_model
+
+SEEDS = [1, 2021]
+VAR_NAMES = ['CIP-sens', 'CIP-spec', 'TET-sens', 'TET-spec', 'rapid test coverage', 'transmission factor']
+# status quo, a rapid test (forked from the snapshot of the status quo), and a scenario with a different
+# transmission factor (forked from its own snapshot)
+SCENARIO_NAMES = ['Status quo', 'Rapid test', 'Rapid test (higher transmission)']
+SCENARIO_DEFINITIONS = [[0.0, 1.0, 0.0, 1.0, 0.0, 1.0],
+                        [None, None, None, None, 0.5, 1.0],
+                        [None, None, None, None, 0.5, 1.1]]
+EXTENDED_SIM_DURATION = 35  # years
+
+
+def get_results_of_scenario_simulator(sim_duration):
+    """
+    :return: (dictionary) of results of ScenarioSimulator (without run times)
+        for scenarios simulated from time 0 for a simulation duration
+    """
+
+    sets = GonoSettings(sim_duration=sim_duration)
+    sets.exportTrajectories = False
+    simulator = ScenarioSimulator(model_settings=sets, scenario_names=SCENARIO_NAMES, variable_names=VAR_NAMES,
+                                  scenario_definitions=SCENARIO_DEFINITIONS)
+    simulator.simulate(function_to_populate_model=build_model, num_of_sims=len(SEEDS), seeds=SEEDS,
+                       sample_seeds_by_weights=False)
+    return without_run_times(simulator.results)
+
+
+def get_forked_simulator(extended_sim_durations=None):
+    """
+    :return: (ForkedScenarioSimulator) simulator after simulating the scenarios
+    """
+
+    sets = GonoSettings()
+    sets.exportTrajectories = False
+    simulator = ForkedScenarioSimulator(model_settings=sets, scenario_names=SCENARIO_NAMES,
+                                        variable_names=VAR_NAMES, scenario_definitions=SCENARIO_DEFINITIONS)
+    simulator.simulate(function_to_populate_model=build_model, num_of_sims=len(SEEDS), seeds=SEEDS,
+                       sample_seeds_by_weights=False, extended_sim_durations=extended_sim_durations)
+    return simulator
+
+
+def without_run_times(results):
+    """
+    :return: (dictionary) of columns of results without the run times of trajectories
+    """
+
+    return {key: value for key, value in results.items() if key != 'Run time'}
+
+
+def test_forked_scenarios_match_scenario_simulator(tmp_path, monkeypatch):
+
+    # (apacepy deletes trajectories relative to the current folder)
+    monkeypatch.chdir(tmp_path)
+    simulator = get_forked_simulator()
+
+    assert without_run_times(simulator.results) \
+        == get_results_of_scenario_simulator(sim_duration=GonoSettings().simulationDuration)
+
+
+def test_extended_scenarios_match_longer_simulation(tmp_path, monkeypatch, capsys):
+
+    monkeypatch.chdir(tmp_path)
+    # trajectories continued from the end of the simulation duration of model settings
+    # are the same as trajectories simulated from time 0 for the extended simulation duration
+    simulator = get_forked_simulator(extended_sim_durations=[EXTENDED_SIM_DURATION])
+
+    assert without_run_times(simulator.extendedResults[EXTENDED_SIM_DURATION]) \
+        == get_results_of_scenario_simulator(sim_duration=EXTENDED_SIM_DURATION)
+    # (the summary statistics are not printed)
+    assert 'Simulation duration of' not in capsys.readouterr().out
+
+
+def test_jobs_do_not_change_model_settings():
+
+    sets = GonoSettings()
+    settings_before = dict(vars(sets))
+    simulator = ForkedScenarioSimulator(model_settings=sets, scenario_names=SCENARIO_NAMES,
+                                        variable_names=VAR_NAMES, scenario_definitions=SCENARIO_DEFINITIONS)
+    jobs = simulator.get_jobs(function_to_populate_model=build_model, num_of_sims=3, initial_seed=5)
+
+    assert vars(sets) == settings_before
+    # seeds are generated from the initial seed
+    assert [job.args[5] for job in jobs if job.scenarioIndices[0] == 0] \
+        == SeedGenerator(seeds=None, weights=None).next_seeds(n=3, rng=RandomState(5))
+
+
+def test_scenarios_must_match_arguments_of_update_settings():
+
+    simulator = ForkedScenarioSimulator(model_settings=GonoSettings(), scenario_names=SCENARIO_NAMES,
+                                        variable_names=VAR_NAMES[:-1],
+                                        scenario_definitions=[s[:-1] for s in SCENARIO_DEFINITIONS])
+    with pytest.raises(ValueError):
+        simulator.get_jobs(function_to_populate_model=build_model)
@@ -0,0 +1,93 @@
+import numpy as np
+from scipy.stats import ks_2samp
+
+import model.hybrid_simulator as hybrid
+from model.batch_simulator import BatchEpidemics, N_COMPARTS, N_REST_PROFILES, N_STRATA, IDX_S, IDX_IS, IDX_FS
+from model.hybrid_simulator import HybridEpidemics
+from model.model_settings import GonoSettings
+
+N = 200  # number of trajectories to compare the projected outcomes of the hybrid and the stochastic models
+N_ROUNDINGS = 2000  # number of times compartments of rare profiles are rounded
+MIN_P_VALUE = 0.001  # of the Kolmogorov-Smirnov test of the equality of the distributions of an outcome
+
+# compartments of a common profile (0) and of a rare profile (1) with fractions of members
+SIZES = {IDX_IS.start: 120.4, IDX_IS.start + 1: 2.3, IDX_IS.start + 1 + N_REST_PROFILES: 0.4,
+         IDX_FS.start + 1: 1.6}
+
+
+def get_hybrid(n, initial_seed=0):
+    """
+    :return: (HybridEpidemics) that simulated n trajectories
+    """
+
+    hybrid_epidemics = HybridEpidemics(model_settings=GonoSettings())
+    hybrid_epidemics.simulate(n=n, initial_seed=initial_seed, if_export_trajs=False)
+    return hybrid_epidemics
+
+
+def test_population_size_is_conserved():
+
+    hybrid_epidemics = get_hybrid(n=20)
+
+    pop_sizes = np.array([comparts.sum(axis=1) for comparts in hybrid_epidemics.comparts])
+    assert np.allclose(pop_sizes, pop_sizes[0], rtol=0, atol=1e-6)
+
+
+def test_compartments_of_profiles_that_become_rare_are_rounded(monkeypatch):
+
+    hybrid_epidemics = get_hybrid(n=2)
+    # (only the switch between rare and common profiles is tested)
+    monkeypatch.setattr(BatchEpidemics, '_update_compartments', lambda self, k: None)
+
+    sizes = np.zeros((2, N_COMPARTS))
+    sizes[:, IDX_S] = 1000
+    for idx, size in SIZES.items():
+        sizes[:, idx] = size
+
+    rounded = []
+    for i in range(N_ROUNDINGS):
+        hybrid_epidemics.sizes = sizes.copy()
+        hybrid_epidemics._update_compartments(k=0)
+        rounded.append(hybrid_epidemics.sizes.copy())
+    rounded = np.array(rounded)
+
+    assert not hybrid_epidemics.ifRare[:, 0].any() and hybrid_epidemics.ifRare[:, 1:].all()
+    # the common profile is not rounded
+    assert np.all(rounded[..., IDX_IS.start] == SIZES[IDX_IS.start])
+    # the rare profile holds whole numbers of members, each rounded up with probability equal to its fraction
+    infected = np.concatenate((rounded[..., IDX_IS], rounded[..., IDX_FS]), axis=-1)
+    rare = np.tile(np.arange(N_STRATA) % N_REST_PROFILES != 0, 2)
+    assert np.all(infected[..., rare] == np.round(infected[..., rare]))
+    assert np.allclose(rounded.mean(axis=(0, 1)), sizes[0], atol=0.05)
+    # and the population size is kept
+    assert np.allclose(rounded.sum(axis=-1), sizes.sum(axis=-1))
+
+
+def test_infections_by_rare_profiles_do_not_exceed_susceptible():
+
+    hybrid_epidemics = get_hybrid(n=2)
+    hybrid_epidemics.ifRare = np.ones((2, N_REST_PROFILES), dtype=bool)
+
+    # (almost every susceptible member is infected over a time-step)
+    infections = hybrid_epidemics._sample_infections(
+        n_susceptible=np.array([10., 1000.]), rates=np.full((2, N_REST_PROFILES), 1000.))
+    assert np.array_equal(infections.sum(axis=1), [10, 1000])
+
+
+def test_projected_outcomes_match_batch_when_all_profiles_are_rare(monkeypatch):
+
+    monkeypatch.setattr(hybrid, 'MIN_SIZE_OF_COMMON_PROFILE', np.inf)
+    hybrid_outcomes = get_hybrid(n=N, initial_seed=1).dictOfProjectedOutcomes
+    batch = BatchEpidemics(model_settings=GonoSettings())
+    batch.simulate(n=N, initial_seed=2, if_export_trajs=False)
+
+    different = []
+    for key, values in batch.dictOfProjectedOutcomes.items():
+        values = np.array(values, dtype=float)
+        hybrid_values = np.array(hybrid_outcomes[key], dtype=float)
+        # (trajectories where an outcome is not defined are excluded)
+        p_value = ks_2samp(values[~np.isnan(values)], hybrid_values[~np.isnan(hybrid_values)]).pvalue
+        if p_value < MIN_P_VALUE:
+            different.append(key)
+
+    assert different == []
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from model.batch_simulator import BatchEpidemics
+from model.mean_field_simulator import MeanFieldEpidemics
+from model.model_parameters import BatchParameters
+from model.model_settings import GonoSettings
+
+N = 2000  # number of stochastic trajectories (with the same parameter values) to average
+N_DELTA_TS = 13  # number of simulation time-steps
+MAX_Z = 4.5  # maximum difference between the means of the two models (in standard errors of the stochastic mean)
+
+
+def get_state(epidemics_class, model_settings, seed, n):
+    """
+    :return: (tuple) of compartment sizes and incidences of counted nodes of n trajectories (simulated
+        with the parameters sampled for the seed) after N_DELTA_TS time-steps
+    """
+
+    epidemics = epidemics_class(model_settings=model_settings)
+    epidemics.rng = np.random.default_rng(seed)
+    epidemics.params = BatchParameters(model_sets=model_settings, seeds=[seed] * n)
+    epidemics._initialize()
+    for k in range(N_DELTA_TS):
+        epidemics._update_compartments(k=k)
+    return epidemics.sizes, epidemics.nodeIncidence
+
+
+@pytest.mark.parametrize('seed', [1, 2])
+def test_mean_field_matches_means_of_stochastic_batch(seed):
+
+    sets = GonoSettings()
+    for sizes, mean_field_sizes in zip(
+            get_state(epidemics_class=BatchEpidemics, model_settings=sets, seed=seed, n=N),
+            get_state(epidemics_class=MeanFieldEpidemics, model_settings=sets, seed=seed, n=1)):
+        # (of at least one member over the N trajectories, for events that are too rare to be sampled)
+        st_err = np.maximum(sizes.std(axis=0) / np.sqrt(N), 1 / N)
+        assert np.all(np.abs(sizes.mean(axis=0) - mean_field_sizes[0]) <= MAX_Z * st_err)
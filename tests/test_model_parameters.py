@@ -0,0 +1,98 @@
+import numpy as np
+from apacepy.inputs import EpiParameters
+from numpy import iinfo, int32
+from numpy.random import RandomState
+from scipy.stats import ks_2samp
+
+from model.model_parameters import Parameters, ParameterDraws, _get_time_of_last_update
+from model.model_settings import GonoSettings
+
+N_DRAWS = 2000  # number of draws sampled together
+N_SEEDS = 500  # number of draws sampled seed by seed
+MIN_P_VALUE = 0.001  # of the Kolmogorov-Smirnov test of the equality of the distributions of a parameter
+
+
+def sample_parameters(model_sets, rng, fixed_values=None):
+    """
+    :return: (dictionary) of the values of parameters (keyed as the columns of parameter_values.csv)
+        sampled as EpiModel samples them and reported at the time of the last update of time-dependent parameters
+    """
+
+    params = Parameters(model_sets=model_sets)
+    params.fixedValues = dict() if fixed_values is None else fixed_values
+    params.sample_parameters(rng=rng, time=0)
+    params.list_time_dependent_params()
+    params.update_time_dependent_params(rng=rng, time=_get_time_of_last_update(model_sets=model_sets))
+    return params.get_dic_of_parameter_samples()
+
+
+def test_draws_have_the_distributions_of_parameters_sampled_by_seed():
+
+    sets = GonoSettings()
+    draws = ParameterDraws(model_sets=sets, n=N_DRAWS, rng=RandomState(1))
+
+    values_by_seed = []
+    for seed in range(N_SEEDS):
+        # (as EpiModel, which draws the seed of its noise generator before sampling the parameters)
+        rng = RandomState(seed=seed)
+        rng.randint(0, iinfo(int32).max)
+        values_by_seed.append(sample_parameters(model_sets=sets, rng=rng))
+
+    assert set(draws.values.dtype.names) == set(values_by_seed[0])
+    different = []
+    for name in draws.priorNames:
+        if draws.values[name].ndim > 1:
+            continue
+        p_value = ks_2samp(draws.values[name], [values[name] for values in values_by_seed]).pvalue
+        if p_value < MIN_P_VALUE:
+            different.append(name)
+    assert different == []
+
+
+def test_dependent_parameters_match_parameters_sampled_with_the_same_priors():
+
+    sets = GonoSettings()
+    draws = ParameterDraws(model_sets=sets, n=3, rng=RandomState(1))
+
+    for i in range(draws.nDraws):
+        values = sample_parameters(model_sets=sets, rng=RandomState(seed=i), fixed_values=draws.get_prior_values(i=i))
+        for name, value in values.items():
+            assert np.allclose(draws.values[name][i], value), name
+
+
+def get_time_dependent_values(params):
+    """
+    :return: (list) of the values of the tabulated time-dependent parameters
+        (relative infectivity, infectivity, and probability of receiving a rapid test)
+    """
+
+    return [par.value for par in params.ratioInf + params.infectivityByRestProfile + [params.probRapidTest]]
+
+
+def test_tabulated_parameters_match_sampled_time_dependent_parameters(monkeypatch):
+
+    sets = GonoSettings()
+    params = Parameters(model_sets=sets)
+    params.sample_parameters(rng=RandomState(1), time=0)
+    params.list_time_dependent_params()
+    n = params.nDeltaTs
+
+    # time indices before, during and after the warm-up period, and past the end of the tables
+    time_indices = [0, 1, n // 3, n // 2, n - 1, n, n + 1, 3 * n]
+    # (times with a rounding error are on the time grid)
+    times = [k * sets.deltaT for k in time_indices] + [sum([sets.deltaT] * (n // 2))]
+    assert times[-1] != time_indices[3] * sets.deltaT
+
+    # tabulated parameters are read from their tables (extended for times past the end of the simulation)
+    def sample_all_params(self, rng, time):
+        raise AssertionError('Time {} is not read from the tables.'.format(time))
+    monkeypatch.setattr(EpiParameters, 'update_time_dependent_params', sample_all_params)
+    tabulated_values = []
+    for time in times:
+        params.update_time_dependent_params(rng=RandomState(1), time=time)
+        tabulated_values.append(get_time_dependent_values(params=params))
+    monkeypatch.undo()
+
+    for time, values in zip(times, tabulated_values):
+        EpiParameters.update_time_dependent_params(params, rng=RandomState(1), time=time)
+        assert np.allclose(values, get_time_dependent_values(params=params)), time
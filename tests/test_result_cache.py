@@ -0,0 +1,27 @@
+import os
+
+from model.model_settings import GonoSettings
+from model.result_cache import ScenarioResultCache
+
+
+def test_file_deleted_by_another_run_is_a_cache_miss(tmp_path):
+
+    cache = ScenarioResultCache(folder=str(tmp_path))
+    keys = cache.get_keys(model_settings=GonoSettings(), scenario_definition=[0.5], seeds=[1, 2])
+    for key in keys:
+        cache.put(key=key, outputs={'key': key})
+    assert cache.get(key=keys[0]) == {'key': keys[0]}
+
+    # another run sharing the folder deletes a file, and a file is left unreadable
+    ScenarioResultCache(folder=str(tmp_path), max_size=0).evict()
+    os.makedirs(os.path.dirname(cache._get_file_name(key=keys[1])), exist_ok=True)
+    with open(cache._get_file_name(key=keys[1]), 'wb') as file:
+        file.write(b'\x80')
+
+    assert cache.get(key=keys[0]) is None
+    assert cache.get(key=keys[1]) is None
+    assert cache.files == dict()
+
+    # the cells are stored again
+    cache.put(key=keys[0], outputs={'key': keys[0]})
+    assert cache.get(key=keys[0]) == {'key': keys[0]}
@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+
+from model.forked_scenarios import ForkedScenarioSimulator
+from model.model_settings import GonoSettings
+from model.model_structure import build_model
+from model.scenario_scheduler import RunTimeRecords, ScenarioScheduler
+from tests.test_forked_scenarios import SEEDS, VAR_NAMES, SCENARIO_NAMES, SCENARIO_DEFINITIONS
+
+KEY = ('scenarios', 'Status quo', 25)
+
+
+def test_run_times_of_concurrent_runs_are_merged(tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+    file_name = 'outputs/scenario-run-times.csv'
+    previous = RunTimeRecords(file_name=file_name)
+    previous.add(*KEY, run_time=1)
+    previous.save()
+
+    # two runs read the file before either saves its run times
+    runs = [RunTimeRecords(file_name=file_name), RunTimeRecords(file_name=file_name)]
+    runs[0].add(*KEY, run_time=2)
+    runs[1].add(*KEY, run_time=3)
+    runs[1].add(folder='scenarios', scenario_name='Rapid test', sim_duration=25, run_time=4)
+    for run in runs:
+        run.save()
+
+    records = RunTimeRecords(file_name=file_name)
+    assert records.records == {KEY: (2, 3), ('scenarios', 'Rapid test', 25): (4, 1)}
+    assert not (tmp_path / 'outputs' / 'scenario-run-times.csv.lock').exists()
+
+
+def test_run_times_of_forks_exclude_the_snapshot(tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+    sets = GonoSettings()
+    sets.exportTrajectories = False
+    simulator = ForkedScenarioSimulator(model_settings=sets, scenario_names=SCENARIO_NAMES[:2],
+                                        variable_names=VAR_NAMES, scenario_definitions=SCENARIO_DEFINITIONS[:2])
+    scheduler = ScenarioScheduler(run_times_file='scenario-run-times.csv')
+    scheduler.add(simulator=simulator, function_to_populate_model=build_model, num_of_sims=1, seeds=SEEDS[:1],
+                  sample_seeds_by_weights=False)
+    scheduler.simulate(if_run_in_parallel=False)
+
+    # the run time of each scenario in the results includes the run time of the snapshot (which is shared by
+    # the two scenarios) and the recorded run times do not
+    snapshot_run_times = []
+    for name, run_time in zip(simulator.results['Scenarios'], simulator.results['Run time']):
+        recorded = scheduler.runTimes.get(folder=os.path.relpath(sets.folderToSaveScenarioAnalysis),
+                                          scenario_name=name, sim_duration=sets.simulationDuration)
+        snapshot_run_times.append(run_time - recorded)
+    assert snapshot_run_times[0] > 0 and np.isclose(snapshot_run_times[0], snapshot_run_times[1])
@@ -0,0 +1,57 @@
+import warnings
+
+import apacepy.analysis.scenarios as scen
+from deampy.in_out_functions import write_dictionary_to_csv
+
+from model.scenario_stats import ScenarioStats
+
+SCENARIO_NAMES = ['Status quo', 'Rapid test', 'Rapid test (no coverage)']
+# realizations of outcomes of each scenario (the 2nd outcome has a realization of 0 in the base scenario
+# and the 3rd has a realization that is not a number)
+OUTCOMES = {
+    'Rate': [[0.012, 0.015, 0.011, 0.02], [0.01, 0.016, 0.009, 0.018], [0.012, 0.015, 0.011, 0.02]],
+    'Proportion S': [[0.5, 0, 0.25, 0.75], [0.6, 0.1, 0.2, 0.8], [0.5, 0, 0.25, 0.75]],
+    'Life': [[10, 12, float('nan'), 11], [11, 13, 9, 12], [10, 12, 8, 11]],
+}
+FORMATS = [dict(deci=0, multiplier=100000, form=','), dict(deci=1, form='%'), dict(deci=1, multiplier=25)]
+
+
+def get_scenarios_df():
+    """
+    :return: (ScenarioDataFrame) of scenarios with OUTCOMES read from a csv file
+    """
+
+    n = len(OUTCOMES['Rate'][0])
+    dictionary = {'Scenarios': [name for name in SCENARIO_NAMES for i in range(n)],
+                  'rapid test coverage': [i * 0.5 for i in range(len(SCENARIO_NAMES)) for j in range(n)],
+                  'ID': list(range(n)) * len(SCENARIO_NAMES)}
+    for name, values in OUTCOMES.items():
+        dictionary[name] = [value for values_of_scenario in values for value in values_of_scenario]
+
+    write_dictionary_to_csv(dictionary=dictionary, file_name='simulated_scenarios.csv')
+    return scen.ScenarioDataFrame(csv_file_name='simulated_scenarios.csv')
+
+
+def test_formatted_estimates_match_scenario_dataframe(tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+    scenarios_df = get_scenarios_df()
+    stats = ScenarioStats(scenarios_df=scenarios_df, outcome_names=list(OUTCOMES))
+
+    with warnings.catch_warnings():
+        # (deampy warns about the realization of 0 in the base scenario)
+        warnings.simplefilter('ignore')
+        for outcome_name in OUTCOMES:
+            for scenario_name in SCENARIO_NAMES:
+                for f in FORMATS:
+                    assert stats.get_formatted_mean_and_interval(
+                        scenario_name=scenario_name, outcome_name=outcome_name, **f) == \
+                        scenarios_df.get_mean_interval(
+                            scenario_name=scenario_name, outcome_name=outcome_name, interval_type='p', **f)
+
+                assert stats.get_formatted_relative_diff(
+                    scenario_name_base=SCENARIO_NAMES[0], scenario_name=scenario_name,
+                    outcome_name=outcome_name, deci=1, form='%') == \
+                    scenarios_df.get_relative_diff_mean_interval(
+                        scenario_name_base=SCENARIO_NAMES[0], scenario_names=scenario_name,
+                        outcome_name=outcome_name, deci=1, form='%')
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from deampy.in_out_functions import write_dictionary_to_csv
+from numpy.random import RandomState
+
+from model.scenario_store import get_scenarios_df
+from model.streaming_stats import StreamingOutputs, StreamingStat
+
+BUFFER_SIZE = 100
+ALPHA = 0.1
+
+
+def get_stat(n):
+    """
+    :return: (StreamingStat) of n observations (with percentiles of ALPHA) and the observations
+    """
+
+    obss = RandomState(1).normal(size=n)
+    stat = StreamingStat(name='x', buffer_size=BUFFER_SIZE, alpha=ALPHA)
+    for obs in obss:
+        stat.record(obs=obs)
+    return stat, obss
+
+
+@pytest.mark.parametrize('n', [BUFFER_SIZE, 20 * BUFFER_SIZE])
+def test_percentile_interval_of_alpha_of_stat(n):
+
+    stat, obss = get_stat(n=n)
+    pi = stat.get_PI(alpha=ALPHA)
+    assert np.allclose(pi, np.percentile(obss, [100 * ALPHA / 2, 100 * (1 - ALPHA / 2)]), atol=0.1)
+
+    # percentiles of other significance levels are refused whatever the number of observations
+    with pytest.raises(ValueError):
+        stat.get_PI(alpha=0.05)
+
+
+def test_summary_of_streaming_mode_is_not_read_as_scenarios(tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+    write_dictionary_to_csv(dictionary={'Scenarios': ['Status quo']} | StreamingOutputs().get_dict_of_summary(),
+                            file_name='simulated_scenarios.csv')
+
+    with pytest.raises(ValueError):
+        get_scenarios_df(csv_file_name='simulated_scenarios.csv')
@@ -0,0 +1,67 @@
+import numpy as np
+from apacepy.multi_epidemics import MultiEpidemicsOutputs
+
+from model.active_set_model import ActiveSetEpiModel
+from model.model_settings import GonoSettings
+from model.model_structure import build_model
+from model.tau_leaping_model import TauLeapingEpiModel, if_equivalent
+from tests.test_active_set_model import SEEDS, read_exported_trajectories
+
+N = 40  # number of trajectories to compare the projected outcomes of the two models
+ALPHA = 0.05  # significance level of the equivalence test
+# margins of equivalence of the means of projected outcomes
+RATE_MARGIN = 0.15  # relative to the mean of the fixed time-step model
+PROPORTION_MARGIN = 0.05  # absolute
+
+
+def get_projected_outcomes(model_class, model_settings, seeds):
+    """
+    :return: (dictionary) of the projected outcomes of a model (populated once) simulated with each seed
+    """
+
+    model = model_class(id=0, settings=model_settings)
+    build_model(model)
+
+    outputs = MultiEpidemicsOutputs()
+    for seed in seeds:
+        model.simulate(seed=seed)
+        outputs.extract_outputs(simulated_model=model)
+        model.reset()
+    return outputs.dictOfProjectedOutcomes
+
+
+def test_trajectories_match_active_set_model_with_tolerance_0(tmp_path, monkeypatch):
+
+    # (trajectories are exported relative to the current folder)
+    monkeypatch.chdir(tmp_path)
+    sets = GonoSettings()
+    sets.tauLeapingTolerance = 0
+
+    assert read_exported_trajectories(model_class=TauLeapingEpiModel, model_settings=sets, seeds=SEEDS,
+                                      folder='tau-leaping') \
+        == read_exported_trajectories(model_class=ActiveSetEpiModel, model_settings=sets, seeds=SEEDS,
+                                      folder='active-set')
+
+
+def test_projected_outcomes_are_equivalent_to_fixed_time_step():
+
+    sets = GonoSettings()
+    seeds = list(range(N))
+    fixed_outcomes = get_projected_outcomes(model_class=ActiveSetEpiModel, model_settings=sets, seeds=seeds)
+    leap_outcomes = get_projected_outcomes(model_class=TauLeapingEpiModel, model_settings=sets, seeds=seeds)
+
+    not_equivalent = []
+    for key, fixed_values in fixed_outcomes.items():
+        if key.startswith('Rate'):
+            margin = RATE_MARGIN * np.mean(fixed_values)
+        elif key.startswith('Time-averaged proportion'):
+            margin = PROPORTION_MARGIN
+        else:
+            continue
+        diffs = np.array(leap_outcomes[key], dtype=float) - np.array(fixed_values, dtype=float)
+        # (trajectories where an outcome is not defined are excluded)
+        diffs = diffs[~np.isnan(diffs)]
+        if not if_equivalent(diffs=diffs, margin=margin, alpha=ALPHA):
+            not_equivalent.append(key)
+
+    assert not_equivalent == []
@@ -0,0 +1,34 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from model.active_set_model import ActiveSetEpiModel
+from model.model_settings import GonoSettings
+from model.model_structure import build_model
+from model.trajectory_store import TRAJECTORY_FILE, get_trajectory_columns, write_trajectories
+
+
+def test_npz_columns_match_csv_export(tmp_path, monkeypatch):
+
+    # (trajectories are exported relative to the current folder)
+    monkeypatch.chdir(tmp_path)
+    model = ActiveSetEpiModel(id=0, settings=GonoSettings())
+    build_model(model)
+    model.simulate(seed=1)
+
+    model.export_trajectories(folder='csv')
+    write_trajectories(folder='npz', ids=[model.id], seeds=[model.seed],
+                       list_of_columns=[get_trajectory_columns(model=model)])
+
+    csv = pd.read_csv(os.path.join('csv', 'trajectory 0 - 1.csv'), float_precision='round_trip')
+    npz = np.load(os.path.join('npz', TRAJECTORY_FILE))
+
+    assert npz['names'].tolist() == csv.columns.tolist()
+    for j, name in enumerate(csv.columns):
+        values = npz[str(j)][0]
+        if values.dtype.kind == 'U':
+            # (text columns are padded with '' and csv columns with NaN)
+            assert values.tolist() == csv[name].fillna('').astype(str).tolist(), name
+        else:
+            assert np.array_equal(values, csv[name].to_numpy(dtype=float), equal_nan=True), name
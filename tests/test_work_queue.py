@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+
+from model.work_queue import CLAIMED, DONE, PENDING, DirectoryQueue, QueuePool, run_job
+from model.worker_pool import WORK_QUEUE_ENV, WORK_QUEUE_TIMEOUT_ENV, close_pool, get_pool
+
+
+def get_files(queue):
+    """
+    :return: (dictionary) of the files in each sub-folder of the queue
+    """
+
+    return {sub_folder: os.listdir(os.path.join(queue.folder, sub_folder)) for sub_folder in (PENDING, CLAIMED, DONE)}
+
+
+def test_slow_job_with_heartbeat_is_not_requeued(tmp_path):
+
+    queue = DirectoryQueue(folder=str(tmp_path))
+    job_ids = queue.publish(function=time.sleep, list_of_args=[(1.5, )])
+
+    worker = threading.Thread(target=run_job, kwargs={'queue': queue, 'heartbeat_interval': 0.1})
+    worker.start()
+    while len(get_files(queue=queue)[CLAIMED]) == 0:
+        time.sleep(0.01)
+    for _ in range(10):
+        time.sleep(0.1)
+        queue.requeue_claimed(job_ids=job_ids, claim_timeout=0.5)
+        assert get_files(queue=queue)[PENDING] == []
+    worker.join()
+
+    assert queue.get_result(job_id=job_ids[0]) == (None, None)
+
+
+def test_done_job_is_not_requeued(tmp_path):
+
+    queue = DirectoryQueue(folder=str(tmp_path))
+    job_ids = queue.publish(function=abs, list_of_args=[(-1, )])
+    job_id = queue.claim()
+    # the result is stored but the claimed file is not removed yet
+    queue.complete(job_id=job_id, result=1)
+    with open(os.path.join(queue.folder, CLAIMED, job_id + '.pkl'), 'wb'):
+        pass
+    os.utime(os.path.join(queue.folder, CLAIMED, job_id + '.pkl'), (0, 0))
+
+    queue.requeue_claimed(job_ids=job_ids, claim_timeout=1)
+    assert get_files(queue=queue)[PENDING] == []
+
+
+def test_starmap_removes_the_files_of_its_jobs(tmp_path):
+
+    queue = DirectoryQueue(folder=str(tmp_path))
+    pool = QueuePool(queue=queue)
+    assert pool.starmap(abs, [(-1, ), (-2, )]) == [1, 2]
+    assert get_files(queue=queue) == {PENDING: [], CLAIMED: [], DONE: []}
+
+    # a job that was run more than once and completes after the session has its result leaves no file
+    job_ids = queue.publish(function=abs, list_of_args=[(-3, )])
+    job_id = queue.claim()
+    queue.remove(job_ids=job_ids)
+    queue.complete(job_id=job_id, result=3)
+    assert get_files(queue=queue) == {PENDING: [], CLAIMED: [], DONE: []}
+
+
+def test_job_of_stopped_worker_is_requeued_by_pool_of_session(tmp_path, monkeypatch):
+
+    monkeypatch.setenv(WORK_QUEUE_ENV, str(tmp_path))
+    monkeypatch.setenv(WORK_QUEUE_TIMEOUT_ENV, '0.5')
+    close_pool()
+    pool = get_pool()
+
+    # a worker claims the job as soon as it is published and then stops (without touching its file)
+    publish = pool.queue.publish
+
+    def publish_and_claim(function, list_of_args):
+        job_ids = publish(function=function, list_of_args=list_of_args)
+        assert pool.queue.claim() == job_ids[0]
+        return job_ids
+    monkeypatch.setattr(pool.queue, 'publish', publish_and_claim)
+
+    results = []
+    session = threading.Thread(target=lambda: results.append(pool.starmap(abs, [(-1, )])), daemon=True)
+    session.start()
+    session.join(timeout=10)
+    close_pool()
+
+    assert results == [[1]]
+    assert get_files(queue=pool.queue) == {PENDING: [], CLAIMED: [], DONE: []}
@@ -0,0 +1,67 @@
+import pickle
+
+from model.model_settings import GonoSettings
+from model.model_structure import build_model
+from model.template_epidemics import TemplateMultiEpidemics, get_model_class
+from model.worker_pool import close_pool, get_template_key, set_pool
+
+SEEDS = [1, 2021]
+
+
+class InProcessPool:
+    """ pool that runs jobs in this process (after a pickle round-trip of their arguments, as a process pool) """
+
+    def __init__(self):
+        self.args = []
+
+    def starmap(self, func, iterable):
+        self.args = [pickle.loads(pickle.dumps(args)) for args in iterable]
+        return [func(*args) for args in self.args]
+
+    def close(self):
+        pass
+
+    def join(self):
+        pass
+
+
+def get_settings_with_param_values():
+    """
+    :return: model settings with fixed values of a parameter for SEEDS (see GonoSettings.paramValuesBySeed)
+    """
+
+    sets = GonoSettings()
+    sets.exportTrajectories = False
+    sets.paramValuesBySeed = {seed: {'Transmission parameter': 1.5 + i} for i, seed in enumerate(SEEDS)}
+    return sets
+
+
+def test_template_key_does_not_depend_on_param_values_of_seeds():
+
+    sets = get_settings_with_param_values()
+    key = get_template_key(model_class=get_model_class(sets), model_settings=sets,
+                           function_to_populate_model=build_model)
+    sets.paramValuesBySeed = dict()
+
+    assert key == get_template_key(model_class=get_model_class(sets), model_settings=sets,
+                                   function_to_populate_model=build_model)
+
+
+def test_jobs_receive_param_values_of_their_seeds(tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+    outcomes = []
+    for if_run_in_parallel in (False, True):
+        pool = InProcessPool()
+        set_pool(pool=pool)
+        multi_model = TemplateMultiEpidemics(model_settings=get_settings_with_param_values())
+        multi_model.simulate(function_to_populate_model=build_model, n=len(SEEDS), seeds=SEEDS,
+                             sample_seeds_by_weights=False, if_run_in_parallel=if_run_in_parallel)
+        outcomes.append(multi_model.multiModelOutputs.dictOfProjectedOutcomes)
+    close_pool()
+
+    # jobs do not carry the parameter values of other seeds
+    for args in pool.args:
+        assert args[1].paramValuesBySeed == dict()
+        assert args[6] == get_settings_with_param_values().paramValuesBySeed[args[5]]
+    assert outcomes[0] == outcomes[1]